@@ -1,10 +1,13 @@
 from pathlib import Path
 from tqdm import tqdm
 import time
-import re
-import zipfile
 import logging
 import os
+from logzipper.archive import ArchiveJob
+from logzipper.backends import ARCHIVE_FORMATS, create_backend
+from logzipper.pipeline import PipelineOptions, run_pipeline
+from logzipper.progress import ByteProgress, PeriodicCall
+from logzipper.scanner import scan_directory
 
 # Get directory where the script is currently located
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -41,10 +44,10 @@ msg = r"""
   \/  \/ |_|_|_|_|\_\___/|_| |_| |_|_| |_| |_|\___|_| |_|
 
 -------------------------------------------------------------------------------------------------------------------------
-"Ein CLI-Tool zum Komprimieren von Logdateien im ZIP-Format. 
+"Ein CLI-Tool zum Komprimieren von Logdateien im ZIP-, 7z-, tar.zst- oder tar.xz-Format. 
 Unterstützt werden nur Logdateien, die das Datum im Format yyyy_mm_dd im Dateinamen enthalten. 
 Beispiele für unterstützte Logs: 2024_03_20_server.log, 2024_08_27.adminrequest.log, 2024_08_03_message.log. 
-Die Logdateien werden nach dem Monat im Dateinamen gruppiert und für jeden Monat wird ein separates .zip-Archiv erstellt."
+Die Logdateien werden nach dem Monat im Dateinamen gruppiert und für jeden Monat wird ein separates Archiv erstellt."
 -------------------------------------------------------------------------------------------------------------------------
 """
 
@@ -133,36 +136,37 @@ while True:
         else:
             print("Not a valid command. Please try again.")
 
+    # Prompt user for the archive format, zip with bz2 is what earlier versions always created
+    while True:
+        archive_format = input(f"Which archive format should be used? ({', '.join(ARCHIVE_FORMATS)}, Enter = zip-bz2):\n>>> ").strip() or "zip-bz2"
+
+        # Check if user wants to exit
+        if archive_format.lower() == "exit":
+            print("Closing program, bye!")
+            exit()
+
+        try:
+            backend = create_backend(archive_format, threads=os.cpu_count() or 1)
+        except (ValueError, RuntimeError) as e:
+            print(f"{e} Please try again.")
+            continue
+        print(f"Archives will be created in the {archive_format} format.")
+        logger.info(f"Archives will be created in the {archive_format} format.")
+        break
+
     # If all inputs are valid and processed, break out of the main loop
     break
 
 # --------- end CLI Prompts end --------- #
 
-# List to store all log files
-files = []
-
-# Collect all log files in the directory
-files = [file for file in Path(logs_dir).iterdir() if file.is_file() and file.suffix == ".log"]
-
-# Dictionary to group files by (year, month)
+# Dictionary to group files by yyyy-mm
 files_grouped_by_month = {}
 
-# Regex pattern to match the date in the format YYYY_MM_DD
-pattern = r"(\d{4})_(\d{2})_(\d{2})_?.*\.log"
-
-# Group files by (year, month)
-for f in files:
-    file_string = f.name  #  Get filename part
-
-    # RegEx re.match to find the date in the filename
-    match = re.match(pattern, file_string)
-
-    if match:
-        year, month, _ = match.groups()
-
-        # Group files by (year, month)
-        key = (year, month)
-        files_grouped_by_month.setdefault(key, []).append(f)
+# Collect all log files in the directory with one listing, size and mtime come with it,
+# and group them by the yyyy_mm_dd date in their file name
+for log_file in scan_directory(logs_dir).files:
+    if log_file.date is not None:
+        files_grouped_by_month.setdefault(log_file.year_month, []).append(log_file)
         
 if not files_grouped_by_month:
     no_logs_msg = "Found no log files to zip... Finishing up..."
@@ -180,24 +184,45 @@ if not files_grouped_by_month:
         
 else:
 
-    # Zip the files grouped by (year, month)
-    for (year, month), group_files in files_grouped_by_month.items():
-        zip_filename = f"{year}-{month}.zip"
-        zip_path = Path(output_dir) / zip_filename
-
-    # Create the Zip file and add the grouped files to it
-        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_BZIP2) as zipf:
-            for file in tqdm(group_files, "Zipping files: "):
-                zipf.write(str(file), arcname=file.name)
-                if log_files_delete_flag:
-                    Path.unlink(file) # Deletes log files after zipping them
-                else:
-                    continue
-            
-        print(f"Zipping complete - Archive '{zip_filename}' created in path '{Path(output_dir)}' with {len(group_files)} log files.")
-        logger.info(f"Zipping complete - Archive '{zip_filename}' created in path '{Path(output_dir)}' with {len(group_files)} log files.")
-        
+    def report_result(result):
+        # One block per archive once it is written, verified and, if requested, its log files are gone
+        zip_filename = os.path.basename(result.job.archive_path)
+        if not result.ok:
+            print(f"Failed to create archive '{zip_filename}': {result.error}")
+            logger.error(f"Failed to create archive '{zip_filename}': {result.error}")
+            return
+        print(f"Zipping complete - Archive '{zip_filename}' created in path '{Path(output_dir)}' with {result.files_zipped} log files.")
+        logger.info(f"Zipping complete - Archive '{zip_filename}' created in path '{Path(output_dir)}' with {result.files_zipped} log files.")
+        if result.verification:
+            for failure in result.verification.failed:
+                print(f"Verification failed for {failure}, keeping the log file")
+                logger.error(f"Verification failed in '{zip_filename}' for {failure}, keeping the log file")
+            if result.verification.error:
+                print(f"Failed to verify archive '{zip_filename}': {result.verification.error}")
+                logger.error(f"Failed to verify archive '{zip_filename}': {result.verification.error}")
+        for error in result.delete_errors:
+            print(f"Failed to delete {error}")
+            logger.error(f"Failed to delete {error}")
         if log_files_delete_flag:
-            print(f"Cleaning up - Deleted {len(group_files)} log files successfully.")
-            logger.info(f"Cleaning up - Deleted {len(group_files)} log files successfully.")
-            
\ No newline at end of file
+            print(f"Cleaning up - Deleted {len(result.deleted)} log files of '{zip_filename}' successfully.")
+            logger.info(f"Cleaning up - Deleted {len(result.deleted)} log files of '{zip_filename}' successfully.")
+
+    # One archive per (year, month), only replacing an existing one once it is complete
+    archive_jobs = []
+    for year_month, log_files in sorted(files_grouped_by_month.items()):
+        archive_jobs.append(ArchiveJob(logs_dir, year_month, log_files, backend, delete_files=log_files_delete_flag, output_path=output_dir))
+
+    # The next archive is compressed while the previous one is verified and its log files are deleted
+    progress = ByteProgress()
+    results = run_pipeline(archive_jobs, PipelineOptions(archive_workers=1, verify_workers=1, processes=False), progress)
+
+    def show_progress(progress_bar):
+        # Redrawn twice a second on its own thread, so the bar moves while a big month is compressed
+        progress_bar.update(progress.done_bytes - progress_bar.n)
+        progress_bar.set_postfix_str(progress.describe())
+
+    with tqdm(total=sum(job.input_bytes for job in archive_jobs), desc="Zipping archives: ", unit="B", unit_scale=True, unit_divisor=1024,
+              bar_format="{l_bar}{bar}| {n_fmt}B/{total_fmt}B [{elapsed}{postfix}]") as progress_bar, \
+            PeriodicCall(lambda: show_progress(progress_bar)):
+        for result in results:
+            report_result(result)
@@ -1,28 +1,82 @@
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, 
-                             QLineEdit, QPushButton, QComboBox, QTextEdit, QProgressBar, QStatusBar, QCheckBox,
-                             QFileDialog, QMessageBox, QSizePolicy, QTreeView, QFileSystemModel, QDateTimeEdit)
+                             QLineEdit, QPushButton, QComboBox, QPlainTextEdit, QProgressBar, QStatusBar, QCheckBox,
+                             QFileDialog, QMessageBox, QSizePolicy, QTreeView, QFileSystemModel, QDateTimeEdit, QTreeWidget, QTreeWidgetItem)
 from PySide6.QtGui import QAction, QCloseEvent, QIcon, QDropEvent
-from PySide6.QtCore import QThread, Signal, QObject, QDir, QFile, QTextStream, QSettings, QDate
-from pathlib import Path
-import re
-import zipfile
+from PySide6.QtCore import QThread, Signal, QObject, QDir, QFile, QTextStream, QSettings, QDate, QTimer, QFileSystemWatcher
 import os
+import logging
 import sys
 import time
-from datetime import datetime
-from collections import defaultdict
+from datetime import datetime, timedelta
+from collections import defaultdict, deque
+from logzipper.archive import ArchiveJob
+from logzipper.autoselect import CodecSelector
+from logzipper.backends import create_backend
+from logzipper.control import RunControl
+from logzipper.patterns import PatternMatcher, archive_name
+from logzipper.pipeline import PipelineOptions, run_pipeline
+from logzipper.progress import ByteProgress, ThroughputHistory
+from logzipper.scanner import FolderIndex, LogFileEntry, index_directory, scan_directory
 
 # Directory where the script is located
 basedir = os.path.dirname(__file__)
 
+# Every message of a run, including each zipped file, the program output only shows a summary per archive
+log_dir = os.path.join(basedir, "Log")
+log_file = os.path.join(log_dir, "gui_zipping_history.log")
+logger = logging.getLogger(__name__)
+
+# Lines kept in the program output, older ones are dropped while new ones come in
+OUTPUT_MAX_LINES = 5000
+# Milliseconds between two updates of the program output and the progress bar while the worker runs
+OUTPUT_REFRESH_INTERVAL = 100
+# Steps of the progress bar, finer than percent so big runs visibly move
+PROGRESS_STEPS = 1000
+# Milliseconds the input folder has to stay unchanged, while typing or while files come and go, before it is listed
+FOLDER_SCAN_DELAY = 400
+# Milliseconds the preview waits for further edits of the patterns or the date filter before it is updated
+PREVIEW_DELAY = 200
+# Files listed per archive in the preview, the rest is summed up in one line
+PREVIEW_MAX_FILES = 200
+# Status bar style, and the one for errors
+STATUSBAR_STYLE = "font-size: 16px; font-weight: bold; color: #11d957"
+STATUSBAR_ERROR_STYLE = "color: #0d47a1"
+
+# Compression method combobox entries and the archive format each of them writes
+COMPRESSION_METHODS = {
+    "zlib (Fast)": "zip-deflate",
+    "bz2 (Good)": "zip-bz2",
+    "lzma (Highest)": "zip-lzma",
+    "7z LZMA2 (Highest, multithreaded)": "7z",
+    "zstd (Fast, .tar.zst)": "tar.zst",
+    "xz solid (Highest, .tar.xz)": "tar.xz",
+    "zstd dictionary (Many small logs)": "zstd-dict",
+    "auto (Best ratio at 10 MB/s)": "auto",
+}
+# Minimum speed of the auto mode in MB/s
+AUTO_MIN_THROUGHPUT = 10.0
+
+def group_by_modification_month(files:list, older_than:datetime) -> dict:
+    # Log files modified before older_than per month of their modification time, e.g. '2025_03'
+    # Only .log files, other file types can be archived with a pattern like *.txt
+    files_to_zip: dict[str, list[LogFileEntry]] = defaultdict(list)
+    for log_file in files: # mtime comes with the listing, no stat per file
+        if not log_file.name.endswith(".log"):
+            continue
+        creation_time = datetime.fromtimestamp(log_file.mtime)
+        if creation_time < older_than: # Add files to dictionary if older than the date
+            files_to_zip[creation_time.strftime("%Y_%m")].append(log_file)
+    return files_to_zip
+
+def format_size(size:int) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
 class Worker(QObject):
-    progress_updated = Signal(int)
-    log_message = Signal(str)
     finished = Signal()
     show_message = Signal(str, str)
 
-    def __init__(self, parent, input_folder:str, output_folder:str, patterns:list, compression_method:str, delete_logfiles_after_zipping:bool, date_filter_state:bool, zip_files_older_than_date:datetime):
+    def __init__(self, parent, input_folder:str, output_folder:str, patterns:list, compression_method:str, delete_logfiles_after_zipping:bool, date_filter_state:bool, zip_files_older_than_date:datetime, append_to_existing_archives:bool=False, folder_index:FolderIndex=None):
         super().__init__()
         self.parent = parent
         self.input_folder: str = input_folder
@@ -32,142 +86,150 @@ class Worker(QObject):
         self.delete_logfiles_checkbox: bool = delete_logfiles_after_zipping
         self.date_filter_state: bool = date_filter_state
         self.zip_files_older_than_date: str = zip_files_older_than_date
-        
-        if compression_method  == "zlib (Fast)":
-            self.compression_method = zipfile.ZIP_DEFLATED
-        elif compression_method  == "bz2 (Good)":
-            self.compression_method = zipfile.ZIP_BZIP2
-        elif compression_method  == "lzma (Highest)":
-            self.compression_method = zipfile.ZIP_LZMA
+        self.compression_threads: int = os.cpu_count() or 1 # Threads compressing one archive, the archive itself is written by this thread
+        self.append_to_existing_archives: bool = append_to_existing_archives
+        self.folder_index = folder_index # The window's background scan of the input folder, None if it is not up to date
+        self.backend = None # Created in run(), so a missing optional package is reported like any other error
+        self.codec_selector = None # Set in auto mode, picks the backend of every archive
+        self.control = RunControl() # Paused, resumed and cancelled by the window's buttons, checked between files
+        self.progress = ByteProgress() # Input bytes of all archives and how many are done, read by the window with the messages
+        self.throughput = [] # (format, input bytes, archive bytes, seconds) of every archive written, added to the window's history after the run
+        self.messages = deque(maxlen=OUTPUT_MAX_LINES) # Picked up by the window every OUTPUT_REFRESH_INTERVAL ms, instead of one signal per message
     
-    def zip_files_no_date_filter(self, input_folder:str, output_folder:str, patterns:list) -> None:
-        try:
-            start = time.process_time()
-            counter = 0 # Counter to display compressing archive 1 out of n
-            for pattern in patterns:
-                counter += 1 # Updating the counter
-                regex = f"^{re.escape(pattern).replace('\\*', '.*')}$"
-                
-                # Only .log files - Change in the future maybe to any filetype = remove f.endswith(".log"), pattern must then end like this "*.<some_filetype> e.x. (*.xlsx, *.txt, *.mp3 etc...)"
-                matching_files = [f for f in os.listdir(input_folder) if f.endswith(".log") and re.match(regex, f)] 
-                total_files = len(matching_files)
-                
-                if matching_files:
-                    # Print processing message
-                    self.log_message.emit(f"Starting to compress log files with compression method: {self.compression_method_text}")
-                    creating_archive_message = f"Creating archive {pattern.replace('*', '')}.zip ({counter}/{len(patterns)})"
-                    self.log_message.emit(len(creating_archive_message) * "-")
-                    self.log_message.emit(creating_archive_message)
-                    self.log_message.emit(len(creating_archive_message) * "-")
-                    # Continue processing
-                    zip_filename = f"{pattern.replace('*', '')}.zip"
-                    zip_path = os.path.join(output_folder, zip_filename)
-                    self.log_message.emit("Starting zipping of log files...")
-                    with zipfile.ZipFile(zip_path, "w", compression=self.compression_method) as zipf:
-                        for index, file in enumerate(matching_files):
-                            self.log_message.emit(f"Zipping file {file}")
-                            file_path = os.path.join(input_folder, file)
-                            zipf.write(file_path, arcname=file)
-                            if self.delete_logfiles_checkbox:
-                                os.unlink(file_path) # Deletes zipped log files
-                            progress = int((index + 1) / total_files * 100)
-                            self.progress_updated.emit(progress)
-                    
-                    elapsed = time.process_time() - start
-                    
-                    if self.delete_logfiles_checkbox:
-                        task_complete_message = f"\nTask completed - Created archive '{zip_filename}' with {len(matching_files)} files.\nCleaning up - Deleted {len(matching_files)} log files that were zipped.\nElapsed time: {round(elapsed, 2)} seconds."
-                        self.log_message.emit(task_complete_message)
-                    else:
-                        task_complete_message = f"\nTask completed - Created archive '{zip_filename}' with {len(matching_files)} files.\nElapsed time: {round(elapsed, 2)} seconds."
-                        self.log_message.emit(task_complete_message)
-                else:
-                    self.log_message.emit(f"No files found matching pattern(s): {pattern}")
-
-        except Exception as ex:
-            message = f"An exception of type {type(ex).__name__} occurred. Arguments: {ex.args!r}"
-            self.log_message.emit(message)
-            self.show_message.emit("An exception occurred", message)  
-
-            
-    def zip_files_with_date_filter(self, input_folder:str, output_folder:str, zip_files_older_than_date:datetime) -> None:
-        try:
-            start = time.process_time()
-            counter = 0 # Counter to display compressing archive 1 out of n
-            files_to_zip: dict[str, list[str]] = defaultdict(list)
-
-            # Only .log files - Change in the future maybe to any filetype = remove f.endswith(".log"), pattern must then end like this "*.<some_filetype> e.x. (*.xlsx, *.txt, *.mp3 etc...)"
-            matching_files = [f for f in os.listdir(input_folder) if f.endswith(".log")] 
-            
-            for file in matching_files:
-                file_path = os.path.join(input_folder, file)
-                creation_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                key = creation_time.strftime("%Y_%m")  # e.g. '2025_03'
-                
-                if creation_time < zip_files_older_than_date: # Add files to dictionary if older than the date
-                    files_to_zip[key].append(file)
-                
-                
-            if files_to_zip:
-                for key, values in files_to_zip.items():
-                    total_files = sum(len(v) for v in files_to_zip.values())
-                    files_processed = 0
-
-                    counter += 1 # Updating the counter
-                    zip_filename = f"{key}.zip"
-                    # Print processing message
-                    self.log_message.emit(f"Starting to compress log files with compression method: {self.compression_method_text}")
-                    creating_archive_message = f"Creating archive {zip_filename} ({counter}/{len(files_to_zip.keys())})"
-                    self.log_message.emit(len(creating_archive_message) * "-")
-                    self.log_message.emit(creating_archive_message)
-                    self.log_message.emit(len(creating_archive_message) * "-")
-                    # Continue processing
-                    zip_path = os.path.join(output_folder, zip_filename)
-                    self.log_message.emit("Starting zipping of log files...")
-                    with zipfile.ZipFile(zip_path, "w", compression=self.compression_method) as zipf:
-                        for file in values:
-                            self.log_message.emit(f"Zipping file {file}")
-                            files_processed += 1
-                            file_path = os.path.join(input_folder, file)
-                            zipf.write(file_path, arcname=file)
-                            if self.delete_logfiles_checkbox:
-                                os.unlink(file_path) # Deletes zipped log files
-                        progress = int((counter / len(files_to_zip.keys())) * 100)
-                        self.progress_updated.emit(progress)
-
-                    elapsed = time.process_time() - start
-
-                    if self.delete_logfiles_checkbox:
-                        task_complete_message = f"\nTask completed - Created archive '{zip_filename}' with {len(matching_files)} files.\nCleaning up - Deleted {files_processed} log files that were zipped\nElapsed time: {round(elapsed, 2)} seconds."
-                        self.log_message.emit(task_complete_message)
-                    else:
-                        task_complete_message = f"\nTask completed - Created archive '{zip_filename}' with {files_processed} files.\nElapsed time: {round(elapsed, 2)} seconds."
-                        self.log_message.emit(task_complete_message)
+    def log(self, message:str, detail:bool=False) -> None:
+        # Everything goes to the log file, details like every zipped file only there
+        logger.info(message)
+        if not detail:
+            self.messages.append(message)
+    
+    def take_messages(self) -> list:
+        # Called from the UI thread, appending to and popping from a deque is thread-safe
+        return [self.messages.popleft() for _ in range(len(self.messages))]
+    
+    def list_input_folder(self) -> list:
+        # All files of the input folder, from the background scan if the folder didn't change since, otherwise listed now
+        if self.folder_index is not None:
+            return self.folder_index.files
+        return scan_directory(self.input_folder, suffix=None).files
+    
+    def create_job(self, name:str, files:list) -> ArchiveJob:
+        # One archive in the output folder, in auto mode with the format that compressed a sample of its files best
+        backend = self.backend
+        if self.codec_selector is not None:
+            decision = self.codec_selector.select(files, os.path.join(self.output_folder, name))
+            backend = decision.backend
+            self.log(f"Auto-selected {decision}")
+        return ArchiveJob(self.input_folder, name, files, backend, delete_files=self.delete_logfiles_checkbox,
+                          append=self.append_to_existing_archives, output_path=self.output_folder)
+    
+    def jobs_no_date_filter(self, patterns:list) -> list:
+        # One archive per pattern, named after the pattern without its wildcards
+        jobs = []
+        # Patterns ending with a file type (*.xlsx, *.txt, app_*.gz etc...) match any file, all others only .log files,
+        # a file matching several patterns goes to the archive of the first one
+        groups = PatternMatcher(patterns).group(self.list_input_folder()) # One listing and one match per file for all patterns
+        for pattern, matching_files in groups.items():
+            if matching_files:
+                # Already compressed files (.gz, .zip, ...) are stored as they are, see logzipper.routing
+                job = self.create_job(archive_name(pattern), matching_files)
+                job.files = [f for f in matching_files if f.path != job.archive_path]
+                jobs.append(job)
             else:
-                self.log_message.emit("No matching files found.")
-                        
-        except Exception as ex:
-            message = f"An exception of type {type(ex).__name__} occurred. Arguments: {ex.args!r}"
-            self.log_message.emit(message)
-            self.show_message.emit("An exception occurred", message)  
-            
-
+                self.log(f"No files found matching pattern(s): {pattern}")
+        return jobs
+    
+    def jobs_with_date_filter(self, zip_files_older_than_date:datetime) -> list:
+        # One archive per month of the files' modification time
+        files_to_zip = group_by_modification_month(self.list_input_folder(), zip_files_older_than_date)
+        if not files_to_zip:
+            self.log("No matching files found.")
+        return [self.create_job(key, values) for key, values in files_to_zip.items()]
+    
+    def log_result(self, result, counter:int, total:int, elapsed:float) -> None:
+        # Everything the pipeline did for one archive: written, verified and cleaned up
+        zip_filename = os.path.basename(result.job.archive_path)
+        creating_archive_message = f"Creating archive {zip_filename} ({counter}/{total})"
+        self.log(len(creating_archive_message) * "-")
+        self.log(creating_archive_message)
+        self.log(len(creating_archive_message) * "-")
+        if not result.ok:
+            self.log(f"Failed to create archive {zip_filename}: {result.error}")
+            return
+        if result.cancelled and not result.written:
+            self.log(f"Cancelled before archive {zip_filename} was started")
+            return
+        if result.files_already_archived:
+            self.log(f"Skipping {result.files_already_archived} files that are already in the archive")
+        for file_path in result.conflicts:
+            self.log(f"Skipping file {os.path.basename(file_path)}, the archive already contains a different file with the same name")
+        for file in result.written:
+            self.log(f"Zipping file {file}", detail=True)
+        if result.written and not result.files_already_archived:
+            # Archives that also hold older files would spoil the ratio
+            input_bytes = sum(size for size, _ in result.written.values())
+            self.throughput.append((result.job.backend.name, input_bytes, os.path.getsize(result.job.archive_path), result.duration))
+        if result.written:
+            self.log(f"Zipped {len(result.written)} files, each of them is listed in {log_file}")
+        if result.verification:
+            verification = result.verification
+            self.log(f"Verified {len(verification.passed)} files in {zip_filename} ({verification.mb_per_second:.1f} MB/s)")
+            if verification.error:
+                self.log(f"Failed to verify archive {result.job.archive_path}: {verification.error}")
+            for failure in verification.failed:
+                self.log(f"Verification failed for {failure}, keeping the log file")
+        for error in result.delete_errors:
+            self.log(f"Failed to delete {error}")
+        
+        if result.cancelled:
+            task_complete_message = (f"\nTask cancelled - Archive '{zip_filename}' holds {len(result.written)} of {len(result.job.files)} files, "
+                                     f"start again to add the rest.")
+        else:
+            task_complete_message = f"\nTask completed - Created archive '{zip_filename}' with {len(result.job.files)} files."
+        if self.delete_logfiles_checkbox:
+            task_complete_message += f"\nCleaning up - Deleted {len(result.deleted)} log files that were zipped."
+        self.log(f"{task_complete_message}\nElapsed time: {round(elapsed, 2)} seconds.")
+    
     def run(self):
         try:
+            start = time.perf_counter()
+            archive_format = COMPRESSION_METHODS[self.compression_method_text]
+            if archive_format == "auto":
+                self.codec_selector = CodecSelector(min_throughput=AUTO_MIN_THROUGHPUT, threads=self.compression_threads)
+            else:
+                self.backend = create_backend(archive_format, threads=self.compression_threads)
             if self.date_filter_state:
-                self.zip_files_with_date_filter(self.input_folder, self.output_folder, self.zip_files_older_than_date)
+                jobs = self.jobs_with_date_filter(self.zip_files_older_than_date)
             else:
-                self.zip_files_no_date_filter(self.input_folder, self.output_folder, self.pattern)
+                jobs = self.jobs_no_date_filter(self.pattern)
+            
+            if jobs:
+                self.log(f"Starting to compress log files with compression method: {self.compression_method_text}")
+            # The next archive is compressed while the previous one is verified and its log files are deleted,
+            # on threads of this worker, the compressors release the GIL
+            results = run_pipeline(jobs, PipelineOptions(archive_workers=1, verify_workers=1, processes=False), self.progress, self.control)
+            for counter, result in enumerate(results, start=1):
+                self.log_result(result, counter, len(jobs), time.perf_counter() - start)
+            if self.control.is_cancelled:
+                self.log("Run cancelled - Archives that were started are complete and verified, the next start with the same folders continues with the remaining files.")
                 
             # Emit finished signal
             self.finished.emit()
             
         except Exception as ex:
             message = f"An exception of type {type(ex).__name__} occurred. Arguments: {ex.args!r}"
-            self.log_message.emit(message)
+            self.log(message)
             self.show_message.emit("An exception occurred", message)  
             self.finished.emit()
 
+
+class FolderScanner(QObject):
+    # Lists the input folder on its own thread, a network path would block the window for seconds
+    scanned = Signal(object)
+    
+    def scan(self, folder:str):
+        self.scanned.emit(index_directory(folder))
+
+
 class DraggableLineEdit(QLineEdit):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -195,7 +257,7 @@ class DraggableLineEdit(QLineEdit):
             event.ignore()
 
 class MainWindow(QMainWindow):
-    progress_updated = Signal(int)
+    folder_scan_requested = Signal(str)
     
     def __init__(self):
         super().__init__()
@@ -206,6 +268,11 @@ class MainWindow(QMainWindow):
         
         # Settings to save current location of the windows on exit
         self.settings = QSettings("App","LogfileZipper")
+        
+        self.worker_running = False # True from pressing start until the worker finished
+        # Ratio and speed of recent archives per format, the preview estimates size and duration from it
+        self.throughput_history = ThroughputHistory.from_json(self.settings.value("throughput_history", ""))
+        self.close_after_worker = False # Set when the window is closed during a run, it closes once the run is cancelled
         geometry = self.settings.value("geometry", bytes())
         self.restoreGeometry(geometry)
         
@@ -220,6 +287,12 @@ class MainWindow(QMainWindow):
         
         # Create the menu bar
         self.create_menu_bar()
+        
+        # Lists the input folder in the background and keeps the result until the folder changes
+        self.init_folder_scanner()
+        
+        # Preview of the archives, updated from the folder's index while the settings are edited
+        self.init_preview()
     
     def initialize_theme(self, theme_file):
         try:
@@ -235,9 +308,6 @@ class MainWindow(QMainWindow):
         
     def initUI(self):
         
-        # Signals and Slots
-        self.progress_updated.connect(self.update_progress)
-        
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         layout = QVBoxLayout(central_widget)
@@ -268,7 +338,7 @@ class MainWindow(QMainWindow):
         
         # Input for log file patterns
         self.pattern_input = DraggableLineEdit()
-        self.pattern_input.setPlaceholderText("Enter log file patterns (wildcard * is accepted) E.g. 2024_08*, info_message*")
+        self.pattern_input.setPlaceholderText("Enter log file patterns (wildcard * is accepted) E.g. 2024_08*, info_message*, 2024_08*.gz")
         self.pattern_input.setClearButtonEnabled(True)
         layout.addWidget(QLabel("Log File Patterns (comma-separated):"))
         layout.addWidget(self.pattern_input)
@@ -292,20 +362,33 @@ class MainWindow(QMainWindow):
         date_filter_layout.addWidget(self.zip_files_older_than)
         layout.addLayout(date_filter_layout)
         
+        # Preview of the archives a run would create with the current settings
+        self.preview_label = QLabel("Preview:")
+        self.preview_tree = QTreeWidget()
+        self.preview_tree.setHeaderLabels(["Archive / File", "Files", "Size", "Estimated size", "Estimated time"])
+        self.preview_tree.setMaximumHeight(180)
+        layout.addWidget(self.preview_label)
+        layout.addWidget(self.preview_tree)
+        
         # Buttons Layout
         buttons_layout = QHBoxLayout()
         
         # Compression CombBox
         self.compression_method_combobox = QComboBox()
         compression_method_combobox_label = QLabel("Compression method:")
-        self.compression_method_combobox.addItems(["zlib (Fast)", "bz2 (Good)", "lzma (Highest)"])
+        self.compression_method_combobox.addItems(list(COMPRESSION_METHODS))
         self.compression_method_combobox.setCurrentText("bz2 (Good)")
         
         self.delete_logfiles_checkbox = QCheckBox("Delete log files after zipping?")
+        self.append_to_archives_checkbox = QCheckBox("Append to existing archives?")
+        # Overwriting stays the default, the choice of the last run is remembered
+        self.append_to_archives_checkbox.setChecked(self.settings.value("append_to_archives", False, type=bool))
+        self.append_to_archives_checkbox.setToolTip("Adds only new files to an archive that already exists instead of overwriting it")
 
         buttons_layout.addWidget(compression_method_combobox_label)
         buttons_layout.addWidget(self.compression_method_combobox)
         buttons_layout.addWidget(self.delete_logfiles_checkbox)
+        buttons_layout.addWidget(self.append_to_archives_checkbox)
         
         # Zip button
         self.zip_button = QPushButton("Start Zipping Log Files")
@@ -313,11 +396,22 @@ class MainWindow(QMainWindow):
         self.zip_button.clicked.connect(self.zip_log_files)
         buttons_layout.addWidget(self.zip_button)
         
+        # Pause and cancel take effect between two files, archives that were started are completed
+        self.pause_button = QPushButton("Pause")
+        self.pause_button.setEnabled(False)
+        self.pause_button.clicked.connect(self.pause_or_resume)
+        buttons_layout.addWidget(self.pause_button)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_run)
+        buttons_layout.addWidget(self.cancel_button)
+        
         layout.addLayout(buttons_layout)
 
         
         # Progress bar
         self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, PROGRESS_STEPS)
         self.progress_bar.setValue(0)
         self.progress_bar.setFormat("%p%")
         layout.addWidget(self.progress_bar)
@@ -328,7 +422,7 @@ class MainWindow(QMainWindow):
         self.logfiles_count_statusbar = QStatusBar()
         self.setStatusBar(self.logfiles_count_statusbar)
         self.logfiles_count_statusbar.setSizeGripEnabled(False)
-        self.logfiles_count_statusbar.setStyleSheet("font-size: 16px; font-weight: bold; color: #11d957")
+        self.logfiles_count_statusbar.setStyleSheet(STATUSBAR_STYLE)
         statusbar_layout.addWidget(self.logfiles_count_statusbar)
         layout.addLayout(statusbar_layout)
         
@@ -338,8 +432,14 @@ class MainWindow(QMainWindow):
         # Left side: Program Output
         program_output_vertical_layout = QVBoxLayout()
         self.program_output_label = QLabel("Program Output:")
-        self.program_output = QTextEdit()
+        self.program_output = QPlainTextEdit()
         self.program_output.setReadOnly(True)
+        self.program_output.setMaximumBlockCount(OUTPUT_MAX_LINES)
+        # Messages of the worker are shown in batches, so a run over many files doesn't flood the event queue
+        self.output_refresh_timer = QTimer(self)
+        self.output_refresh_timer.setInterval(OUTPUT_REFRESH_INTERVAL)
+        self.output_refresh_timer.timeout.connect(self.show_worker_messages)
+        self.output_refresh_timer.timeout.connect(self.show_worker_progress)
         program_output_vertical_layout.addWidget(self.program_output_label)
         program_output_vertical_layout.addWidget(self.program_output)
 
@@ -376,12 +476,26 @@ class MainWindow(QMainWindow):
         self.compression_method_combobox.currentTextChanged.connect(self.get_compression_method)
     
     def closeEvent(self, event: QCloseEvent):
+        if self.close_after_worker and not self.worker_running:
+            self.settings.setValue("geometry", self.saveGeometry())
+            self.stop_folder_scanner()
+            event.accept() # The user already confirmed, the cancelled run has finished
+            return
+        if self.worker_running:
+            reply = QMessageBox.question(self, "Exit Program", "Log files are still being zipped. Cancel the run and exit once the current archive is completed?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                self.close_after_worker = True
+                self.cancel_run()
+            event.ignore()
+            return
+        
         reply = QMessageBox.question(self, "Exit Program", "Are you sure you want to exit the program?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         
         geometry = self.saveGeometry()
         self.settings.setValue("geometry", geometry)
         
         if reply == QMessageBox.Yes:
+            self.stop_folder_scanner()
             event.accept()
         else:
             event.ignore()
@@ -424,9 +538,6 @@ class MainWindow(QMainWindow):
     
     # ====== Functions Start ====== #
     
-    def update_progress(self, value):
-        self.progress_bar.setValue(value)
-    
     def clear_output(self):
         self.program_output.clear()
         
@@ -442,7 +553,7 @@ class MainWindow(QMainWindow):
             
 Best for: General use cases where compatibility, speed, and reasonable compression are needed (e.g., web transfers, archives)."""
         
-            self.program_output.setText(f"Selected compression method: {combobox_text} - Description:\n{desc_txt}")
+            self.program_output.setPlainText(f"Selected compression method: {combobox_text} - Description:\n{desc_txt}")
         
         elif combobox_text == "bz2 (Good)":
             desc_txt = """
@@ -454,7 +565,7 @@ Best for: General use cases where compatibility, speed, and reasonable compressi
             
 Best for: Situations where higher compression is desired and compression speed is less of a concern (e.g., backups, log files)."""
 
-            self.program_output.setText(f"Selected compression method: {combobox_text} - Description:\n{desc_txt}")
+            self.program_output.setPlainText(f"Selected compression method: {combobox_text} - Description:\n{desc_txt}")
         
         elif  combobox_text == "lzma (Highest)":
             desc_txt = """
@@ -467,7 +578,72 @@ Best for: Situations where higher compression is desired and compression speed i
             
 Best for: Cases where maximum compression is essential, and speed or memory usage is not critical (e.g., distributing software packages, compressing large datasets)."""
             
-            self.program_output.setText(f"Selected compression method: {combobox_text} - Description:\n{desc_txt}")
+            self.program_output.setPlainText(f"Selected compression method: {combobox_text} - Description:\n{desc_txt}")
+        
+        elif combobox_text == "7z LZMA2 (Highest, multithreaded)":
+            desc_txt = """
+        Pros:
+            1. Compression ratio on par with lzma, compressed on all CPU cores by the 7-Zip executable.
+            2. Same .7z archives as the 7-Zip batch scripts create.
+        Cons:
+            1. Needs 7-Zip installed, or the py7zr package (single-threaded).
+            2. Windows Explorer can't open .7z archives without 7-Zip.
+            
+Best for: Large log archives that are kept for a long time and should be as small as possible."""
+            
+            self.program_output.setPlainText(f"Selected compression method: {combobox_text} - Description:\n{desc_txt}")
+        
+        elif combobox_text == "zstd (Fast, .tar.zst)":
+            desc_txt = """
+        Pros:
+            1. Compresses several times faster than bz2 at a similar ratio, decompresses faster than all others.
+            2. Uses all CPU cores for a single archive.
+        Cons:
+            1. Needs the zstandard package, .tar.zst archives need 7-Zip (or tar/zstd) to be opened.
+            2. Appending late files rewrites the whole archive.
+            
+Best for: Big log directories where the run time matters more than the last few percent of archive size."""
+            
+            self.program_output.setPlainText(f"Selected compression method: {combobox_text} - Description:\n{desc_txt}")
+        
+        elif combobox_text == "xz solid (Highest, .tar.xz)":
+            desc_txt = """
+        Pros:
+            1. Solid archive like 7z: log files of the same kind are compressed together, sorted by name and date.
+            2. Needs no extra package, blocks of 16 MB are compressed on all CPU cores.
+        Cons:
+            1. Slowest of all methods.
+            2. Appending late files rewrites the whole archive, extracting one file decompresses everything before it in its block.
+            
+Best for: Long-term storage when 7-Zip is not installed."""
+            
+            self.program_output.setPlainText(f"Selected compression method: {combobox_text} - Description:\n{desc_txt}")
+        
+        elif combobox_text == "zstd dictionary (Many small logs)":
+            desc_txt = """
+        Pros:
+            1. Trains a zstd dictionary per log family (e.g. all *.adminrequest.log files) and compresses every file with it.
+            2. Much better ratio than the other zip methods on many small, similar log files, and compresses faster.
+        Cons:
+            1. Needs the zstandard package, the .zst files inside the zip need zstd and the stored dictionary to be opened.
+            2. No gain for big or one-of-a-kind log files.
+            
+Best for: Directories with thousands of small log files written by the same applications every day."""
+            
+            self.program_output.setPlainText(f"Selected compression method: {combobox_text} - Description:\n{desc_txt}")
+        
+        elif combobox_text == "auto (Best ratio at 10 MB/s)":
+            desc_txt = """
+        Pros:
+            1. Compresses a sample of every archive's files with each available method and picks the smallest one that is still fast enough.
+            2. The decision and the sampled ratios and speeds are shown in the output.
+        Cons:
+            1. Sampling takes a few seconds per archive.
+            2. Archives of different months can end up in different formats.
+            
+Best for: Log directories of unknown content, or when the best method for your logs isn't known yet."""
+            
+            self.program_output.setPlainText(f"Selected compression method: {combobox_text} - Description:\n{desc_txt}")
             
     # Open Log files input folder 
     def open_input_folder(self):
@@ -509,16 +685,123 @@ Best for: Cases where maximum compression is essential, and speed or memory usag
         if folder:
             self.output_folder.setText(folder)
     
+    def init_folder_scanner(self):
+        self.folder_index = None # Index of the current input folder, dropped when the watcher sees the folder change
+        self.folder_watcher = QFileSystemWatcher(self)
+        self.folder_watcher.directoryChanged.connect(self.on_folder_changed)
+        # Restarted by every change, so the folder is only listed once typing stopped
+        self.folder_scan_timer = QTimer(self)
+        self.folder_scan_timer.setSingleShot(True)
+        self.folder_scan_timer.setInterval(FOLDER_SCAN_DELAY)
+        self.folder_scan_timer.timeout.connect(self.request_folder_scan)
+        self.scanner_thread = QThread()
+        self.folder_scanner = FolderScanner()
+        self.folder_scanner.moveToThread(self.scanner_thread)
+        self.folder_scan_requested.connect(self.folder_scanner.scan)
+        self.folder_scanner.scanned.connect(self.on_folder_scanned)
+        self.scanner_thread.start()
+    
+    def stop_folder_scanner(self):
+        # Lets a scan that is still listing a slow share finish, the thread must not outlive the window
+        self.scanner_thread.quit()
+        self.scanner_thread.wait()
+    
     # Statusbar update function
     def update_log_files_count(self, folder):
-        try:
-            log_files = list(Path(folder).glob('*.log'))
-            file_count = len(log_files)
-            self.logfiles_count_statusbar.showMessage(f"Found {file_count} Log Files")
-        except Exception as ex:
-            message = f"An exception of type {type(ex).__name__} occurred. Arguments: {ex.args!r}"
-            self.logfiles_count_statusbar.setStyleSheet("color: #0d47a1")
-            self.logfiles_count_statusbar.showMessage(f"Error counting Log files: {message}")
+        self.folder_scan_timer.start()
+    
+    def request_folder_scan(self):
+        folder = self.input_folder.text().strip()
+        if not folder:
+            self.logfiles_count_statusbar.clearMessage()
+        elif self.folder_index is not None and self.folder_index.path == folder:
+            self.show_folder_index(self.folder_index)
+        else:
+            self.logfiles_count_statusbar.setStyleSheet(STATUSBAR_STYLE)
+            self.logfiles_count_statusbar.showMessage("Counting Log Files...")
+            self.folder_scan_requested.emit(folder)
+    
+    def on_folder_scanned(self, index):
+        if index.path != self.input_folder.text().strip():
+            return # The input changed while this folder was listed, its own scan is already requested
+        # Only the current folder is kept and watched
+        if self.folder_watcher.directories():
+            self.folder_watcher.removePaths(self.folder_watcher.directories())
+        self.folder_index = None
+        if index.error is None:
+            self.folder_index = index
+            self.folder_watcher.addPath(index.path)
+        self.show_folder_index(index)
+        self.preview_timer.start()
+    
+    def on_folder_changed(self, path):
+        # Log files came or went, e.g. deleted by a run: list the folder again once it settles, after the run if one is going on
+        self.folder_index = None
+        if not self.worker_running:
+            self.folder_scan_timer.start()
+    
+    def init_preview(self):
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DELAY)
+        self.preview_timer.timeout.connect(self.update_preview)
+        self.pattern_input.textChanged.connect(self.preview_timer.start)
+        self.enable_date_filter_checkbox.stateChanged.connect(self.preview_timer.start)
+        self.zip_files_older_than.dateTimeChanged.connect(self.preview_timer.start)
+        self.compression_method_combobox.currentTextChanged.connect(self.preview_timer.start)
+    
+    def update_preview(self):
+        # The archives a run would create from the folder's index, each with its files, size and what recent archives of the format suggest
+        self.preview_tree.clear()
+        index = self.folder_index
+        if index is None or index.path != self.input_folder.text().strip():
+            self.preview_label.setText("Preview: waiting for the input folder to be listed")
+            return
+        if self.enable_date_filter_checkbox.isChecked():
+            groups = group_by_modification_month(index.files, self.zip_files_older_than.dateTime().toPython())
+        else:
+            patterns = [p.strip() for p in self.pattern_input.text().split(',') if p.strip()]
+            groups = {archive_name(pattern): files for pattern, files in PatternMatcher(patterns).group(index.files).items() if files}
+        
+        archive_format = COMPRESSION_METHODS[self.compression_method_combobox.currentText()]
+        total_files, total_bytes, estimated_bytes, estimated_seconds = 0, 0, 0, 0.0
+        for name, files in groups.items():
+            size = sum(log_file.size for log_file in files)
+            total_files += len(files)
+            total_bytes += size
+            estimate = self.throughput_history.estimate(archive_format, size)
+            columns = [name, str(len(files)), format_size(size)]
+            if estimate:
+                estimated_bytes += estimate[0]
+                estimated_seconds += estimate[1]
+                columns += [format_size(estimate[0]), str(timedelta(seconds=round(estimate[1])))]
+            archive_item = QTreeWidgetItem(columns)
+            for log_file in files[:PREVIEW_MAX_FILES]:
+                QTreeWidgetItem(archive_item, [log_file.name, "", format_size(log_file.size)])
+            if len(files) > PREVIEW_MAX_FILES:
+                QTreeWidgetItem(archive_item, [f"... and {len(files) - PREVIEW_MAX_FILES} more files"])
+            self.preview_tree.addTopLevelItem(archive_item)
+        
+        summary = f"Preview: {len(groups)} archives with {total_files} files ({format_size(total_bytes)})"
+        if groups and archive_format == "auto":
+            summary += " - no estimate, auto picks the format while it runs"
+        elif groups and self.throughput_history.estimate(archive_format, 1) is None:
+            summary += f" - no estimate for {archive_format} until it was used once"
+        elif groups:
+            summary += f" - estimated {format_size(estimated_bytes)} in {timedelta(seconds=round(estimated_seconds))}"
+        self.preview_label.setText(summary)
+    
+    def show_folder_index(self, index):
+        if index.error:
+            self.logfiles_count_statusbar.setStyleSheet(STATUSBAR_ERROR_STYLE)
+            self.logfiles_count_statusbar.showMessage(f"Error counting Log files: {index.error}")
+            self.logfiles_count_statusbar.setToolTip("")
+            return
+        months = index.months
+        self.logfiles_count_statusbar.setStyleSheet(STATUSBAR_STYLE)
+        self.logfiles_count_statusbar.showMessage(f"Found {len(index.log_files)} Log Files ({index.log_bytes / (1024 * 1024):.1f} MB in {len(months)} months)")
+        # Month histogram by the date in the file names
+        self.logfiles_count_statusbar.setToolTip("\n".join(f"{month}: {count} log files" for month, count in months.items()))
             
         
     def zip_log_files(self):
@@ -526,6 +809,8 @@ Best for: Cases where maximum compression is essential, and speed or memory usag
         output_folder = self.output_folder.text()
         compression_method = self.compression_method_combobox.currentText()
         delete_logfiles_after_zipping = self.delete_logfiles_checkbox.isChecked()
+        append_to_existing_archives = self.append_to_archives_checkbox.isChecked()
+        self.settings.setValue("append_to_archives", append_to_existing_archives)
         patterns = [p.strip() for p in self.pattern_input.text().split(',') if p.strip()]
         date_filter_state = self.enable_date_filter_checkbox.isChecked()
         zip_files_older_than = self.zip_files_older_than.dateTime().toPython() # datetime object
@@ -555,20 +840,27 @@ Best for: Cases where maximum compression is essential, and speed or memory usag
         
         self.program_output.clear()
         
+        # A cancelled run with the same folders is continued, files already in its archives are skipped instead of compressed again
+        if self.settings.value("cancelled_run") == [input_folder, output_folder]:
+            append_to_existing_archives = True
+            self.program_output.appendPlainText("Continuing the cancelled run, files that are already archived are skipped.")
+        
         # Set up worker and thread
         self.thread = QThread()
-        self.worker = Worker(self, input_folder, output_folder, patterns, compression_method, delete_logfiles_after_zipping, date_filter_state, zip_files_older_than)
+        # The background scan is reused if it is of this folder and the watcher saw no change since
+        folder_index = self.folder_index if self.folder_index is not None and self.folder_index.path == input_folder else None
+        self.worker = Worker(self, input_folder, output_folder, patterns, compression_method, delete_logfiles_after_zipping, date_filter_state, zip_files_older_than, append_to_existing_archives, folder_index)
         self.worker.moveToThread(self.thread)
 
         # Connect signals and slots
-        self.worker.progress_updated.connect(self.progress_bar.setValue)
-        self.worker.log_message.connect(self.program_output.append)
         self.worker.finished.connect(self.on_worker_finished)
         self.worker.show_message.connect(self.show_message_box)  
         self.thread.started.connect(self.worker.run)
         
         # Start the thread
         self.thread.start()
+        self.worker_running = True
+        self.output_refresh_timer.start()
         
         # Disable UI elements during processing
         self.set_ui_enabled(False)
@@ -581,18 +873,72 @@ Best for: Cases where maximum compression is essential, and speed or memory usag
         self.zip_button.setEnabled(enabled)
         self.compression_method_combobox.setEnabled(enabled)
         self.delete_logfiles_checkbox.setEnabled(enabled)
+        self.append_to_archives_checkbox.setEnabled(enabled)
         self.zip_files_older_than.setEnabled(enabled)
+        self.pause_button.setEnabled(not enabled)
+        self.pause_button.setText("Pause")
+        self.cancel_button.setEnabled(not enabled)
+
+    def pause_or_resume(self):
+        control = self.worker.control
+        if control.paused:
+            control.resume()
+            self.pause_button.setText("Pause")
+            self.worker.log("Resumed")
+        else:
+            control.pause()
+            self.pause_button.setText("Resume")
+            self.worker.log("Paused - Waiting after the current file")
+    
+    def cancel_run(self):
+        # Remembers the folders, so the next start continues where this run stopped
+        self.settings.setValue("cancelled_run", [self.worker.input_folder, self.worker.output_folder])
+        self.worker.control.cancel()
+        self.pause_button.setEnabled(False)
+        self.cancel_button.setEnabled(False)
+        self.worker.log("Cancelling - The current archive is completed with the files zipped so far")
+
+    def show_worker_messages(self):
+        # One append for everything the worker logged since the last refresh
+        messages = self.worker.take_messages()
+        if messages:
+            self.program_output.appendPlainText("\n".join(messages))
+
+    def show_worker_progress(self):
+        # Share of the input bytes that are archived, with the current throughput and the time left
+        progress = self.worker.progress
+        self.progress_bar.setValue(int(progress.fraction * PROGRESS_STEPS))
+        self.progress_bar.setFormat(f"%p% - {progress.describe()}")
 
     def on_worker_finished(self):
+        self.output_refresh_timer.stop()
+        self.show_worker_messages()
         self.set_ui_enabled(True)
         self.progress_bar.reset()
+        self.progress_bar.setFormat("%p%")
         self.thread.quit()
         self.thread.wait()
+        self.worker_running = False
+        self.folder_scan_timer.start() # The run deleted or added files, the watcher's changes were put off until now
+        for sample in self.worker.throughput:
+            self.throughput_history.record(*sample)
+        self.settings.setValue("throughput_history", self.throughput_history.to_json())
+        if not self.worker.control.is_cancelled:
+            self.settings.remove("cancelled_run")
+        if self.close_after_worker:
+            self.close()
     
     def show_message_box(self, title, message):
         QMessageBox.information(self, title, message)  
 
 if __name__ == "__main__":
+    os.makedirs(log_dir, exist_ok=True)
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s: %(message)s',
+                        datefmt='%d-%m-%Y %H:%M:%S',
+                        handlers=[
+                            logging.FileHandler(log_file),  # Logs to a file
+                        ])
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -0,0 +1,77 @@
+"""CPU time and throughput of reading sources with read()/readinto() versus through a memory mapping.
+
+One synthetic log file per size is written once and then archived repeatedly with both reading
+modes, alternating between them so both see the same warm page cache. Both member paths are
+measured: "stream" (stream_member, files at or above the stream threshold) and "memory"
+(compress_member, smaller files compressed in one piece). user and sys are the CPU seconds of
+this process, the best of --repeat runs is reported.
+
+Usage:
+    python benchmarks/mmap_reading.py --sizes 0.05 0.5 2 --compression stored deflate
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logzipper.parallel_zip import DEFAULT_CHUNK_SIZE, compress_member, stream_member, write_compressed_member
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from streaming_memory import COMPRESSION_METHODS, write_synthetic_log
+
+# mmap_threshold per reading mode
+READING_MODES = {"read": None, "mmap": 0}
+
+
+def archive_once(file_path: str, zip_path: str, path: str, compression: int, chunk_size: int, mmap_threshold) -> tuple[float, float, float, int]:
+    """Archive file_path once, returns (wall seconds, user seconds, sys seconds, CRC of the member)."""
+    start_times, start = os.times(), time.perf_counter()
+    with zipfile.ZipFile(zip_path, "w") as zipf:
+        if path == "stream":
+            stream_member(zipf, file_path, "member.log", compression, chunk_size=chunk_size, mmap_threshold=mmap_threshold)
+        else:
+            write_compressed_member(zipf, compress_member(file_path, "member.log", compression, mmap_threshold=mmap_threshold))
+        crc = zipf.getinfo("member.log").CRC
+    elapsed, end_times = time.perf_counter() - start, os.times()
+    return elapsed, end_times.user - start_times.user, end_times.system - start_times.system, crc
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.05, 0.5], help="File sizes in GB")
+    parser.add_argument("--compression", choices=COMPRESSION_METHODS, nargs="+", default=["stored", "deflate"])
+    parser.add_argument("--paths", choices=["stream", "memory"], nargs="+", default=["stream", "memory"])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workdir", help="Directory for the synthetic files (needs room for twice the biggest size)")
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'compression':>11} {'path':>6} {'mode':>5} {'seconds':>8} {'user':>7} {'sys':>7} {'MB/s':>8}")
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        file_path = os.path.join(workdir, "2024_03_01_synthetic.log")
+        zip_path = os.path.join(workdir, "2024-03.zip")
+        for size_gb in args.sizes:
+            write_synthetic_log(file_path, int(size_gb * 1024 ** 3))
+            size_mb = os.path.getsize(file_path) / (1024 * 1024)
+            for compression in args.compression:
+                for path in args.paths:
+                    best = {mode: None for mode in READING_MODES}
+                    crcs = set()
+                    for _ in range(args.repeat):
+                        for mode, mmap_threshold in READING_MODES.items():
+                            *timing, crc = archive_once(file_path, zip_path, path, COMPRESSION_METHODS[compression], args.chunk_size, mmap_threshold)
+                            crcs.add(crc)
+                            if best[mode] is None or timing[0] < best[mode][0]:
+                                best[mode] = timing
+                    if len(crcs) != 1:
+                        raise RuntimeError(f"The reading modes wrote different data for {compression}/{path}")
+                    for mode, (seconds, user, system) in best.items():
+                        print(f"{size_mb:>6.0f}MB {compression:>11} {path:>6} {mode:>5} {seconds:>8.2f} {user:>7.2f} {system:>7.2f} {size_mb / seconds:>8.1f}")
+            os.unlink(zip_path)
+
+
+if __name__ == "__main__":
+    main()
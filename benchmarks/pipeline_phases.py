@@ -0,0 +1,236 @@
+"""Time the discovery, grouping and pipeline phases of every entry point on a synthetic log tree.
+
+One synthetic tree is generated in a temp directory and copied fresh for every combination
+of entry point and archive format, so every run starts from the same files. Only wall clock
+time is measured, it includes the I/O wait that process_time leaves out.
+
+Every entry point runs its archives through logzipper.pipeline.run_pipeline (build, verify,
+delete) with the PipelineOptions, threads per archive and job options it uses itself:
+    scripts  one run over the whole tree, archive and verification process pools (3-month scripts)
+    gui      one run per directory, one archive at a time on threads, append (LogfileZipperGUI Worker)
+    cli      one run per directory, one archive at a time on threads (LogfileZipper.py)
+
+Discovery and grouping are timed before the pipeline starts, the scripts overlap them with it.
+The stages of the pipeline overlap as well, so "pipeline" is its wall clock time, while
+"compression" and "verification" are the busy times of those stages, summed over their workers.
+
+Usage:
+    python benchmarks/pipeline_phases.py --formats zip-deflate zip-bz2 tar.zst --entry-points scripts gui --output results.json
+    python benchmarks/pipeline_phases.py --file-size 4000000 --entropy 0.5 --output results.csv
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logzipper.archive import ArchiveJob, create_archive_jobs
+from logzipper.backends import ARCHIVE_FORMATS, create_backend
+from logzipper.deletion import DEFAULT_DELETE_WORKERS
+from logzipper.pipeline import PipelineOptions, run_pipeline
+from logzipper.scanner import discover_directories, scan_directory
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic_tree import add_tree_arguments, write_synthetic_tree
+
+ENTRY_POINTS = ["scripts", "gui", "cli"]
+
+
+@dataclass
+class EntryPoint:
+    """How an entry point drives the pipeline."""
+    options: PipelineOptions
+    threads: int  # Threads compressing one archive
+    append: bool  # Add to existing archives, see ArchiveJob.append
+    per_directory: bool  # One run per directory (the GUI's input folder, the CLI's log directory) instead of one over the tree
+
+
+def entry_point_settings(entry_point: str, args) -> EntryPoint:
+    """Settings of Zip_log_files_older_than_3_months.py, the LogfileZipperGUI Worker and LogfileZipper.py."""
+    if entry_point == "scripts":
+        return EntryPoint(PipelineOptions(args.workers, args.workers, DEFAULT_DELETE_WORKERS), args.threads, append=True, per_directory=False)
+    # The GUI and the CLI build one archive at a time on threads, with one thread per CPU core inside each archive
+    options = PipelineOptions(archive_workers=1, verify_workers=1, processes=False)
+    return EntryPoint(options, os.cpu_count() or 1, append=entry_point == "gui", per_directory=True)
+
+
+@dataclass
+class PhaseResult:
+    """Timing of one phase of one run, one row of the output."""
+    entry_point: str
+    archive_format: str
+    phase: str
+    seconds: float
+    files: int
+    megabytes: float  # Uncompressed log data the phase handled
+    archive_megabytes: float = 0.0  # Size of the archives written, only for the pipeline
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.megabytes / self.seconds if self.seconds else 0.0
+
+    def as_row(self) -> dict:
+        return {**asdict(self), "mb_per_second": round(self.mb_per_second, 2)}
+
+
+class PhaseTimer:
+    """Collects the PhaseResults of one run."""
+
+    def __init__(self, entry_point: str, archive_format: str):
+        self.entry_point = entry_point
+        self.archive_format = archive_format
+        self.results: dict[str, PhaseResult] = {}
+
+    def add(self, phase: str, seconds: float, files: int, size: int, archive_size: int = 0) -> None:
+        # Phases of the per-directory entry points and the stages of every archive are measured in slices and summed up
+        result = self.results.setdefault(phase, PhaseResult(self.entry_point, self.archive_format, phase, 0.0, 0, 0.0))
+        result.seconds += seconds
+        result.files += files
+        result.megabytes += size / (1024 * 1024)
+        result.archive_megabytes += archive_size / (1024 * 1024)
+
+
+def group_by_month(files) -> dict:
+    monthly_files = defaultdict(list)
+    for log_file in files:
+        if log_file.year_month:
+            monthly_files[log_file.year_month].append(log_file)
+    return monthly_files
+
+
+def time_pipeline(jobs: list[ArchiveJob], options: PipelineOptions, timer: PhaseTimer) -> None:
+    """Run jobs through the pipeline, the wall clock time as "pipeline" and the busy time of its stages per archive."""
+    start = time.perf_counter()
+    results = list(run_pipeline(jobs, options))
+    archive_size = sum(os.path.getsize(r.job.archive_path) for r in results if r.ok and os.path.exists(r.job.archive_path))
+    timer.add("pipeline", time.perf_counter() - start, sum(len(r.deleted) for r in results), sum(job.input_bytes for job in jobs), archive_size)
+    for result in results:
+        timer.add("compression", result.duration, result.files_zipped, result.job.input_bytes)
+        if result.verification:
+            timer.add("verification", result.verification.duration, len(result.verification.passed), result.verification.bytes_checked)
+
+
+def run_tree(root: str, backend, settings: EntryPoint, timer: PhaseTimer) -> None:
+    """The scripts discover the whole tree and run all its archives through one pipeline."""
+    start = time.perf_counter()
+    scans = [scan for scan in discover_directories(root, max_depth=1) if not scan.error]
+    timer.add("discovery", time.perf_counter() - start, sum(len(s.files) for s in scans), sum(f.size for s in scans for f in s.files))
+
+    start = time.perf_counter()
+    jobs = []
+    for scan in scans:
+        jobs.extend(create_archive_jobs(group_by_month(scan.files), scan.path, backend=backend, append=settings.append, delete_files=True))
+    files = [f for job in jobs for f in job.files]
+    timer.add("grouping", time.perf_counter() - start, len(files), sum(f.size for f in files))
+
+    time_pipeline(jobs, settings.options, timer)
+
+
+def run_per_directory(root: str, backend, settings: EntryPoint, timer: PhaseTimer) -> None:
+    """The GUI and the interactive CLI handle one directory at a time, this runs them over every directory of the tree."""
+    directories = [root] + sorted(entry.path for entry in os.scandir(root) if entry.is_dir())
+    for directory in directories:
+        start = time.perf_counter()
+        files = scan_directory(directory).files
+        timer.add("discovery", time.perf_counter() - start, len(files), sum(f.size for f in files))
+
+        start = time.perf_counter()
+        jobs = create_archive_jobs(group_by_month(files), directory, backend=backend, append=settings.append, delete_files=True)
+        timer.add("grouping", time.perf_counter() - start, len(files), sum(f.size for f in files))
+
+        time_pipeline(jobs, settings.options, timer)
+
+
+def run_entry_point(entry_point: str, archive_format: str, root: str, args) -> list[PhaseResult]:
+    timer = PhaseTimer(entry_point, archive_format)
+    settings = entry_point_settings(entry_point, args)
+    backend = create_backend(archive_format, args.level, settings.threads)
+    if settings.per_directory:
+        run_per_directory(root, backend, settings, timer)
+    else:
+        run_tree(root, backend, settings, timer)
+    phases = list(timer.results.values())
+    # The stage busy times overlap with the pipeline's wall clock time, only the sequential phases add up
+    wall_clock = sum(timer.results[phase].seconds for phase in ("discovery", "grouping", "pipeline"))
+    phases.append(PhaseResult(entry_point, archive_format, "total", wall_clock,
+                              timer.results["grouping"].files, timer.results["grouping"].megabytes,
+                              timer.results["pipeline"].archive_megabytes))
+    return phases
+
+
+def version() -> str:
+    """git describe of the checkout, so results of different versions can be told apart."""
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_output(path: str, metadata: dict, phases: list[PhaseResult]) -> None:
+    rows = [phase.as_row() for phase in phases]
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            # Metadata goes into every row, so CSV files of several versions can simply be concatenated
+            writer = csv.DictWriter(f, fieldnames=[*metadata, *rows[0]])
+            writer.writeheader()
+            writer.writerows({**metadata, **row} for row in rows)
+    else:
+        with open(path, "w") as f:
+            json.dump({**metadata, "phases": rows}, f, indent=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_tree_arguments(parser)
+    parser.add_argument("--entry-points", nargs="+", choices=ENTRY_POINTS, default=ENTRY_POINTS)
+    parser.add_argument("--formats", nargs="+", choices=ARCHIVE_FORMATS, default=["zip-deflate", "zip-bz2", "zip-lzma"])
+    parser.add_argument("--level", type=int, default=None, help="Compression level, default = the format's default")
+    parser.add_argument("--threads", type=int, default=1, help="Threads per archive of the scripts entry point (COMPRESSION_THREADS)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Archive and verification workers of the scripts entry point (ARCHIVE_WORKERS, VERIFY_WORKERS)")
+    parser.add_argument("--workdir", help="Directory for the synthetic trees, default = system temp directory")
+    parser.add_argument("--output", help="Write the results to this .json or .csv file")
+    args = parser.parse_args()
+
+    metadata = {
+        "version": version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "subdirs": args.subdirs,
+        "months": args.months,
+        "files_per_month": args.files_per_month,
+        "file_size": args.file_size,
+        "entropy": args.entropy,
+    }
+    phases = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        template = os.path.join(workdir, "template")
+        files, total_size = write_synthetic_tree(template, args.subdirs, args.months, args.files_per_month, args.file_size, args.entropy, args.seed)
+        print(f"Synthetic tree: {files} log files, {total_size / (1024 * 1024):.1f} MB")
+        print(f"{'entry point':<12} {'format':<12} {'phase':<13} {'seconds':>9} {'files':>7} {'MB':>9} {'MB/s':>9}")
+        for entry_point in args.entry_points:
+            for archive_format in args.formats:
+                root = os.path.join(workdir, "run")
+                shutil.copytree(template, root)
+                for phase in run_entry_point(entry_point, archive_format, root, args):
+                    phases.append(phase)
+                    print(f"{entry_point:<12} {archive_format:<12} {phase.phase:<13} {phase.seconds:>9.3f} {phase.files:>7} "
+                          f"{phase.megabytes:>9.1f} {phase.mb_per_second:>9.1f}")
+                shutil.rmtree(root)
+
+    if args.output:
+        write_output(args.output, metadata, phases)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Peak memory of streaming one big synthetic log file into a zip archive.
+
+Every size runs in a fresh process, so the reported peak RSS belongs to that size alone.
+With streaming it stays flat from a few hundred MB up to 5 GB and beyond.
+The synthetic file of the biggest size and its archive are written to --workdir (default: the
+system's temp directory), the default sizes need up to 2 GB, sizes of several GB are opt-in.
+
+Usage:
+    python benchmarks/streaming_memory.py --sizes 0.25 1 --compression deflate
+    python benchmarks/streaming_memory.py --sizes 0.25 1 5 --workdir D:\\bench
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logzipper.parallel_zip import DEFAULT_CHUNK_SIZE, stream_member
+
+# File sizes in GB measured when --sizes is not given
+DEFAULT_SIZES = [0.25, 1]
+
+COMPRESSION_METHODS = {
+    "stored": zipfile.ZIP_STORED,
+    "deflate": zipfile.ZIP_DEFLATED,
+    "bz2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return peak_working_set_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def peak_working_set_mb() -> float:
+    """Peak working set of the current process in MB, read with GetProcessMemoryInfo so Windows needs no extra package."""
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in ("PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                                                 "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    kernel32.K32GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+    counters = ProcessMemoryCounters(cb=ctypes.sizeof(ProcessMemoryCounters))
+    if not kernel32.K32GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        raise ctypes.WinError()
+    return counters.PeakWorkingSetSize / (1024 * 1024)
+
+
+def write_synthetic_log(path: str, size: int) -> None:
+    """Write a log file of exactly size bytes out of one repeated block of log lines."""
+    rng = random.Random(42)
+    levels = ["INFO", "INFO", "INFO", "WARN", "ERROR", "DEBUG"]
+    lines = [f"2024-03-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} "
+             f"{rng.choice(levels)} [worker-{rng.randint(1, 16)}] request {rng.getrandbits(64):016x} finished in {rng.randint(1, 5000)} ms\n"
+             for _ in range(100_000)]
+    block = "".join(lines).encode()
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            written += f.write(block[:size - written])
+
+
+def run_child(file_path: str, compression: str, chunk_size: int) -> None:
+    """Stream file_path into a zip next to it and print the measurements as JSON."""
+    baseline = peak_rss_mb()
+    zip_path = file_path + ".zip"
+    start = time.perf_counter()
+    with zipfile.ZipFile(zip_path, "w") as zipf:
+        stream_member(zipf, file_path, os.path.basename(file_path), COMPRESSION_METHODS[compression], chunk_size=chunk_size)
+    elapsed = time.perf_counter() - start
+    result = {
+        "size_mb": os.path.getsize(file_path) / (1024 * 1024),
+        "archive_mb": os.path.getsize(zip_path) / (1024 * 1024),
+        "seconds": elapsed,
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    os.unlink(zip_path)
+    print(json.dumps(result))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=DEFAULT_SIZES, help="File sizes in GB, e.g. 0.25 1 5")
+    parser.add_argument("--compression", choices=COMPRESSION_METHODS, default="deflate")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workdir", help="Directory for the synthetic files (needs room for the biggest size)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.compression, args.chunk_size)
+        return
+
+    # The file of the biggest size and its archive are on disk at the same time, stored if nothing else
+    needed = 2 * max(args.sizes) * 1024 ** 3
+    free = shutil.disk_usage(args.workdir or tempfile.gettempdir()).free
+    if needed > free:
+        parser.error(f"--sizes needs up to {needed / 1024 ** 3:.1f} GB of disk space, only {free / 1024 ** 3:.1f} GB are free, pick another --workdir")
+
+    print(f"{'size':>10} {'archive':>10} {'seconds':>9} {'MB/s':>8} {'baseline RSS':>13} {'peak RSS':>10}")
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        file_path = os.path.join(workdir, "2024_03_01_synthetic.log")
+        for size_gb in args.sizes:
+            write_synthetic_log(file_path, int(size_gb * 1024 ** 3))
+            output = subprocess.run([sys.executable, __file__, "--child", file_path, "--compression", args.compression,
+                                     "--chunk-size", str(args.chunk_size)], check=True, capture_output=True, text=True).stdout
+            r = json.loads(output)
+            print(f"{r['size_mb']:>8.0f}MB {r['archive_mb']:>8.1f}MB {r['seconds']:>9.1f} {r['size_mb'] / r['seconds']:>8.1f} "
+                  f"{r['baseline_rss_mb']:>11.1f}MB {r['peak_rss_mb']:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
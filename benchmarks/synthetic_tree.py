@@ -0,0 +1,86 @@
+"""Synthetic log directory trees for the benchmarks.
+
+Files are named like the real logs (yyyy_mm_dd_<app>.log) and spread over subdirectories
+and months. entropy controls how compressible they are: every line is template text plus
+a run of random hex, 0 = template text only, 1 = 64 random hex characters per line.
+
+Usage:
+    python benchmarks/synthetic_tree.py C:\\temp\\synthetic --subdirs 4 --months 6 --files-per-month 20 --file-size 2000000
+"""
+import argparse
+import os
+import random
+
+LEVELS = ["INFO", "INFO", "INFO", "INFO", "DEBUG", "WARN", "ERROR"]
+MESSAGES = [
+    "request finished",
+    "connection opened to partner system",
+    "message received, forwarding to queue",
+    "job started by scheduler",
+    "retrying delivery after timeout",
+    "profile executed successfully",
+    "cache refreshed",
+]
+
+
+def write_synthetic_log(path: str, size: int, entropy: float, rng: random.Random, year_month: tuple[int, int]) -> None:
+    """Write one log file of about size bytes."""
+    year, month = year_month
+    random_chars = int(64 * entropy)
+    lines = []
+    written = 0
+    while written < size:
+        random_part = rng.randbytes(random_chars // 2).hex() if random_chars else ""
+        line = (f"{year}-{month:02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+                f" {rng.choice(LEVELS)} [worker-{rng.randint(1, 16)}] {rng.choice(MESSAGES)} in {rng.randint(1, 5000)} ms {random_part}\n")
+        lines.append(line)
+        written += len(line)
+    with open(path, "w", encoding="ascii") as f:
+        f.writelines(lines)
+
+
+def write_synthetic_tree(root: str, subdirs: int = 2, months: int = 3, files_per_month: int = 10, file_size: int = 256 * 1024,
+                         entropy: float = 0.25, seed: int = 42) -> tuple[int, int]:
+    """Create root with its own logs and subdirs subdirectories, returns (files, bytes) written.
+
+    Every directory gets files_per_month files for each of the months, starting at January 2023.
+    File sizes vary by +-50% around file_size.
+    """
+    rng = random.Random(seed)
+    files = total_size = 0
+    directories = [root] + [os.path.join(root, f"app{index:02d}") for index in range(1, subdirs + 1)]
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+        for month_index in range(months):
+            year_month = (2023 + month_index // 12, month_index % 12 + 1)
+            for file_index in range(files_per_month):
+                day = file_index % 28 + 1
+                name = f"{year_month[0]}_{year_month[1]:02d}_{day:02d}_{os.path.basename(directory)}_{file_index}.log"
+                size = int(file_size * rng.uniform(0.5, 1.5))
+                write_synthetic_log(os.path.join(directory, name), size, entropy, rng, year_month)
+                files += 1
+                total_size += size
+    return files, total_size
+
+
+def add_tree_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options describing a synthetic tree, shared by the benchmarks."""
+    parser.add_argument("--subdirs", type=int, default=2, help="Subdirectories next to the root's own logs")
+    parser.add_argument("--months", type=int, default=3, help="Months of logs in every directory")
+    parser.add_argument("--files-per-month", type=int, default=10, help="Log files per month and directory")
+    parser.add_argument("--file-size", type=int, default=256 * 1024, help="Average log file size in bytes")
+    parser.add_argument("--entropy", type=float, default=0.25, help="0 = very compressible template text, 1 = a lot of random data")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="Directory to create the tree in")
+    add_tree_arguments(parser)
+    args = parser.parse_args()
+    files, total_size = write_synthetic_tree(args.root, args.subdirs, args.months, args.files_per_month, args.file_size, args.entropy, args.seed)
+    print(f"Wrote {files} log files ({total_size / (1024 * 1024):.1f} MB) to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Shared archiving core used by the LogfileZipper CLI scripts and the GUI."""
@@ -0,0 +1,286 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional
+from zlib import crc32
+
+from logzipper.backends import ArchiveBackend, Member, MemberIndex, ZipBackend
+from logzipper.control import RunControl
+from logzipper.parallel_zip import DEFAULT_CHUNK_SIZE, DEFAULT_STREAM_THRESHOLD
+from logzipper.scanner import LogFileEntry
+
+if TYPE_CHECKING:
+    from logzipper.verify import ArchiveVerification
+
+# Archives are written under this suffix and renamed once they are complete
+PARTIAL_SUFFIX = ".partial"
+
+
+@dataclass
+class ArchiveJob:
+    """One independent (directory, month) archive to build."""
+    base_path: str  # Directory of the log files
+    year_month: str  # Name of the archive without its extension, the GUI names archives after its patterns
+    files: list[LogFileEntry]
+    backend: ArchiveBackend = field(default_factory=ZipBackend)  # Archive format, with its level and thread count
+    delete_files: bool = False  # Delete the archived log files in the pipeline's delete stage, see logzipper.pipeline
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    stream_threshold: int = DEFAULT_STREAM_THRESHOLD  # Files this big are streamed instead of read whole
+    max_file_size: Optional[int] = None  # Files above this size are left untouched, None = no limit
+    append: bool = False  # Add only new files to an existing archive instead of overwriting it
+    verify: bool = True  # Read the archive back, only files whose members passed are deleted
+    archived_paths: frozenset = frozenset()  # Files the run state knows are already in this archive, unchanged
+    output_path: Optional[str] = None  # Directory the archive is written to, None = base_path
+
+    @property
+    def archive_filename(self) -> str:
+        return f"{self.year_month}{self.backend.extension}"
+
+    @property
+    def archive_path(self) -> str:
+        return os.path.join(self.output_path or self.base_path, self.archive_filename)
+
+    @property
+    def input_bytes(self) -> int:
+        return sum(log_file.size for log_file in self.files)
+
+
+@dataclass
+class ArchiveCheck:
+    """Listing of a written archive, taken before it is renamed into place."""
+    members: MemberIndex = field(default_factory=dict)
+    duration: float = 0.0
+
+
+@dataclass
+class ArchiveResult:
+    """Outcome of one archive job, returned to the parent process."""
+    job: ArchiveJob
+    files_zipped: int = 0
+    files_already_archived: int = 0
+    duration: float = 0.0
+    error: Optional[str] = None
+    file_paths: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    conflicts: list[str] = field(default_factory=list)  # In the archive already, but with different content
+    written: dict[str, tuple[int, int]] = field(default_factory=dict)  # {arcname: (size, crc)} of the members written by this job
+    archived: dict[str, tuple[int, int]] = field(default_factory=dict)  # {arcname: (size, crc)} of the members that were in the archive already
+    unverified: list[str] = field(default_factory=list)  # Written, but their members failed verification
+    deleted: list[str] = field(default_factory=list)
+    delete_errors: list[str] = field(default_factory=list)
+    verification: Optional["ArchiveVerification"] = None  # Set by the verification stage
+    check: Optional[ArchiveCheck] = None  # Listing of the archive before the rename, see write_archive
+    cancelled: bool = False  # The run was cancelled before every file was written, the archive holds the ones before
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class MemberSelection:
+    """Members split by what an existing archive already contains."""
+    new: list = field(default_factory=list)
+    already_archived: list = field(default_factory=list)
+    conflicts: list = field(default_factory=list)
+    existing: MemberIndex = field(default_factory=dict)  # Listing of the existing archive
+
+
+def file_crc32(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """CRC32 of a file as stored in zip headers, read in chunks."""
+    crc = 0
+    with open(file_path, "rb") as src:
+        while chunk := src.read(chunk_size):
+            crc = crc32(chunk, crc)
+    return crc
+
+
+def read_existing_members(archive_path: str, backend: ArchiveBackend, members: Iterable[Member],
+                          trusted_paths: frozenset = frozenset()) -> MemberSelection:
+    """Check members against an existing archive, they are all new when there is none yet."""
+    if not os.path.exists(archive_path):
+        return MemberSelection(new=list(members))
+    return select_new_members(backend.list_members(archive_path), members, trusted_paths)
+
+
+def fsync_path(path: str) -> None:
+    """Flush a file, or on POSIX a directory entry, to disk."""
+    is_directory = os.path.isdir(path)
+    if is_directory and os.name == "nt":
+        return  # Windows can't open directories, its renames are journaled by NTFS anyway
+    # Windows flushes through FlushFileBuffers, which needs a handle with write access
+    fd = os.open(path, os.O_RDONLY if is_directory else os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def check_archive(archive_path: str, backend: ArchiveBackend, expected: MemberIndex) -> MemberIndex:
+    """List a written archive again and compare the members with the {arcname: (size, crc)} the writer recorded.
+
+    Returns the listing, which for backends with listing_decompresses is a complete read back.
+    """
+    listed = backend.list_members(archive_path)
+    different = sorted(arcname for arcname, member in expected.items() if listed.get(arcname) != member)
+    if different:
+        raise OSError(f"Archive '{archive_path}' does not match what was written (missing or different: {different})")
+    return listed
+
+
+def write_archive(archive_path: str, backend: ArchiveBackend, members: Iterable[Member], append: bool = False,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, stream_threshold: int = DEFAULT_STREAM_THRESHOLD,
+                  check: Optional[ArchiveCheck] = None) -> Iterator[tuple[str, int, int]]:
+    """Write members as archive_path.partial and only move it over archive_path once it is complete.
+
+    Yields (arcname, size, crc) for every member written. With append the members of the
+    existing archive are carried over, the archive itself stays untouched until the rename.
+    Once the last member is written, the partial archive is fsynced, checked against what was
+    written and atomically renamed, before the loop over this generator ends. On any error, or
+    when the caller stops early, the partial file is removed and archive_path is left exactly
+    as it was, so sources must only be deleted after the generator is exhausted.
+    check, if given, receives the listing of that check and how long it took.
+    """
+    partial_path = archive_path + PARTIAL_SUFFIX
+    append_from = archive_path if append and os.path.exists(archive_path) else None
+    written = {}
+    try:
+        for arcname, size, crc in backend.write(partial_path, members, append_from, chunk_size, stream_threshold):
+            written[arcname] = (size, crc)
+            yield arcname, size, crc
+        fsync_path(partial_path)
+        check_start = time.perf_counter()
+        listed = check_archive(partial_path, backend, written)
+        if check is not None:
+            check.members, check.duration = listed, time.perf_counter() - check_start
+        os.replace(partial_path, archive_path)
+        fsync_path(os.path.dirname(os.path.abspath(archive_path)))
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+        raise
+
+
+def select_new_members(existing: MemberIndex, members: Iterable[Member], trusted_paths: frozenset = frozenset()) -> MemberSelection:
+    """Split (file_path, arcname, size) members against the {arcname: (size, crc)} of an existing archive.
+
+    A member with the same name, size and CRC is already archived. The CRC is only computed
+    when name and size match, so a new archive or a few late files cost no extra reads, and
+    it is skipped entirely for trusted_paths, which an earlier run recorded as archived.
+    """
+    selection = MemberSelection(existing=existing)
+    for member in members:
+        file_path, arcname, size = member
+        archived = existing.get(arcname)
+        if archived is None:
+            selection.new.append(member)
+        elif archived[0] == size and (file_path in trusted_paths or archived[1] == file_crc32(file_path)):
+            selection.already_archived.append(member)
+        else:
+            selection.conflicts.append(member)
+    return selection
+
+
+def create_archive_jobs(monthly_files: dict, base_path: str, **job_options) -> list[ArchiveJob]:
+    """Turn the {yyyy-mm: [LogFileEntry]} mapping of one directory into archive jobs.
+
+    job_options are passed on to every ArchiveJob (backend, delete_files, append, ...).
+    """
+    return [ArchiveJob(base_path, year_month, list(files), **job_options)
+            for year_month, files in monthly_files.items()]
+
+
+def build_month_archive(job: ArchiveJob, progress: Optional[Callable[[int], None]] = None,
+                        control: Optional[RunControl] = None) -> ArchiveResult:
+    """Build the archive of one job. Runs inside a pool worker, so it must not rely on the caller's logging setup.
+
+    progress is called with the size of every member written and, once the job is done, with the
+    rest of its input bytes (skipped, already archived or lost to an error), so the calls of one
+    job always add up to job.input_bytes. control pauses the job between two members, or ends it
+    early with an archive of the members written so far, which a later run with append completes.
+    Formats that take all members up front (7z, tar, zstd-dict) only see it before they start.
+    Both are only usable when the job runs in the caller's process.
+    """
+    start = time.perf_counter()
+    result = ArchiveResult(job)
+    if control is not None and not control.proceed():
+        result.cancelled = True  # Cancelled while this job waited for a worker, nothing is written
+        return result
+    reported = 0
+    try:
+        # Store every file in the archive with its original name
+        members = []
+        for log_file in job.files:
+            if job.max_file_size is not None and log_file.size > job.max_file_size:
+                result.skipped.append(log_file.path)
+                continue
+            members.append((log_file.path, log_file.name, log_file.size))
+
+        listing_start = time.perf_counter()
+        if job.append:
+            selection = read_existing_members(job.archive_path, job.backend, members, job.archived_paths)
+        else:
+            selection = MemberSelection(new=members)
+        listing_duration = time.perf_counter() - listing_start
+        # Files that are in the archive already count as archived, so they are cleaned up as well,
+        # once the verification stage read their members back like the ones written now
+        archived_paths = [file_path for file_path, _, _ in selection.already_archived]
+        result.archived = {arcname: selection.existing[arcname] for _, arcname, _ in selection.already_archived}
+        result.files_already_archived = len(archived_paths)
+        result.conflicts.extend(file_path for file_path, _, _ in selection.conflicts)
+
+        # Nothing is written when every file of the month was skipped or is archived already
+        if selection.new:
+            new_members = selection.new
+            if control is not None:
+                # The first member is always written, so a started archive is never left empty
+                new_members = chain(new_members[:1], control.iterate(new_members[1:]))
+            # Solid archives are decompressed completely by the check, the verification stage reuses its listing
+            result.check = ArchiveCheck() if job.backend.listing_decompresses else None
+            for arcname, size, crc in write_archive(job.archive_path, job.backend, new_members, job.append,
+                                                    job.chunk_size, job.stream_threshold, result.check):
+                archived_paths.append(os.path.join(job.base_path, arcname))
+                result.written[arcname] = (size, crc)
+                if progress is not None:
+                    progress(size)
+                    reported += size
+            result.files_zipped = len(result.written)
+            result.cancelled = result.files_zipped < len(selection.new)
+        elif result.archived and job.backend.listing_decompresses:
+            # The listing of the existing archive decompressed it completely
+            result.check = ArchiveCheck(selection.existing, listing_duration)
+        result.file_paths = archived_paths
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    if progress is not None and not result.cancelled:
+        progress(job.input_bytes - reported)
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def map_in_order(function: Callable, items: Iterable, workers: Optional[int] = None) -> Iterator:
+    """Run function over items and yield the return values in item order.
+
+    With workers == 1 everything runs one after another in the current process,
+    otherwise on a process pool (None = one worker per CPU core). items may be a
+    generator that is still producing work, every item is handed to the pool as
+    soon as it arrives.
+    """
+    if workers == 1:
+        for item in items:
+            yield function(item)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            # Hand back finished results early, but never out of submission order
+            while pending and pending[0].done():
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
@@ -0,0 +1,162 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from logzipper.backends import ArchiveBackend, create_backend
+from logzipper.scanner import LogFileEntry, log_family
+
+# Bytes sampled from the files of one archive to compare the candidates
+DEFAULT_SAMPLE_SIZE: int = 2 * 1024 * 1024
+# Files the sample is spread over, from the start of each
+SAMPLE_FILES: int = 8
+
+# (archive format, level) pairs the auto mode chooses from, level None = the format's default.
+# Only cheap and mid levels, every candidate costs a compression of the sample
+DEFAULT_CANDIDATES: list[tuple[str, Optional[int]]] = [
+    ("zip-deflate", 6),
+    ("zip-bz2", 9),
+    ("7z", 1),
+    ("tar.zst", 3),
+    ("tar.zst", 9),
+]
+# Slow high-ratio levels, rarely faster than the usual throughput targets. Pass
+# DEFAULT_CANDIDATES + HIGH_RATIO_CANDIDATES to consider them anyway, e.g. with a long time window
+HIGH_RATIO_CANDIDATES: list[tuple[str, Optional[int]]] = [
+    ("zip-lzma", None),
+    ("7z", 5),
+    ("tar.zst", 19),
+]
+# Relative change of the ratio against the sample a choice was made on, beyond it all candidates are sampled again
+DEFAULT_RATIO_DRIFT: float = 0.15
+
+
+@dataclass
+class CodecTrial:
+    """How one candidate did on the sample."""
+    backend: ArchiveBackend
+    ratio: float  # Uncompressed / compressed size
+    mb_per_second: float  # Estimated for the whole archive, i.e. the sample speed times the backend's threads
+
+    def __str__(self) -> str:
+        level = "default" if self.backend.level is None else self.backend.level
+        return f"{self.backend.name}/{level} {self.ratio:.1f}x {self.mb_per_second:.1f} MB/s"
+
+
+@dataclass
+class CodecDecision:
+    """Backend chosen for one archive, with the trials it was chosen from."""
+    backend: ArchiveBackend
+    reason: str
+    trials: list[CodecTrial] = field(default_factory=list)
+    sample_size: int = 0
+
+    def __str__(self) -> str:
+        tried = ", ".join(str(trial) for trial in self.trials)
+        level = "default" if self.backend.level is None else self.backend.level
+        return f"{self.backend.name} level {level} ({self.reason}; sampled {self.sample_size / (1024 * 1024):.1f} MB: {tried})"
+
+
+class CodecSelector:
+    """Picks the format and level of each archive by compressing a sample of its files with every candidate.
+
+    The best compressing candidate wins that is at least min_throughput MB/s fast and, with a
+    time_window, whose estimated time still fits into what is left of the window. The window is
+    a budget over all archives of the run: every decision books its estimated time, spread over
+    the archive workers running in parallel. When no candidate qualifies the fastest one is used.
+    Sample speeds are single-threaded and assumed to scale linearly with the threads.
+
+    The choice is kept per directory and mix of log families, the months of one application
+    compress alike. The next archive of the same kind samples only the kept candidate, all of
+    them are sampled again once its ratio drifts by more than ratio_drift or it misses the targets.
+    """
+
+    def __init__(self, candidates: Optional[list[tuple[str, Optional[int]]]] = None, min_throughput: Optional[float] = None,
+                 time_window: Optional[float] = None, workers: int = 1, threads: int = 1, sample_size: int = DEFAULT_SAMPLE_SIZE,
+                 block_size: Optional[int] = None, ratio_drift: float = DEFAULT_RATIO_DRIFT):
+        self.min_throughput = min_throughput
+        self.time_window = time_window
+        self.workers = workers
+        self.sample_size = sample_size
+        self.ratio_drift = ratio_drift
+        self.booked_seconds = 0.0
+        self.choices: dict[tuple, CodecTrial] = {}  # Chosen trial per choice_key
+        self.backends = []
+        for archive_format, level in candidates or DEFAULT_CANDIDATES:
+            try:
+                self.backends.append(create_backend(archive_format, level, threads, block_size))
+            except RuntimeError:
+                continue  # Optional package of the format is not installed
+        if not self.backends:
+            raise ValueError("None of the auto mode's candidate formats is available")
+
+    def read_sample(self, files: list[LogFileEntry]) -> bytes:
+        """Up to sample_size bytes, taken from the start of up to SAMPLE_FILES files spread over the list."""
+        step = max(1, len(files) // SAMPLE_FILES)
+        sampled_files = files[::step][:SAMPLE_FILES]
+        per_file = self.sample_size // max(1, len(sampled_files))
+        chunks = []
+        for log_file in sampled_files:
+            with open(log_file.path, "rb") as f:
+                chunks.append(f.read(per_file))
+        return b"".join(chunks)
+
+    @staticmethod
+    def choice_key(files: list[LogFileEntry]) -> tuple:
+        """Directory and log families of an archive's files, archives with the same key share their choice."""
+        return os.path.dirname(files[0].path), tuple(sorted({log_family(log_file.name) for log_file in files}))
+
+    def trial(self, backend: ArchiveBackend, sample: bytes) -> CodecTrial:
+        start = time.perf_counter()
+        compressed_size = backend.compress_sample(sample)
+        seconds = max(time.perf_counter() - start, 1e-6)
+        return CodecTrial(backend, len(sample) / max(compressed_size, 1), len(sample) / (1024 * 1024) / seconds * backend.threads)
+
+    def select(self, files: list[LogFileEntry], archive_base_path: Optional[str] = None) -> CodecDecision:
+        """Choose the backend for an archive of files.
+
+        archive_base_path is the archive path without extension. If an archive of one of the
+        candidate formats exists there already, its format is kept, so late files end up in the
+        same archive instead of a second one next to it.
+        """
+        if archive_base_path:
+            for backend in self.backends:
+                if os.path.exists(archive_base_path + backend.extension):
+                    return CodecDecision(backend, f"existing {os.path.basename(archive_base_path)}{backend.extension}")
+
+        sample = self.read_sample(files)
+        if not sample:
+            return CodecDecision(self.backends[0], "nothing to sample")
+        total_mb = sum(log_file.size for log_file in files) / (1024 * 1024)
+        remaining_seconds = None if self.time_window is None else self.time_window * self.workers - self.booked_seconds
+
+        def qualifies(trial: CodecTrial) -> bool:
+            if self.min_throughput is not None and trial.mb_per_second < self.min_throughput:
+                return False
+            return remaining_seconds is None or total_mb / trial.mb_per_second <= remaining_seconds
+
+        key = self.choice_key(files)
+        kept = self.choices.get(key)
+        if kept is not None:
+            trial = self.trial(kept.backend, sample)
+            if abs(trial.ratio - kept.ratio) <= kept.ratio * self.ratio_drift and qualifies(trial):
+                self.booked_seconds += total_mb / trial.mb_per_second
+                return CodecDecision(trial.backend, f"kept for {key[0]}, est. {trial.ratio:.1f}x at {trial.mb_per_second:.1f} MB/s",
+                                     [trial], len(sample))
+
+        trials = [self.trial(backend, sample) for backend in self.backends]
+        qualified = [trial for trial in trials if qualifies(trial)]
+        if qualified:
+            chosen = max(qualified, key=lambda trial: (trial.ratio, trial.mb_per_second))
+            targets = []
+            if self.min_throughput is not None:
+                targets.append(f">= {self.min_throughput:g} MB/s")
+            if remaining_seconds is not None:
+                targets.append(f"{remaining_seconds:.0f}s left in the time window")
+            reason = f"best ratio with {' and '.join(targets)}" if targets else "best ratio"
+        else:
+            chosen = max(trials, key=lambda trial: trial.mb_per_second)
+            reason = "fastest, no candidate meets the target"
+        self.booked_seconds += total_mb / chosen.mb_per_second
+        self.choices[key] = chosen
+        return CodecDecision(chosen.backend, f"{reason}, est. {chosen.ratio:.1f}x at {chosen.mb_per_second:.1f} MB/s", trials, len(sample))
@@ -0,0 +1,853 @@
+import lzma
+import os
+import shutil
+import struct
+import subprocess
+import tarfile
+import tempfile
+import zipfile
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Collection, Iterable, Iterator, Optional
+from zlib import crc32
+
+from logzipper.parallel_zip import DEFAULT_CHUNK_SIZE, DEFAULT_MMAP_THRESHOLD, DEFAULT_STREAM_THRESHOLD, compressed_size, write_members_parallel
+from logzipper.routing import CompressionRouter
+from logzipper.scanner import log_family
+from logzipper.seekable import ArchiveIndex, IndexedMember, TimestampIndexer, write_index_frames
+
+try:
+    import py7zr
+except ImportError:  # Only needed for the 7z format when no 7z executable is installed
+    py7zr = None
+
+try:
+    import zstandard
+except ImportError:  # Only needed for the tar.zst format
+    zstandard = None
+
+# (file_path, arcname, size) as produced by the scanner
+Member = tuple[str, str, int]
+# {arcname: (size, crc32)}
+MemberIndex = dict[str, tuple[int, int]]
+# (arcname, bytes read back, failure reason or None)
+ReadBack = tuple[str, int, Optional[str]]
+
+
+class ArchiveBackend:
+    """An archive format the logs can be written in.
+
+    Backends are small picklable objects, archive jobs carry them into the pool workers.
+    level is the format's compression level (None = the format's default), threads the
+    number of threads compressing one archive.
+    """
+    name: str = ""
+    extension: str = ""
+    # Members can be read one by one, without decompressing the ones before them
+    random_access: bool = False
+    # list_members decompresses every member and computes its CRC, so a listing reads the whole archive back
+    listing_decompresses: bool = False
+
+    def __init__(self, level: Optional[int] = None, threads: int = 1):
+        self.level = level
+        self.threads = threads
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(level={self.level}, threads={self.threads})"
+
+    def list_members(self, archive_path: str) -> MemberIndex:
+        """Size and CRC32 of every file in an existing archive."""
+        raise NotImplementedError
+
+    def write(self, archive_path: str, members: Iterable[Member], append_from: Optional[str] = None,
+              chunk_size: int = DEFAULT_CHUNK_SIZE, stream_threshold: int = DEFAULT_STREAM_THRESHOLD) -> Iterator[tuple[str, int, int]]:
+        """Write members into a new archive_path and yield (arcname, size, crc32) for each one written.
+
+        With append_from the members of that archive are carried over first. The size and CRC
+        are the ones computed while compressing the source, not read back from the archive.
+        """
+        raise NotImplementedError
+
+    def read_back(self, archive_path: str, expected: MemberIndex, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[ReadBack]:
+        """Decompress the expected members and yield one ReadBack per expected arcname."""
+        raise NotImplementedError
+
+    def compress_sample(self, data: bytes) -> int:
+        """Compressed size of data with this format and level on a single thread, used to compare formats."""
+        raise NotImplementedError
+
+    def stream_members(self, archive_path: str, factory: Callable[[str], Any], names: Optional[Collection[str]] = None,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        """Decompress the members (all of them, or the arcnames in names) in archive order into writers made by factory(arcname).
+
+        A writer gets its member's data chunk by chunk through write() and close() once the member
+        is complete, so nothing is extracted to disk or held in memory as a whole.
+        """
+        raise NotImplementedError
+
+
+def pump(source, writer, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """Copy a readable file object into a stream_members writer and close the writer."""
+    while data := source.read(chunk_size):
+        writer.write(data)
+    writer.close()
+
+
+class ZipBackend(ArchiveBackend):
+    """zip with deflate, bz2 or lzma. threads compress the members of one archive in parallel.
+
+    With store_compressed, files that are compressed already (.gz, .zip, images, ...) are stored
+    instead of compressed a second time, see logzipper.routing. Sources of mmap_threshold bytes
+    or more are read through a memory mapping (None = never), see parallel_zip.copy_source.
+    """
+    extension = ".zip"
+    random_access = True
+
+    def __init__(self, compression: int = zipfile.ZIP_BZIP2, level: Optional[int] = None, threads: int = 1, store_compressed: bool = True,
+                 mmap_threshold: Optional[int] = DEFAULT_MMAP_THRESHOLD):
+        super().__init__(level, threads)
+        self.compression = compression
+        self.store_compressed = store_compressed
+        self.mmap_threshold = mmap_threshold
+        self.name = {zipfile.ZIP_DEFLATED: "zip-deflate", zipfile.ZIP_BZIP2: "zip-bz2", zipfile.ZIP_LZMA: "zip-lzma"}.get(compression, "zip")
+
+    def list_members(self, archive_path: str) -> MemberIndex:
+        # Appending to anything that isn't a zip file would silently tack a new archive onto it
+        if not zipfile.is_zipfile(archive_path):
+            raise zipfile.BadZipFile(f"Existing archive '{archive_path}' is not a valid zip file")
+        with zipfile.ZipFile(archive_path) as zipf:
+            return {zinfo.filename: (zinfo.file_size, zinfo.CRC) for zinfo in zipf.infolist()}
+
+    def write(self, archive_path, members, append_from=None, chunk_size=DEFAULT_CHUNK_SIZE, stream_threshold=DEFAULT_STREAM_THRESHOLD):
+        mode = "w"
+        if append_from:
+            shutil.copyfile(append_from, archive_path)
+            mode = "a"
+        router = CompressionRouter(self.compression, self.level) if self.store_compressed else None
+        with zipfile.ZipFile(archive_path, mode, compression=self.compression, compresslevel=self.level) as zipf:
+            for arcname in write_members_parallel(zipf, members, self.compression, self.level, self.threads, chunk_size, stream_threshold,
+                                                  router, self.mmap_threshold):
+                zinfo = zipf.NameToInfo[arcname]
+                yield arcname, zinfo.file_size, zinfo.CRC
+
+    def read_back(self, archive_path, expected, chunk_size=DEFAULT_CHUNK_SIZE):
+        # ZipExtFile checks the data against the header CRC once it reaches the end,
+        # so comparing the header with the expected CRC covers the data as well
+        buffer = bytearray(chunk_size)
+        with zipfile.ZipFile(archive_path) as zipf:
+            for arcname, (size, crc) in expected.items():
+                zinfo = zipf.NameToInfo.get(arcname)
+                if zinfo is None:
+                    yield arcname, 0, "missing from the archive"
+                    continue
+                if (zinfo.file_size, zinfo.CRC) != (size, crc):
+                    yield arcname, 0, "archive header does not match the written size/CRC"
+                    continue
+                read_size = 0
+                try:
+                    with zipf.open(zinfo) as member:
+                        while read := member.readinto(buffer):
+                            read_size += read
+                except (zipfile.BadZipFile, EOFError, OSError, ValueError) as e:
+                    # Bad CRC, truncated or undecodable compressed data
+                    yield arcname, read_size, f"{type(e).__name__}: {e}"
+                    continue
+                if read_size != size:
+                    yield arcname, read_size, f"decompressed to {read_size} bytes instead of {size}"
+                    continue
+                yield arcname, read_size, None
+
+    def compress_sample(self, data: bytes) -> int:
+        return compressed_size(data, self.compression, self.level)
+
+    def stream_members(self, archive_path, factory, names=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        with zipfile.ZipFile(archive_path) as zipf:
+            for zinfo in zipf.infolist():
+                if zinfo.is_dir() or (names is not None and zinfo.filename not in names):
+                    continue
+                with zipf.open(zinfo) as member:
+                    pump(member, factory(zinfo.filename), chunk_size)
+
+
+def find_7z_executable() -> Optional[str]:
+    """Path of an installed 7-Zip command line tool, None if there is none."""
+    for name in ("7z", "7za", "7zz"):
+        executable = shutil.which(name)
+        if executable:
+            return executable
+    default_path = os.path.join(os.environ.get("ProgramFiles", r"C:\Program Files"), "7-Zip", "7z.exe")
+    return default_path if os.path.isfile(default_path) else None
+
+
+class SevenZipBackend(ArchiveBackend):
+    """7z with LZMA2, written by the 7-Zip executable (multithreaded) or py7zr when none is installed.
+
+    Members are added sorted by log family and date, see solid_order. py7zr compresses on a
+    single thread into one solid block, threads and block_size (None = 7-Zip's default solid
+    block size) only apply to the executable.
+    """
+    name = "7z"
+    extension = ".7z"
+
+    def __init__(self, level: Optional[int] = None, threads: int = 1, executable: Optional[str] = None, block_size: Optional[int] = None):
+        super().__init__(level, threads)
+        self.block_size = block_size
+        self.executable = executable or find_7z_executable()
+        if self.executable is None and py7zr is None:
+            raise RuntimeError("The 7z format needs the 7-Zip executable (7z/7za) on the PATH or the py7zr package (pip install py7zr)")
+
+    def run_7z(self, *args: str, cwd: Optional[str] = None) -> subprocess.CompletedProcess:
+        # -bd: no progress indicator, -y: never wait for a prompt
+        return subprocess.run([self.executable, *args, "-bd", "-y"], cwd=cwd, capture_output=True, text=True)
+
+    def list_members(self, archive_path: str) -> MemberIndex:
+        if self.executable is None:
+            with py7zr.SevenZipFile(archive_path) as archive:
+                return {info.filename: (info.uncompressed, info.crc32) for info in archive.list() if not info.is_directory}
+
+        process = self.run_7z("l", "-slt", archive_path)
+        if process.returncode != 0:
+            raise OSError(f"7z could not list '{archive_path}': {process.stderr.strip() or process.stdout.strip()}")
+        # Technical listing: "key = value" blocks, one per file after the "----------" separator
+        members = {}
+        for block in process.stdout.split("----------", 1)[-1].split("\n\n"):
+            fields = dict(line.split(" = ", 1) for line in block.splitlines() if " = " in line)
+            if "Path" in fields and not fields.get("Attributes", "").startswith("D"):
+                members[fields["Path"]] = (int(fields.get("Size") or 0), int(fields.get("CRC") or "0", 16))
+        return members
+
+    def write(self, archive_path, members, append_from=None, chunk_size=DEFAULT_CHUNK_SIZE, stream_threshold=DEFAULT_STREAM_THRESHOLD):
+        members = solid_order(members)
+        if append_from:
+            shutil.copyfile(append_from, archive_path)
+
+        # 7z reads the sources itself, they are read a second time for their CRCs while it compresses
+        # them (mostly from the page cache), so the archive is checked against the sources and not its own listing
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            checksums = executor.map(lambda member: read_size_crc(member[0], chunk_size), members)
+            if self.executable is None:
+                filters = [{"id": py7zr.FILTER_LZMA2, "preset": 5 if self.level is None else self.level}]
+                with py7zr.SevenZipFile(archive_path, "a" if append_from else "w", filters=None if append_from else filters) as archive:
+                    for file_path, arcname, _ in members:
+                        archive.write(file_path, arcname)
+            else:
+                self.write_with_executable(archive_path, members)
+            for (_, arcname, _), (size, crc) in zip(members, checksums):
+                yield arcname, size, crc
+
+    def write_with_executable(self, archive_path: str, members: list[Member]) -> None:
+        """Add members with one 7z call, reading the file names from a list file instead of the command line."""
+        directories = {os.path.dirname(file_path) for file_path, _, _ in members}
+        if len(directories) != 1 or any(os.path.basename(file_path) != arcname for file_path, arcname, _ in members):
+            raise ValueError("The 7z executable can only archive files of one directory under their own names")
+
+        options = ["-t7z", f"-mmt{self.threads}", "-scsUTF-8"]
+        if self.level is not None:
+            options.append(f"-mx{self.level}")
+        if self.block_size:
+            options.append(f"-ms={self.block_size}b")
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", encoding="utf-8", delete=False) as list_file:
+            list_file.write("\n".join(arcname for _, arcname, _ in members))
+        try:
+            process = self.run_7z("a", *options, os.path.abspath(archive_path), f"@{list_file.name}", cwd=directories.pop())
+        finally:
+            os.unlink(list_file.name)
+        if process.returncode != 0:
+            raise OSError(f"7z failed to write '{archive_path}': {process.stderr.strip() or process.stdout.strip()}")
+
+    def read_back(self, archive_path, expected, chunk_size=DEFAULT_CHUNK_SIZE):
+        # Both 7z and py7zr check every file against its CRC while testing, but only report the archive as a whole
+        if self.executable is None:
+            with py7zr.SevenZipFile(archive_path) as archive:
+                bad_file = archive.testzip()
+            failure = f"CRC error in {bad_file}" if bad_file else None
+        else:
+            process = self.run_7z("t", archive_path)
+            failure = None if process.returncode == 0 else f"7z test failed: {process.stderr.strip() or process.stdout.strip()}"
+
+        listed = self.list_members(archive_path)
+        for arcname, (size, crc) in expected.items():
+            if arcname not in listed:
+                yield arcname, 0, "missing from the archive"
+            elif listed[arcname] != (size, crc):
+                yield arcname, 0, "archive listing does not match the written size/CRC"
+            else:
+                yield arcname, size, failure
+
+    def compress_sample(self, data: bytes) -> int:
+        # xz uses the same LZMA2 as 7z, so its size and single-threaded speed are a close estimate
+        return len(lzma.compress(data, format=lzma.FORMAT_XZ, preset=5 if self.level is None else self.level))
+
+    def stream_members(self, archive_path, factory, names=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        if py7zr is not None:
+            # py7zr decompresses every solid block once and pushes the data into the writers itself
+            with py7zr.SevenZipFile(archive_path) as archive:
+                archive.extract(targets=None if names is None else list(names), factory=Py7zWriterFactory(factory))
+            return
+        # The executable has no way to hand over several files separately, one call per member
+        for arcname in self.list_members(archive_path) if names is None else names:
+            process = subprocess.Popen([self.executable, "e", "-so", "-bd", "-y", archive_path, arcname],
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            pump(process.stdout, factory(arcname), chunk_size)
+            _, stderr = process.communicate()
+            if process.returncode != 0:
+                raise OSError(f"7z failed to read {arcname} from '{archive_path}': {stderr.decode(errors='replace').strip()}")
+
+
+if py7zr is not None:
+    class Py7zWriter(py7zr.io.Py7zIO):
+        """Hands the data py7zr decompresses to a stream_members writer."""
+
+        def __init__(self, writer):
+            self.writer = writer
+            self.length = 0
+
+        def write(self, s) -> int:
+            self.writer.write(bytes(s))
+            self.length += len(s)
+            return len(s)
+
+        def read(self, size=None) -> bytes:
+            return b""
+
+        def seek(self, offset: int, whence: int = 0) -> int:
+            return self.length
+
+        def flush(self) -> None:
+            pass
+
+        def size(self) -> int:
+            return self.length
+
+        def close(self) -> None:
+            self.writer.close()
+
+    class Py7zWriterFactory(py7zr.io.WriterFactory):
+        def __init__(self, factory):
+            self.factory = factory
+
+        def create(self, filename: str) -> Py7zWriter:
+            return Py7zWriter(self.factory(filename))
+
+
+class CrcReader:
+    """Read-only file wrapper that computes the CRC32 of everything read through it."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.crc = 0
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fileobj.read(size)
+        self.crc = crc32(data, self.crc)
+        self.size += len(data)
+        return data
+
+
+def read_size_crc(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple[int, int]:
+    """Size and CRC32 of a file, read in chunks."""
+    with open(file_path, "rb") as src:
+        source = CrcReader(src)
+        while source.read(chunk_size):
+            pass
+    return source.size, source.crc
+
+
+# Uncompressed bytes per independently compressed block of the solid formats
+DEFAULT_SOLID_BLOCK_SIZE: int = 16 * 1024 * 1024
+
+
+def solid_order(members: Iterable[Member]) -> list[Member]:
+    """Members sorted by log family and then name, i.e. date, so similar content is adjacent in a solid archive."""
+    return sorted(members, key=lambda member: (log_family(member[1]), member[1]))
+
+
+class BlockWriter:
+    """Write-only file object that compresses everything written to it in independent blocks.
+
+    Every block_size bytes become one complete zstd frame or xz stream, concatenated they are
+    still one valid .zst/.xz file. Blocks are compressed on threads threads, at most threads
+    blocks ahead of the output file, so memory stays at about 2 * threads * block_size.
+    """
+
+    def __init__(self, fileobj, compress_block, block_size: int = DEFAULT_SOLID_BLOCK_SIZE, threads: int = 1):
+        self.fileobj = fileobj
+        self.compress_block = compress_block
+        self.block_size = block_size
+        self.threads = threads
+        self.buffer = bytearray()
+        self.position = 0
+        self.pending = deque()
+        self.frames: list[tuple[int, int]] = []  # (compressed size, uncompressed size) of every block written
+        self.executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+
+    def __enter__(self) -> "BlockWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        elif self.executor:
+            self.executor.shutdown(cancel_futures=True)
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= self.block_size:
+            self.end_block(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+
+    def tell(self) -> int:
+        # Uncompressed position, which is what tarfile keeps track of
+        return self.position
+
+    def end_block(self, block: bytes) -> None:
+        if self.executor is None:
+            self.write_frame(self.compress_block(block), len(block))
+            return
+        self.pending.append((self.executor.submit(self.compress_block, block), len(block)))
+        while len(self.pending) > self.threads:
+            self.write_pending()
+
+    def write_pending(self) -> None:
+        future, size = self.pending.popleft()
+        self.write_frame(future.result(), size)
+
+    def write_frame(self, frame: bytes, size: int) -> None:
+        self.fileobj.write(frame)
+        self.frames.append((len(frame), size))
+
+    def close(self) -> None:
+        if self.buffer:
+            self.end_block(bytes(self.buffer))
+            self.buffer.clear()
+        while self.pending:
+            self.write_pending()
+        if self.executor:
+            self.executor.shutdown()
+
+
+class SolidTarBackend(ArchiveBackend):
+    """One compressed tar stream per archive, compressed in independent blocks of block_size bytes.
+
+    Members are sorted by log family and date, so similar content ends up next to each other in
+    one block. The block size bounds the memory of compressing (see BlockWriter) and how much of
+    the archive has to be decompressed to get at a member near its end. threads compress blocks
+    in parallel.
+
+    tar has no index and no checksums of the file data, so listing an archive decompresses it
+    and computes the CRCs on the way. Appending rewrites the archive, the existing members are
+    copied over uncompressed.
+    """
+    default_level: int = 0
+    listing_decompresses = True
+    # Appends a seek table and a timestamp index of the lines after the data, see logzipper.seekable
+    seekable: bool = False
+
+    def __init__(self, level: Optional[int] = None, threads: int = 1, block_size: Optional[int] = None):
+        super().__init__(level, threads)
+        self.block_size = block_size or DEFAULT_SOLID_BLOCK_SIZE
+
+    @property
+    def compression_level(self) -> int:
+        return self.default_level if self.level is None else self.level
+
+    def compress_block(self, data: bytes) -> bytes:
+        """One complete, independently decompressible frame or stream of data."""
+        raise NotImplementedError
+
+    def open_reader(self, fileobj):
+        """Decompressing file object over all blocks of an archive."""
+        raise NotImplementedError
+
+    @property
+    def read_errors(self) -> tuple[type[Exception], ...]:
+        """Exceptions of the decompressor on corrupt data."""
+        return ()
+
+    def iter_members(self, archive_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[tuple[str, int, int]]:
+        """Stream through an archive and yield (arcname, size, crc32) of every file in it."""
+        with open(archive_path, "rb") as f, self.open_reader(f) as reader, tarfile.open(fileobj=reader, mode="r|") as tar:
+            for tarinfo in tar:
+                if not tarinfo.isfile():
+                    continue
+                source = CrcReader(tar.extractfile(tarinfo))
+                while source.read(chunk_size):
+                    pass
+                yield tarinfo.name, source.size, source.crc
+
+    def list_members(self, archive_path: str) -> MemberIndex:
+        return {arcname: (size, crc) for arcname, size, crc in self.iter_members(archive_path)}
+
+    def write(self, archive_path, members, append_from=None, chunk_size=DEFAULT_CHUNK_SIZE, stream_threshold=DEFAULT_STREAM_THRESHOLD):
+        indexed_members = {}
+
+        def add_member(tar: tarfile.TarFile, tarinfo: tarfile.TarInfo, fileobj) -> None:
+            if not self.seekable or not tarinfo.isfile():
+                tar.addfile(tarinfo, fileobj)
+                return
+            # tarfile writes the header, PAX records included, right before the data
+            data_offset = tar.offset + len(tarinfo.tobuf(tar.format, tar.encoding, tar.errors))
+            indexer = TimestampIndexer(fileobj, data_offset, self.block_size)
+            tar.addfile(tarinfo, indexer)
+            indexer.finish()
+            indexed_members[tarinfo.name] = IndexedMember(data_offset, tarinfo.size, [(frame, *timestamps) for frame, timestamps in sorted(indexer.ranges.items())])
+
+        with open(archive_path, "wb") as f:
+            with BlockWriter(f, self.compress_block, self.block_size, self.threads) as writer, \
+                    tarfile.open(fileobj=writer, mode="w", format=tarfile.PAX_FORMAT, copybufsize=chunk_size) as tar:
+                if append_from:
+                    with open(append_from, "rb") as existing, self.open_reader(existing) as reader, \
+                            tarfile.open(fileobj=reader, mode="r|") as old_tar:
+                        for tarinfo in old_tar:
+                            add_member(tar, tarinfo, old_tar.extractfile(tarinfo) if tarinfo.isfile() else None)
+
+                for file_path, arcname, _ in solid_order(members):
+                    tarinfo = tar.gettarinfo(file_path, arcname)
+                    with open(file_path, "rb") as src:
+                        source = CrcReader(src)
+                        add_member(tar, tarinfo, source)
+                    yield arcname, source.size, source.crc
+            if self.seekable:
+                write_index_frames(f, ArchiveIndex(self.block_size, writer.frames, indexed_members))
+
+    def read_back(self, archive_path, expected, chunk_size=DEFAULT_CHUNK_SIZE):
+        found = set()
+        try:
+            for arcname, size, crc in self.iter_members(archive_path, chunk_size):
+                if arcname not in expected or arcname in found:
+                    continue
+                found.add(arcname)
+                if (size, crc) != expected[arcname]:
+                    yield arcname, size, "decompressed data does not match the written size/CRC"
+                else:
+                    yield arcname, size, None
+        except (tarfile.TarError, EOFError, *self.read_errors) as e:
+            # Corrupt stream, every member after the damage is unreadable
+            for arcname in expected.keys() - found:
+                found.add(arcname)
+                yield arcname, 0, f"{type(e).__name__}: {e}"
+        for arcname in expected.keys() - found:
+            yield arcname, 0, "missing from the archive"
+
+    def compress_sample(self, data: bytes) -> int:
+        return len(self.compress_block(data))
+
+    def stream_members(self, archive_path, factory, names=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        with open(archive_path, "rb") as f, self.open_reader(f) as reader, tarfile.open(fileobj=reader, mode="r|") as tar:
+            for tarinfo in tar:
+                if tarinfo.isfile() and (names is None or tarinfo.name in names):
+                    pump(tar.extractfile(tarinfo), factory(tarinfo.name), chunk_size)
+
+
+class ZstdTarBackend(SolidTarBackend):
+    """tar compressed with zstd, every block is one zstd frame.
+
+    Archives are seekable: the zstd seek table and an index of the first and last line timestamp
+    of every member in every frame follow the data in skippable frames, which zstd and tar skip.
+    seekable.iter_lines_between uses them to decompress only the frames of a time range.
+    """
+    name = "tar.zst"
+    extension = ".tar.zst"
+    default_level = 3
+    seekable = True
+
+    def __init__(self, level: Optional[int] = None, threads: int = 1, block_size: Optional[int] = None):
+        super().__init__(level, threads, block_size)
+        if zstandard is None:
+            raise RuntimeError("The tar.zst format needs the zstandard package (pip install zstandard)")
+
+    def compress_block(self, data: bytes) -> bytes:
+        # A compressor per block, they are not thread safe
+        return zstandard.ZstdCompressor(level=self.compression_level).compress(data)
+
+    def open_reader(self, fileobj):
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True)
+
+    @property
+    def read_errors(self) -> tuple[type[Exception], ...]:
+        return (zstandard.ZstdError,)
+
+
+class XzTarBackend(SolidTarBackend):
+    """tar compressed with xz (LZMA2), every block is one xz stream. Slower than 7z but needs no extra package."""
+    name = "tar.xz"
+    extension = ".tar.xz"
+    default_level = 6
+
+    def compress_block(self, data: bytes) -> bytes:
+        return lzma.compress(data, format=lzma.FORMAT_XZ, preset=self.compression_level)
+
+    def open_reader(self, fileobj):
+        # LZMAFile reads concatenated streams as one
+        return lzma.LZMAFile(fileobj)
+
+    @property
+    def read_errors(self) -> tuple[type[Exception], ...]:
+        return (lzma.LZMAError,)
+
+# Size of a trained dictionary, zstd's own default
+DICTIONARY_SIZE: int = 112 * 1024
+# Bytes taken from the start of each file of a family to train its dictionary
+DICTIONARY_SAMPLE_SIZE: int = 128 * 1024
+# Training input per family
+DICTIONARY_TRAINING_SIZE: int = 16 * 1024 * 1024
+# Families with fewer files in an archive are compressed without a dictionary
+DICTIONARY_MIN_FILES: int = 8
+# Directory of the dictionaries inside the archive
+DICTIONARY_DIRECTORY = "dictionaries"
+# zip extra field of every member holding size and CRC32 of the original file
+ORIGINAL_FILE_EXTRA_ID = 0x4C5A
+ORIGINAL_FILE_EXTRA = struct.Struct("<HHQI")
+# Enough of a frame to read its dictionary ID
+ZSTD_FRAME_HEADER_MAX_SIZE = 18
+
+
+def original_file_extra(size: int, crc: int) -> bytes:
+    return ORIGINAL_FILE_EXTRA.pack(ORIGINAL_FILE_EXTRA_ID, ORIGINAL_FILE_EXTRA.size - 4, size, crc)
+
+
+def parse_original_file_extra(extra: bytes) -> Optional[tuple[int, int]]:
+    """(size, crc32) from a member's extra fields, None if it has none."""
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, length = struct.unpack_from("<HH", extra, offset)
+        if header_id == ORIGINAL_FILE_EXTRA_ID and offset + ORIGINAL_FILE_EXTRA.size <= len(extra):
+            _, _, size, crc = ORIGINAL_FILE_EXTRA.unpack_from(extra, offset)
+            return size, crc
+        offset += 4 + length
+    return None
+
+
+class ZstdDictionaryBackend(ArchiveBackend):
+    """zip of stored zstd frames, one per member, compressed with a dictionary trained per log family.
+
+    The small logs of one family (see scanner.log_family) repeat the same lines day after day,
+    which per-member compression can't exploit. A dictionary trained on the family's files lets
+    every member start out knowing those lines. It is stored once per archive as
+    dictionaries/<family>.dict and every member as a stored <arcname>.zst, so any unzip and
+    `zstd -D dictionaries/<family>.dict -d` unpack an archive without this tool. zip instead of
+    tar because a tar header alone is bigger than most of the compressed members.
+
+    Size and CRC32 of the original files are kept in an extra field of each member, listing
+    only reads the central directory. Members are independent frames: threads compress several
+    of them at once, and appending adds members to the existing archive. Families with a
+    dictionary in the archive keep using it, frames name their dictionary by its ID.
+    """
+    name = "zstd-dict"
+    extension = ".zstd-dict.zip"
+    random_access = True
+
+    def __init__(self, level: Optional[int] = None, threads: int = 1):
+        super().__init__(level, threads)
+        if zstandard is None:
+            raise RuntimeError("The zstd-dict format needs the zstandard package (pip install zstandard)")
+
+    @property
+    def compression_level(self) -> int:
+        return 3 if self.level is None else self.level
+
+    @staticmethod
+    def dictionary_family(arcname: str) -> Optional[str]:
+        """Family of a dictionary member, None for other members."""
+        directory, _, filename = arcname.partition("/")
+        if directory != DICTIONARY_DIRECTORY or not filename.endswith(".dict"):
+            return None
+        return filename[:-len(".dict")]
+
+    def list_members(self, archive_path: str) -> MemberIndex:
+        if not zipfile.is_zipfile(archive_path):
+            raise zipfile.BadZipFile(f"Existing archive '{archive_path}' is not a valid zip file")
+        with zipfile.ZipFile(archive_path) as zipf:
+            return {zinfo.filename[:-len(".zst")]: original for zinfo in zipf.infolist()
+                    if (original := parse_original_file_extra(zinfo.extra))}
+
+    def read_dictionaries(self, zipf: zipfile.ZipFile) -> dict[str, bytes]:
+        return {family: zipf.read(zinfo) for zinfo in zipf.infolist() if (family := self.dictionary_family(zinfo.filename))}
+
+    def train_dictionary(self, members: list[Member]) -> Optional[bytes]:
+        """Dictionary trained on the start of the members' files, None if there are too few to train on."""
+        if len(members) < DICTIONARY_MIN_FILES:
+            return None
+        samples = []
+        budget = DICTIONARY_TRAINING_SIZE
+        for file_path, _, _ in members:
+            with open(file_path, "rb") as f:
+                sample = f.read(min(DICTIONARY_SAMPLE_SIZE, budget))
+            if sample:
+                samples.append(sample)
+                budget -= len(sample)
+            if budget <= 0:
+                break
+        # zstd works best with about 100 times the dictionary size as training input, a bigger
+        # dictionary costs more space in the archive than it saves on the family's files
+        dictionary_size = min(DICTIONARY_SIZE, (DICTIONARY_TRAINING_SIZE - budget) // 100)
+        try:
+            return zstandard.train_dictionary(dictionary_size, samples, level=self.compression_level).as_bytes()
+        except zstandard.ZstdError:
+            return None  # Too little or too uniform data, the family is compressed without a dictionary
+
+    def compress_member(self, member: Member, dictionary: Optional["zstandard.ZstdCompressionDict"],
+                        chunk_size: int, spool_size: int) -> tuple[zipfile.ZipInfo, tempfile.SpooledTemporaryFile]:
+        """Compress one file into a spooled temporary file, returns the ZipInfo to store it under and the spool."""
+        file_path, arcname, _ = member
+        zinfo = zipfile.ZipInfo.from_file(file_path, arcname + ".zst")
+        zinfo.compress_type = zipfile.ZIP_STORED
+        compressor = zstandard.ZstdCompressor(level=self.compression_level, dict_data=dictionary)
+        # Small members stay in memory, bigger ones spill to disk
+        spool = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        with open(file_path, "rb") as src:
+            source = CrcReader(src)
+            with compressor.stream_writer(spool, closefd=False) as writer:
+                while data := source.read(chunk_size):
+                    writer.write(data)
+        zinfo.file_size = spool.tell()
+        zinfo.extra = original_file_extra(source.size, source.crc)
+        spool.seek(0)
+        return zinfo, spool
+
+    def compress_members(self, members: list[Member], compress) -> Iterator[tuple[zipfile.ZipInfo, tempfile.SpooledTemporaryFile]]:
+        """compress every member on self.threads threads, a few members ahead of the writer, and yield them in order."""
+        if self.threads == 1:
+            for member in members:
+                yield compress(member)
+            return
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            for member in members:
+                pending.append(executor.submit(compress, member))
+                if len(pending) > self.threads * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def write(self, archive_path, members, append_from=None, chunk_size=DEFAULT_CHUNK_SIZE, stream_threshold=DEFAULT_STREAM_THRESHOLD):
+        members = list(members)
+        mode = "w"
+        if append_from:
+            shutil.copyfile(append_from, archive_path)
+            mode = "a"
+        with zipfile.ZipFile(archive_path, mode) as zipf:
+            dictionaries = self.read_dictionaries(zipf) if append_from else {}
+            families = defaultdict(list)
+            for member in members:
+                families[log_family(member[1])].append(member)
+            for family, family_members in families.items():
+                if family not in dictionaries and (dictionary := self.train_dictionary(family_members)):
+                    dictionaries[family] = dictionary
+                    zipf.writestr(f"{DICTIONARY_DIRECTORY}/{family}.dict", dictionary, zipfile.ZIP_STORED)
+            # Precomputed once, the compressors of a family share it
+            compression_dicts = {}
+            for family in families.keys() & dictionaries.keys():
+                compression_dicts[family] = zstandard.ZstdCompressionDict(dictionaries[family])
+                compression_dicts[family].precompute_compress(level=self.compression_level)
+
+            def compress(member: Member):
+                return self.compress_member(member, compression_dicts.get(log_family(member[1])), chunk_size, stream_threshold)
+
+            for zinfo, spool in self.compress_members(members, compress):
+                with spool, zipf.open(zinfo, "w", force_zip64=zinfo.file_size > zipfile.ZIP64_LIMIT) as dest:
+                    shutil.copyfileobj(spool, dest, chunk_size)
+                yield (zinfo.filename[:-len(".zst")], *parse_original_file_extra(zinfo.extra))
+
+    def load_dictionaries(self, zipf: zipfile.ZipFile) -> dict[int, "zstandard.ZstdCompressionDict"]:
+        """Dictionaries of an archive by their ID."""
+        dictionaries = {}
+        for data in self.read_dictionaries(zipf).values():
+            dictionary = zstandard.ZstdCompressionDict(data)
+            dictionaries[dictionary.dict_id()] = dictionary
+        return dictionaries
+
+    def open_member(self, zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, dictionaries: dict[int, "zstandard.ZstdCompressionDict"]):
+        """Decompressing reader of a member, raises ValueError when its dictionary is missing."""
+        with zipf.open(zinfo) as member:
+            dict_id = zstandard.get_frame_parameters(member.read(ZSTD_FRAME_HEADER_MAX_SIZE)).dict_id
+        if dict_id and dict_id not in dictionaries:
+            raise ValueError(f"dictionary {dict_id} is missing from the archive")
+        return zstandard.ZstdDecompressor(dict_data=dictionaries.get(dict_id)).stream_reader(zipf.open(zinfo), closefd=True)
+
+    def read_back(self, archive_path, expected, chunk_size=DEFAULT_CHUNK_SIZE):
+        # zipfile checks the stored frames against their CRC, the decompressed data is checked here
+        with zipfile.ZipFile(archive_path) as zipf:
+            dictionaries = self.load_dictionaries(zipf)
+            for arcname, (size, crc) in expected.items():
+                zinfo = zipf.NameToInfo.get(arcname + ".zst")
+                if zinfo is None:
+                    yield arcname, 0, "missing from the archive"
+                    continue
+                if parse_original_file_extra(zinfo.extra) != (size, crc):
+                    yield arcname, 0, "archive header does not match the written size/CRC"
+                    continue
+                source = None
+                try:
+                    with self.open_member(zipf, zinfo, dictionaries) as reader:
+                        source = CrcReader(reader)
+                        while source.read(chunk_size):
+                            pass
+                except (zipfile.BadZipFile, zstandard.ZstdError, EOFError, OSError, ValueError) as e:
+                    # Bad CRC of the stored frame, undecodable zstd data or a missing dictionary
+                    yield arcname, source.size if source else 0, f"{type(e).__name__}: {e}"
+                    continue
+                if (source.size, source.crc) != (size, crc):
+                    yield arcname, source.size, "decompressed data does not match the written size/CRC"
+                else:
+                    yield arcname, source.size, None
+
+    def compress_sample(self, data: bytes) -> int:
+        # The sample is one block of data, a dictionary would not change its compressed size
+        return len(zstandard.ZstdCompressor(level=self.compression_level).compress(data))
+
+    def stream_members(self, archive_path, factory, names=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        with zipfile.ZipFile(archive_path) as zipf:
+            dictionaries = self.load_dictionaries(zipf)
+            for zinfo in zipf.infolist():
+                arcname = zinfo.filename[:-len(".zst")]
+                if not parse_original_file_extra(zinfo.extra) or (names is not None and arcname not in names):
+                    continue  # A dictionary or a member that wasn't asked for
+                with self.open_member(zipf, zinfo, dictionaries) as reader:
+                    pump(reader, factory(arcname), chunk_size)
+
+
+# Formats selectable in the scripts and the GUI
+ARCHIVE_FORMATS = ["zip-deflate", "zip-bz2", "zip-lzma", "7z", "tar.zst", "tar.xz", "zstd-dict"]
+
+
+def create_backend(archive_format: str, level: Optional[int] = None, threads: int = 1, block_size: Optional[int] = None) -> ArchiveBackend:
+    """Backend for one of ARCHIVE_FORMATS, raises RuntimeError when its optional dependency is missing.
+
+    block_size is the solid block size of 7z, tar.zst and tar.xz, the other formats have none.
+    """
+    if archive_format == "zip-deflate":
+        return ZipBackend(zipfile.ZIP_DEFLATED, level, threads)
+    if archive_format == "zip-bz2":
+        return ZipBackend(zipfile.ZIP_BZIP2, level, threads)
+    if archive_format == "zip-lzma":
+        return ZipBackend(zipfile.ZIP_LZMA, level, threads)
+    if archive_format == "7z":
+        return SevenZipBackend(level, threads, block_size=block_size)
+    if archive_format == "tar.zst":
+        return ZstdTarBackend(level, threads, block_size)
+    if archive_format == "tar.xz":
+        return XzTarBackend(level, threads, block_size)
+    if archive_format == "zstd-dict":
+        return ZstdDictionaryBackend(level, threads)
+    raise ValueError(f"Unknown archive format '{archive_format}', expected one of {', '.join(ARCHIVE_FORMATS)}")
+
+
+# Extensions of the archives this project writes, longest first so backend_for_path can match the ends
+ARCHIVE_EXTENSIONS = [".zstd-dict.zip", ".tar.zst", ".tar.xz", ".7z", ".zip"]
+
+
+def backend_for_path(archive_path: str) -> ArchiveBackend:
+    """Backend able to read an existing archive, picked by its file extension."""
+    if archive_path.endswith(ZstdDictionaryBackend.extension):
+        return ZstdDictionaryBackend()
+    if archive_path.endswith(ZstdTarBackend.extension):
+        return ZstdTarBackend()
+    if archive_path.endswith(XzTarBackend.extension):
+        return XzTarBackend()
+    if archive_path.endswith(SevenZipBackend.extension):
+        return SevenZipBackend()
+    return ZipBackend()
@@ -0,0 +1,47 @@
+"""Cooperative pause and cancel of a run, e.g. from the GUI's buttons."""
+import threading
+from typing import Iterable, Iterator
+
+
+class RunControl:
+    """Pause, resume and cancel flags of a run, set from one thread and checked by the pipeline's threads.
+
+    The pipeline checks them before every archive and, when archives are built on threads,
+    before every member. A paused run waits at the next check, a cancelled one stops taking
+    new work: archives already started are completed with the members written so far.
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.running = threading.Event()
+        self.running.set()
+
+    def pause(self) -> None:
+        self.running.clear()
+
+    def resume(self) -> None:
+        self.running.set()
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+        self.running.set()  # A paused run has to wake up to see it was cancelled
+
+    @property
+    def paused(self) -> bool:
+        return not self.running.is_set() and not self.cancelled.is_set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.cancelled.is_set()
+
+    def proceed(self) -> bool:
+        """Wait while the run is paused, then tell whether it goes on."""
+        self.running.wait()
+        return not self.cancelled.is_set()
+
+    def iterate(self, items: Iterable) -> Iterator:
+        """Yield items until the run is cancelled, waiting before each item while it is paused."""
+        for item in items:
+            if not self.proceed():
+                return
+            yield item
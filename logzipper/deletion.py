@@ -0,0 +1,102 @@
+import errno
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+# Threads deleting files, on a network share every delete is a round trip of its own
+DEFAULT_DELETE_WORKERS: int = 8
+# Files per task, a batch of one archive is spread over the workers in tasks of this size
+DEFAULT_DELETE_CHUNK: int = 200
+# Retries of a file after a transient error, the wait starts at DEFAULT_RETRY_DELAY seconds and doubles every time
+DEFAULT_DELETE_RETRIES: int = 4
+DEFAULT_RETRY_DELAY: float = 0.5
+
+# Errors that may go away on their own: a file briefly held by a virus scanner or backup, a share that hiccups
+TRANSIENT_ERRNOS = {errno.EBUSY, errno.EAGAIN, errno.EINTR, errno.EIO, errno.ETIMEDOUT, errno.ECONNRESET, errno.ESTALE}
+# Windows: sharing and lock violation, network path/name gone or unavailable, semaphore timeout, network unreachable
+TRANSIENT_WINERRORS = {32, 33, 51, 53, 59, 64, 121, 1231}
+
+
+def is_transient(error: OSError) -> bool:
+    """Tell errors worth retrying apart from permanent ones like a missing permission."""
+    winerror = getattr(error, "winerror", None)
+    if winerror is not None:
+        return winerror in TRANSIENT_WINERRORS
+    return error.errno in TRANSIENT_ERRNOS
+
+
+def delete_file(file_path: str, retries: int = DEFAULT_DELETE_RETRIES, retry_delay: float = DEFAULT_RETRY_DELAY) -> Optional[str]:
+    """Delete one file, retrying transient errors with exponential backoff. Returns an error message, None once it is gone."""
+    delay = retry_delay
+    for attempt in range(retries + 1):
+        try:
+            os.unlink(file_path)
+            return None
+        except FileNotFoundError as e:
+            if attempt:
+                return None  # An earlier attempt went through, only its reply got lost on the way back
+            return f"{file_path}: {e}"
+        except OSError as e:
+            if attempt == retries or not is_transient(e):
+                return f"{file_path}: {e}"
+        time.sleep(delay)
+        delay *= 2
+
+
+def delete_files(file_paths: Iterable[str], retries: int = DEFAULT_DELETE_RETRIES,
+                 retry_delay: float = DEFAULT_RETRY_DELAY) -> tuple[list[str], list[str]]:
+    """Delete a batch of archived source files, returns the deleted paths and error messages for the rest."""
+    deleted, errors = [], []
+    for file_path in file_paths:
+        error = delete_file(file_path, retries, retry_delay)
+        if error:
+            errors.append(error)
+        else:
+            deleted.append(file_path)
+    return deleted, errors
+
+
+@dataclass
+class DeletionBatch:
+    """Files of one archive handed to the deletion stage, and what became of them."""
+    label: str  # Shown in the log, usually the archive path
+    file_paths: list[str]
+    deleted: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+class DeletionStage:
+    """Thread pool deleting the files of archives, the files of one archive are spread over all workers.
+
+    Used as the last stage of the pipeline (see logzipper.pipeline), delete() is called from
+    the stage's threads, so deleting one archive's files overlaps with building the next archives.
+    """
+
+    def __init__(self, workers: int = DEFAULT_DELETE_WORKERS, chunk_size: int = DEFAULT_DELETE_CHUNK,
+                 retries: int = DEFAULT_DELETE_RETRIES, retry_delay: float = DEFAULT_RETRY_DELAY):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="delete")
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def delete(self, label: str, file_paths: Iterable[str]) -> DeletionBatch:
+        """Delete a batch of files on the workers and wait until every one of them is dealt with."""
+        batch = DeletionBatch(label, list(file_paths))
+        futures = [self.executor.submit(delete_files, batch.file_paths[start:start + self.chunk_size], self.retries, self.retry_delay)
+                   for start in range(0, len(batch.file_paths), self.chunk_size)]
+        for future in futures:
+            deleted, errors = future.result()
+            batch.deleted.extend(deleted)
+            batch.errors.extend(errors)
+        return batch
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    def __enter__(self) -> "DeletionStage":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,224 @@
+import io
+import mmap
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Optional
+from zlib import crc32
+
+# Read buffer used when streaming a member into the archive
+DEFAULT_CHUNK_SIZE: int = 1024 * 1024
+# Files at least this big are streamed by the writer instead of being compressed in memory
+DEFAULT_STREAM_THRESHOLD: int = 64 * 1024 * 1024
+
+# Files at least this big are memory-mapped and handed to the compressor without copying them into Python buffers,
+# None reads every file with read()/readinto()
+DEFAULT_MMAP_THRESHOLD: Optional[int] = 16 * 1024 * 1024
+
+# Picks (compression, compresslevel) for a (file_path, arcname) member, see logzipper.routing
+CompressionRoute = Callable[[str, str], tuple[int, Optional[int]]]
+
+# General purpose flag of lzma members whose data ends with an end-of-stream marker (APPNOTE 4.4.4, bit 1)
+LZMA_EOS_FLAG: int = 0x02
+# Private parts of zipfile that writing precompressed members relies on, CPython 3.9 to 3.13 have all of them.
+# Without one of them every member is compressed by the writer itself through ZipFile.open(zinfo, "w")
+ZIPFILE_INTERNALS = ("_get_compressor",)
+ZIPFILE_WRITER_INTERNALS = ("_writing", "_seekable", "start_dir", "_writecheck", "_didModify")
+
+
+@dataclass
+class CompressedMember:
+    """A member whose bytes were already compressed, ready to be written as-is."""
+    zinfo: zipfile.ZipInfo
+    data: bytes
+
+
+def precompression_supported(zipf: Optional[zipfile.ZipFile] = None) -> bool:
+    """Check that zipfile, and the archive zipf if given, have the private parts compress_member and write_compressed_member use."""
+    if not all(hasattr(zipfile, name) for name in ZIPFILE_INTERNALS):
+        return False
+    return zipf is None or all(hasattr(zipf, name) for name in ZIPFILE_WRITER_INTERNALS)
+
+
+def set_compress_level(zinfo: zipfile.ZipInfo, compresslevel: Optional[int]) -> None:
+    """Level ZipFile.open(zinfo, "w") compresses the member with, public as compress_level since Python 3.13."""
+    if hasattr(zinfo, "compress_level"):
+        zinfo.compress_level = compresslevel
+    elif hasattr(zinfo, "_compresslevel"):
+        zinfo._compresslevel = compresslevel
+    # Otherwise the member gets the format's default level
+
+
+def compressed_size(data: bytes, compression: int, compresslevel: Optional[int] = None) -> int:
+    """Size of data compressed the way a zip member would be, on the calling thread."""
+    if precompression_supported():
+        compressor = zipfile._get_compressor(compression, compresslevel)
+        return len(compressor.compress(data) + compressor.flush()) if compressor else len(data)
+    with io.BytesIO() as buffer, zipfile.ZipFile(buffer, "w") as zipf:
+        zipf.writestr("sample", data, compression, compresslevel)
+        return zipf.getinfo("sample").compress_size
+
+
+def map_file(src, mmap_threshold: Optional[int] = DEFAULT_MMAP_THRESHOLD) -> Optional[mmap.mmap]:
+    """Read-only mapping of an open file of mmap_threshold bytes or more, None for smaller files or files that can't be mapped."""
+    if mmap_threshold is None:
+        return None
+    size = os.fstat(src.fileno()).st_size
+    if size == 0 or size < mmap_threshold:
+        return None  # Empty files can't be mapped
+    try:
+        return mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None  # e.g. a network share without mapping support, read() still works
+
+
+def copy_source(src, write: Callable[[memoryview], object], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                mmap_threshold: Optional[int] = DEFAULT_MMAP_THRESHOLD) -> None:
+    """Pass the contents of an open file to write() in chunks, as memoryviews that are only valid during the call.
+
+    Large files are memory-mapped and sliced, so the compressor reads the page cache directly,
+    smaller ones are read into one reused buffer.
+    """
+    mapped = map_file(src, mmap_threshold)
+    if mapped is None:
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        while read := src.readinto(buffer):
+            write(view[:read])
+        return
+    with mapped, memoryview(mapped) as view:
+        for offset in range(0, len(view), chunk_size):
+            write(view[offset:offset + chunk_size])
+
+
+def compress_member(file_path: str, arcname: str, compression: int, compresslevel: Optional[int] = None,
+                    mmap_threshold: Optional[int] = DEFAULT_MMAP_THRESHOLD) -> CompressedMember:
+    """Read one file and compress it the same way ZipFile.write would, without touching the archive.
+
+    deflate, bz2 and lzma release the GIL while compressing, so this scales over threads.
+    Files of mmap_threshold bytes or more are compressed straight from a memory mapping.
+    Only usable when precompression_supported().
+    """
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+    zinfo.compress_type = compression
+
+    with open(file_path, "rb") as src:
+        mapped = map_file(src, mmap_threshold)
+        raw = src.read() if mapped is None else mapped
+        try:
+            # zipfile's own compressor factory, so the lzma member header matches what ZipFile.write produces
+            compressor = zipfile._get_compressor(compression, compresslevel)
+            data = compressor.compress(raw) + compressor.flush() if compressor else bytes(raw)
+            zinfo.file_size = len(raw)
+            zinfo.CRC = crc32(raw)
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+    zinfo.compress_size = len(data)
+    return CompressedMember(zinfo, data)
+
+
+def write_compressed_member(zipf: zipfile.ZipFile, member: CompressedMember) -> None:
+    """Append a precompressed member to an archive opened for writing.
+
+    Mirrors ZipFile._open_to_write/_ZipWriteFile.close, except that CRC and sizes are
+    already known, so the local header is written once and no compressor runs here.
+    Only usable when precompression_supported(zipf).
+    """
+    if not zipf.fp:
+        raise ValueError("Attempt to write to ZIP archive that was already closed")
+    if zipf._writing:
+        raise ValueError("Can't write to ZIP archive while an open writing handle exists")
+
+    zinfo = member.zinfo
+    zinfo.flag_bits = 0x00
+    if zinfo.compress_type == zipfile.ZIP_LZMA:
+        # Compressed data includes an end-of-stream (EOS) marker
+        zinfo.flag_bits |= LZMA_EOS_FLAG
+    if not zinfo.external_attr:
+        zinfo.external_attr = 0o600 << 16  # permissions: ?rw-------
+
+    if zipf._seekable:
+        zipf.fp.seek(zipf.start_dir)
+    zinfo.header_offset = zipf.fp.tell()
+    zipf._writecheck(zinfo)
+    zipf._didModify = True
+
+    # zip64=None lets ZipInfo decide from the (already known) sizes
+    zipf.fp.write(zinfo.FileHeader(None))
+    zipf.fp.write(member.data)
+    zipf.start_dir = zipf.fp.tell()
+
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+
+
+def stream_member(zipf: zipfile.ZipFile, file_path: str, arcname: str, compression: int,
+                  compresslevel: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  mmap_threshold: Optional[int] = DEFAULT_MMAP_THRESHOLD) -> None:
+    """Copy one file into the archive in fixed-size chunks, so memory use does not depend on the file size."""
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+    zinfo.compress_type = compression
+    set_compress_level(zinfo, compresslevel)
+
+    # force_zip64 keeps the member valid even if the log grew past 4 GiB after it was stat'ed
+    with open(file_path, "rb") as src, zipf.open(zinfo, "w", force_zip64=True) as dest:
+        copy_source(src, dest.write, chunk_size, mmap_threshold)
+
+
+def write_members_parallel(zipf: zipfile.ZipFile, members: Iterable[tuple[str, str, int]], compression: int,
+                           compresslevel: Optional[int] = None, workers: Optional[int] = None,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE, stream_threshold: int = DEFAULT_STREAM_THRESHOLD,
+                           router: Optional[CompressionRoute] = None,
+                           mmap_threshold: Optional[int] = DEFAULT_MMAP_THRESHOLD) -> Iterator[str]:
+    """Compress (file_path, arcname, size) members on a thread pool and write them to zipf in the given order.
+
+    Yields each arcname once its member is in the archive. Only a few members per worker are
+    compressed ahead of the writer, and files of stream_threshold bytes or more are streamed by
+    the writer itself, so memory stays bounded no matter how big a single log file is.
+    With a router every member gets the compression the router picks for it instead of compression.
+    Files of mmap_threshold bytes or more are read through a memory mapping, see copy_source.
+    On a Python whose zipfile lacks the internals of write_compressed_member, every member is
+    streamed by the writer, one after another.
+    """
+    def codec(file_path: str, arcname: str) -> tuple[int, Optional[int]]:
+        return router(file_path, arcname) if router else (compression, compresslevel)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or not precompression_supported(zipf):
+        for file_path, arcname, _ in members:
+            stream_member(zipf, file_path, arcname, *codec(file_path, arcname), chunk_size, mmap_threshold)
+            yield arcname
+        return
+
+    members = iter(members)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit_next() -> bool:
+            for file_path, arcname, size in members:
+                if size >= stream_threshold:
+                    # Placeholder, the writer streams this one when it gets to it
+                    pending.append((file_path, arcname))
+                else:
+                    pending.append(executor.submit(compress_member, file_path, arcname, *codec(file_path, arcname), mmap_threshold))
+                return True
+            return False
+
+        for _ in range(workers * 2):
+            if not submit_next():
+                break
+
+        # The single writer takes results strictly in submission order
+        while pending:
+            entry = pending.popleft()
+            submit_next()
+            if isinstance(entry, tuple):
+                stream_member(zipf, *entry, *codec(*entry), chunk_size, mmap_threshold)
+                yield entry[1]
+            else:
+                member = entry.result()
+                write_compressed_member(zipf, member)
+                yield member.zinfo.filename
@@ -0,0 +1,46 @@
+"""Wildcard patterns of the GUI (e.g. 2024_08*, info_message*, 2024_08*.gz), each of them names one archive."""
+import os
+import re
+from typing import Iterable, Optional
+
+from logzipper.scanner import LogFileEntry
+
+
+def wildcard_regex(pattern: str) -> str:
+    """Regular expression of one pattern: * matches anything, a pattern without a file type of its own only matches .log files."""
+    regex = re.escape(pattern).replace("\\*", ".*")
+    file_type = os.path.splitext(pattern)[1]
+    if file_type and "*" not in file_type:
+        return regex
+    return f"(?=.*\\.log$){regex}"
+
+
+def archive_name(pattern: str) -> str:
+    """Name of the archive a pattern's files go to, the pattern without its wildcards."""
+    return pattern.replace("*", "")
+
+
+class PatternMatcher:
+    """All patterns compiled into one regular expression, so every file name is matched once instead of once per pattern.
+
+    A file matching several patterns goes to the archive of the first of them only.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(dict.fromkeys(patterns))  # A pattern given twice would only write its archive twice
+        alternatives = "|".join(f"(?P<p{index}>{wildcard_regex(pattern)})" for index, pattern in enumerate(self.patterns))
+        self.regex = re.compile(alternatives) if self.patterns else None
+
+    def match(self, filename: str) -> Optional[str]:
+        """The first pattern matching filename, None if there is none."""
+        match = self.regex.fullmatch(filename) if self.regex else None
+        return self.patterns[int(match.lastgroup[1:])] if match else None
+
+    def group(self, files: Iterable[LogFileEntry]) -> dict[str, list[LogFileEntry]]:
+        """Files per pattern, in pattern order, patterns without a matching file get an empty list."""
+        groups = {pattern: [] for pattern in self.patterns}
+        for log_file in files:
+            pattern = self.match(log_file.name)
+            if pattern is not None:
+                groups[pattern].append(log_file)
+        return groups
@@ -0,0 +1,194 @@
+"""Archive jobs run through a pipeline of stages: build (read, compress, write) -> verify -> delete.
+
+Each stage works on several archives at once and hands its results on in job order. Between
+two stages at most queue_size archives are in flight, so a slow stage (e.g. deleting on a
+network share) holds back the stages before it instead of letting work pile up in memory,
+and discovery, which feeds the jobs, only runs as far ahead as the build stage can take.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Iterable, Iterator, Optional
+
+from logzipper.archive import ArchiveJob, ArchiveResult, build_month_archive
+from logzipper.control import RunControl
+from logzipper.deletion import DEFAULT_DELETE_WORKERS, DeletionStage
+from logzipper.progress import ByteProgress, PeriodicCall
+from logzipper.verify import verify_result
+
+# Marks the end of a stage's input
+_END = object()
+# Counter of the input bytes archived by the build workers of a process pool, set in every worker by _share_progress
+_shared_progress = None
+# Seconds between two hand-overs of that counter to the run's ByteProgress
+PROGRESS_RELAY_INTERVAL: float = 0.2
+
+
+@dataclass
+class PipelineOptions:
+    """Concurrency of every stage and how far stages may run ahead of each other."""
+    archive_workers: Optional[int] = None  # Archives built at the same time, None = one per CPU core
+    verify_workers: Optional[int] = None  # Archives read back at the same time, None = one per CPU core
+    delete_workers: int = DEFAULT_DELETE_WORKERS  # Threads deleting log files
+    queue_size: Optional[int] = None  # Archives in flight per stage, None = twice the stage's workers
+    # Build and verify on process pools. False runs them on threads of this process, e.g. in the GUI,
+    # the compressors release the GIL, and 1 worker is one after another in this process either way
+    processes: bool = True
+
+    def capacity(self, workers: int) -> int:
+        return self.queue_size or workers * 2
+
+
+def _uses_processes(workers: int, processes: bool) -> bool:
+    return processes and workers > 1
+
+
+def _stage_executor(workers: int, processes: bool, relay: Optional["ProgressRelay"] = None) -> Executor:
+    if _uses_processes(workers, processes):
+        if relay is not None:
+            return ProcessPoolExecutor(max_workers=workers, initializer=_share_progress, initargs=(relay.counter,))
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def _share_progress(counter) -> None:
+    global _shared_progress
+    _shared_progress = counter
+
+
+def _count_shared_progress(size: int) -> None:
+    with _shared_progress.get_lock():
+        _shared_progress.value += size
+
+
+def build_in_worker(job: ArchiveJob) -> ArchiveResult:
+    """build_month_archive in a process pool worker, counting the bytes of every member in the counter shared with the parent."""
+    return build_month_archive(job, progress=_count_shared_progress)
+
+
+class ProgressRelay:
+    """Hands the bytes the build processes count in a shared counter on to a ByteProgress, every interval seconds.
+
+    Without it a process pool only reports an archive once it is complete, so a long month
+    would show no progress at all until its last member is written.
+    """
+
+    def __init__(self, progress: ByteProgress, interval: float = PROGRESS_RELAY_INTERVAL):
+        self.counter = multiprocessing.Value("q", 0)
+        self.progress = progress
+        self.relayed = 0
+        self.periodic_call = PeriodicCall(self.relay, interval)
+
+    def relay(self) -> None:
+        with self.counter.get_lock():
+            counted = self.counter.value
+        if counted > self.relayed:
+            self.progress.advance(counted - self.relayed)
+            self.relayed = counted
+
+    def __enter__(self) -> "ProgressRelay":
+        self.periodic_call.__enter__()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.periodic_call.__exit__(*exc_info)
+
+
+def run_stage(function: Callable, items: Iterable, executor: Executor, capacity: int) -> Iterator:
+    """Run function over items on executor and yield the results in item order, each as soon as it is ready.
+
+    A feeder thread takes items from the previous stage and submits them, but never more than
+    capacity at a time: it waits until the caller took a result before it submits the next item.
+    Errors while taking items are raised to the caller. When the caller stops early, no further
+    items are submitted.
+    """
+    slots = threading.Semaphore(capacity)
+    futures = queue.Queue()
+    stopped = threading.Event()
+
+    def feed() -> None:
+        try:
+            for item in items:
+                slots.acquire()
+                if stopped.is_set():
+                    return
+                futures.put(executor.submit(function, item))
+        except BaseException as e:
+            futures.put(e)
+        finally:
+            futures.put(_END)
+
+    feeder = threading.Thread(target=feed, name=f"feed-{getattr(function, '__name__', 'stage')}", daemon=True)
+    feeder.start()
+    try:
+        while (entry := futures.get()) is not _END:
+            if isinstance(entry, BaseException):
+                raise entry
+            result = entry.result()
+            slots.release()
+            yield result
+    finally:
+        stopped.set()
+        slots.release()  # Wakes a feeder waiting for a slot, so it sees the stop
+
+
+def delete_result(result: ArchiveResult, deletion: DeletionStage) -> ArchiveResult:
+    """Delete the log files of a built and verified archive, if its job asks for it."""
+    if result.ok and result.job.delete_files and result.file_paths:
+        batch = deletion.delete(result.job.archive_path, result.file_paths)
+        result.deleted, result.delete_errors = batch.deleted, batch.errors
+    return result
+
+
+def count_jobs(jobs: Iterable[ArchiveJob], progress: ByteProgress) -> Iterator[ArchiveJob]:
+    for job in jobs:
+        progress.add_total(job.input_bytes)
+        yield job
+
+
+def run_pipeline(jobs: Iterable[ArchiveJob], options: Optional[PipelineOptions] = None,
+                 progress: Optional[ByteProgress] = None, control: Optional[RunControl] = None) -> Iterator[ArchiveResult]:
+    """Build, verify and clean up archive jobs, yield every result in job order once it went through all stages.
+
+    jobs may be a generator that is still discovering directories, it is consumed on a
+    feeder thread as far as the build stage has room. The caller records and logs the results,
+    deleted files are in result.deleted.
+
+    progress counts the input bytes of every job once the build stage takes it, and the bytes
+    archived member by member. Build processes count them in a shared counter, a ProgressRelay
+    passes it on to progress a few times per second.
+
+    control pauses or cancels the run before the next job and, on threads, before the next
+    member. After a cancel the archives already started are completed, verified and cleaned up,
+    jobs not started yet are not built: a job already handed to the build stage comes back with
+    result.cancelled and nothing written, the others are not taken from jobs at all.
+    """
+    options = options or PipelineOptions()
+    archive_workers = options.archive_workers or os.cpu_count() or 1
+    verify_workers = options.verify_workers or os.cpu_count() or 1
+    delete_capacity = options.capacity(1)
+    build_processes = _uses_processes(archive_workers, options.processes)
+    relay = ProgressRelay(progress) if progress is not None and build_processes else None
+    with relay if relay is not None else nullcontext(), \
+            _stage_executor(archive_workers, options.processes, relay) as archive_executor, \
+            _stage_executor(verify_workers, options.processes) as verify_executor, \
+            DeletionStage(options.delete_workers) as deletion, \
+            ThreadPoolExecutor(max_workers=delete_capacity) as delete_executor:
+        build = build_month_archive
+        if control is not None:
+            jobs = control.iterate(jobs)
+        if progress is not None:
+            jobs = count_jobs(jobs, progress)
+        if relay is not None:
+            build = build_in_worker
+        elif not build_processes and (progress is not None or control is not None):
+            build = partial(build_month_archive, progress=progress.advance if progress is not None else None, control=control)
+        built = run_stage(build, jobs, archive_executor, options.capacity(archive_workers))
+        verified = run_stage(verify_result, built, verify_executor, options.capacity(verify_workers))
+        # Several archives are deleted at once, each of them spread over the deletion workers
+        yield from run_stage(lambda result: delete_result(result, deletion), verified, delete_executor, delete_capacity)
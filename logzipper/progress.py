@@ -0,0 +1,152 @@
+"""Progress of a whole run by input bytes, shared by the tqdm bars of the scripts and the GUI's progress bar,
+and the throughput of past archives that estimates for the next runs are based on.
+"""
+import json
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Callable, Optional
+
+# Seconds of recent progress the throughput is measured over, long enough to even out small and big files
+DEFAULT_RATE_WINDOW: float = 30.0
+# Archives per format that size and duration estimates are based on
+DEFAULT_HISTORY_LENGTH: int = 20
+# Seconds between two calls of a PeriodicCall, e.g. redraws of a progress bar
+DEFAULT_REFRESH_INTERVAL: float = 0.5
+
+
+class ByteProgress:
+    """Input bytes of all archive jobs of a run and how many of them are archived, with throughput and ETA.
+
+    The total grows while discovery still hands out jobs, so the fraction and ETA are provisional
+    until the last job is known. The throughput is measured over the last window seconds rather
+    than the whole run, so the ETA follows when the run moves from small logs to big ones.
+    Jobs are added and advanced from the pipeline's threads, everything is read under a lock.
+    """
+
+    def __init__(self, total_bytes: int = 0, window: float = DEFAULT_RATE_WINDOW):
+        self.lock = threading.Lock()
+        self.total_bytes = total_bytes
+        self.done_bytes = 0
+        self.window = window
+        self.start = time.perf_counter()
+        self.samples = deque([(self.start, 0)])  # (time, done_bytes) within the window
+
+    def add_total(self, size: int) -> None:
+        """Count the input bytes of another job."""
+        with self.lock:
+            self.total_bytes += size
+
+    def advance(self, size: int) -> None:
+        """Count size bytes as archived, called for every member written and for the rest of a job once it is done."""
+        with self.lock:
+            self.done_bytes += size
+            now = time.perf_counter()
+            self.samples.append((now, self.done_bytes))
+            # Keep one sample older than the window, so the rate always spans the whole window
+            while len(self.samples) > 2 and self.samples[1][0] < now - self.window:
+                self.samples.popleft()
+
+    @property
+    def fraction(self) -> float:
+        with self.lock:
+            return self.done_bytes / self.total_bytes if self.total_bytes else 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    @property
+    def mb_per_second(self) -> float:
+        """Input MB archived per second over the last window seconds."""
+        with self.lock:
+            (first_time, first_done), now = self.samples[0], time.perf_counter()
+            done = self.done_bytes - first_done
+        return done / (now - first_time) / (1024 * 1024) if done and now > first_time else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds until the jobs known so far are archived at the current throughput, None before anything is measured."""
+        rate = self.mb_per_second
+        if not rate:
+            return None
+        with self.lock:
+            remaining = self.total_bytes - self.done_bytes
+        return max(remaining, 0) / (rate * 1024 * 1024)
+
+    def describe(self) -> str:
+        """Throughput and ETA for a progress bar, e.g. '35.2 MB/s, ETA 0:02:10'."""
+        eta = self.eta
+        eta_text = "--:--" if eta is None else str(timedelta(seconds=round(eta)))
+        return f"{self.mb_per_second:.1f} MB/s, ETA {eta_text}"
+
+
+class PeriodicCall:
+    """Calls function every interval seconds on a daemon thread while used as a context manager, and once more at its end.
+
+    Keeps a progress display moving while an archive is written, instead of redrawing it only
+    when the next result comes back.
+    """
+
+    def __init__(self, function: Callable[[], object], interval: float = DEFAULT_REFRESH_INTERVAL):
+        self.function = function
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="periodic-call", daemon=True)
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.function()
+
+    def __enter__(self) -> "PeriodicCall":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stopped.set()
+        self.thread.join()
+        self.function()
+
+
+class ThroughputHistory:
+    """Input bytes, archive bytes and seconds of the last archives per format, to estimate the next archives before a run.
+
+    The samples are plain lists, so the history can be kept as JSON, e.g. in the GUI's settings.
+    """
+
+    def __init__(self, samples: Optional[dict[str, list[list]]] = None, length: int = DEFAULT_HISTORY_LENGTH):
+        self.samples = samples or {}  # {archive format: [[input bytes, archive bytes, seconds], ...]}, oldest first
+        self.length = length
+
+    def record(self, archive_format: str, input_bytes: int, output_bytes: int, seconds: float) -> None:
+        if input_bytes <= 0 or seconds <= 0:
+            return
+        samples = self.samples.setdefault(archive_format, [])
+        samples.append([input_bytes, output_bytes, seconds])
+        del samples[:-self.length]
+
+    def estimate(self, archive_format: str, input_bytes: int) -> Optional[tuple[int, float]]:
+        """(archive bytes, seconds) of input_bytes in archive_format, from the ratio and speed over its recent archives.
+
+        Big archives weigh more than small ones, as they tell more about the speed. None without history.
+        """
+        samples = self.samples.get(archive_format)
+        if not samples:
+            return None
+        recorded = sum(sample[0] for sample in samples)
+        output_bytes = sum(sample[1] for sample in samples)
+        seconds = sum(sample[2] for sample in samples)
+        return round(input_bytes * output_bytes / recorded), input_bytes * seconds / recorded
+
+    def to_json(self) -> str:
+        return json.dumps(self.samples)
+
+    @classmethod
+    def from_json(cls, text: Optional[str], length: int = DEFAULT_HISTORY_LENGTH) -> "ThroughputHistory":
+        """History from to_json(), an empty one if text is empty or unreadable."""
+        try:
+            samples = json.loads(text) if text else {}
+        except ValueError:
+            samples = {}
+        return cls(samples if isinstance(samples, dict) else {}, length)
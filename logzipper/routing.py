@@ -0,0 +1,53 @@
+import os
+import zipfile
+from typing import Optional
+
+# Formats that are compressed already, compressing them again costs CPU time and saves nothing
+COMPRESSED_EXTENSIONS = {
+    ".gz", ".tgz", ".zip", ".7z", ".bz2", ".xz", ".lzma", ".zst", ".rar", ".jar", ".war",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".mp3", ".mp4", ".avi", ".mkv",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods",
+}
+# Text formats that are never sniffed, they always get the archive's codec
+TEXT_EXTENSIONS = {".log", ".txt", ".csv", ".xml", ".json", ".edi", ".out", ".err", ".trc"}
+# Leading bytes of compressed formats, for files with an unknown or missing extension (e.g. rotated server.log.1)
+COMPRESSED_MAGIC_NUMBERS = (
+    b"\x1f\x8b",                  # gzip
+    b"PK\x03\x04",                # zip and the Office formats
+    b"7z\xbc\xaf\x27\x1c",        # 7z
+    b"BZh",                       # bzip2
+    b"\xfd7zXZ\x00",              # xz
+    b"\x28\xb5\x2f\xfd",          # zstd
+    b"Rar!\x1a\x07",              # rar
+    b"\x89PNG\r\n\x1a\n",         # png
+    b"\xff\xd8\xff",              # jpeg
+    b"GIF8",                      # gif
+)
+
+
+def is_compressed(file_path: str) -> bool:
+    """Tell already compressed files apart by their extension, files of unknown types by their first bytes."""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in COMPRESSED_EXTENSIONS:
+        return True
+    if extension in TEXT_EXTENSIONS:
+        return False
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(8)
+    except OSError:
+        return False  # Let the writer report the file
+    return head.startswith(COMPRESSED_MAGIC_NUMBERS)
+
+
+class CompressionRouter:
+    """Chooses the zip compression of each member: stored for compressed files, the archive's codec for everything else."""
+
+    def __init__(self, compression: int, compresslevel: Optional[int] = None):
+        self.compression = compression
+        self.compresslevel = compresslevel
+
+    def __call__(self, file_path: str, arcname: str) -> tuple[int, Optional[int]]:
+        if is_compressed(file_path):
+            return zipfile.ZIP_STORED, None
+        return self.compression, self.compresslevel
@@ -0,0 +1,156 @@
+import os
+import re
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from fnmatch import fnmatch
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+# Log files start with their date, e.g. 2024_03_20_server.log or 2024_08_27.adminrequest.log
+LOG_DATE_PATTERN = re.compile(r"^(\d{4})_(\d{2})_(\d{2})")
+
+
+class LogFileEntry(NamedTuple):
+    """One file found by the scanner, with the stat data the directory listing already delivered."""
+    path: str
+    name: str
+    size: int
+    mtime: float
+    date: Optional[datetime]  # Date from the yyyy_mm_dd file name prefix, None if there is none
+
+    @property
+    def year_month(self) -> Optional[str]:
+        """Month of the file name date in yyyy-mm format, as used for the archive names."""
+        return self.date.strftime("%Y-%m") if self.date else None
+
+
+@dataclass
+class DirectoryScan:
+    """Everything one os.scandir pass over a directory returned."""
+    path: str
+    files: list[LogFileEntry] = field(default_factory=list)
+    subdirectories: list[str] = field(default_factory=list)
+    relative_path: Optional[str] = None  # Path below the discovery root, None for the root itself
+    depth: int = 0
+    error: Optional[str] = None  # Set instead of raising when discovery could not list the directory
+
+
+def log_family(filename: str) -> str:
+    """Name of a file without its yyyy_mm_dd prefix, e.g. "server.log" for 2024_03_20_server.log.
+
+    Files of one family are written by the same application and look alike from day to day.
+    Files without a date prefix are grouped by their extension.
+    """
+    match = LOG_DATE_PATTERN.match(filename)
+    if not match:
+        return os.path.splitext(filename)[1].lstrip(".") or filename
+    return filename[match.end():].lstrip("_.") or "log"
+
+
+def parse_log_date(filename: str) -> Optional[datetime]:
+    """Parse the yyyy_mm_dd prefix of a file name, None if it has none or it is not a valid date."""
+    match = LOG_DATE_PATTERN.match(filename)
+    if not match:
+        return None
+    try:
+        return datetime(*map(int, match.groups()))
+    except ValueError:
+        return None
+
+
+def scan_directory(path: str, suffix: Optional[str] = ".log") -> DirectoryScan:
+    """List a directory once and collect its files ending with suffix (None = all files) and its subdirectories.
+
+    DirEntry caches the file type, and on Windows also size and mtime, from the directory
+    listing itself, so a network share costs one listing instead of a round trip per file.
+    """
+    scan = DirectoryScan(path)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                scan.subdirectories.append(entry.name)
+            elif entry.is_file() and (suffix is None or entry.name.endswith(suffix)):
+                stat = entry.stat()
+                scan.files.append(LogFileEntry(entry.path, entry.name, stat.st_size, stat.st_mtime, parse_log_date(entry.name)))
+    return scan
+
+
+@dataclass
+class FolderIndex:
+    """All files of one directory from a single listing, with the figures shown before a run.
+
+    Built in the background by the GUI and reused by the run itself, until the directory changes.
+    """
+    path: str
+    files: list[LogFileEntry] = field(default_factory=list)  # Every file, patterns may select other types than .log
+    error: Optional[str] = None
+
+    @property
+    def log_files(self) -> list[LogFileEntry]:
+        return [log_file for log_file in self.files if log_file.name.endswith(".log")]
+
+    @property
+    def log_bytes(self) -> int:
+        return sum(log_file.size for log_file in self.log_files)
+
+    @property
+    def months(self) -> dict[str, int]:
+        """Number of log files per yyyy-mm of their file name date, oldest month first."""
+        counts = Counter(log_file.year_month for log_file in self.log_files if log_file.date is not None)
+        return dict(sorted(counts.items()))
+
+
+def index_directory(path: str) -> FolderIndex:
+    """List all files of a directory into a FolderIndex, an unreadable directory is reported in its error."""
+    try:
+        return FolderIndex(path, scan_directory(path, suffix=None).files)
+    except OSError as e:
+        return FolderIndex(path, error=str(e))
+
+
+def is_excluded(relative_path: str, exclude: Iterable[str]) -> bool:
+    """Check a directory against exclude patterns, matched against its name and its path below the root."""
+    name = os.path.basename(relative_path)
+    relative_path = relative_path.replace(os.sep, "/")
+    return any(fnmatch(name, pattern) or fnmatch(relative_path, pattern.replace("\\", "/")) for pattern in exclude)
+
+
+def discover_directories(root: str, max_depth: Optional[int] = 1, exclude: Iterable[str] = (), workers: int = 8,
+                         suffix: Optional[str] = ".log", max_pending: Optional[int] = None) -> Iterator[DirectoryScan]:
+    """Scan root and its subdirectories down to max_depth levels, listing up to workers directories at once.
+
+    Listing a network share is latency bound, so the listings run on a thread pool. Every
+    DirectoryScan is yielded as soon as it is listed, so the caller can start archiving while
+    deeper levels are still being discovered. max_depth=0 only scans root, None has no limit.
+    Excluded directories are neither yielded nor descended into. At most max_pending listings
+    (default: twice the workers) are running or waiting for the caller, the others wait unlisted,
+    so a caller that is busy archiving holds back discovery instead of piling up scans.
+    """
+    exclude = list(exclude)
+
+    def scan(path: str, relative_path: Optional[str], depth: int) -> DirectoryScan:
+        try:
+            directory_scan = scan_directory(path, suffix)
+        except OSError as e:
+            directory_scan = DirectoryScan(path, error=f"{type(e).__name__}: {e}")
+        directory_scan.relative_path = relative_path
+        directory_scan.depth = depth
+        return directory_scan
+
+    max_pending = max_pending or workers * 2
+    unlisted = deque([(root, None, 0)])
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        while unlisted or pending:
+            while unlisted and len(pending) < max_pending:
+                pending.add(executor.submit(scan, *unlisted.popleft()))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                directory_scan = future.result()
+                if max_depth is None or directory_scan.depth < max_depth:
+                    for subdirectory in directory_scan.subdirectories:
+                        relative_path = subdirectory if directory_scan.relative_path is None else os.path.join(directory_scan.relative_path, subdirectory)
+                        if not is_excluded(relative_path, exclude):
+                            unlisted.append((os.path.join(directory_scan.path, subdirectory), relative_path, directory_scan.depth + 1))
+                yield directory_scan
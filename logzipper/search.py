@@ -0,0 +1,261 @@
+"""Search the archives written by LogfileZipper without extracting them.
+
+Members are decompressed in memory and searched chunk by chunk, archives (and large groups of
+members of zip based archives) are searched in parallel on a process pool:
+
+    python -m logzipper.search "OutOfMemoryError" D:\\logs\\archive
+    python -m logzipper.search -i -F "order 4711" 2024-03.tar.zst --since "2024-03-20 10:00" --until "2024-03-20 11:00"
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from logzipper.archive import map_in_order
+from logzipper.backends import ARCHIVE_EXTENSIONS, ArchiveBackend, ZstdTarBackend, backend_for_path
+from logzipper.seekable import LINE_TIMESTAMP_PATTERN, iter_lines_between, normalize_timestamp, read_archive_index
+
+# Uncompressed bytes of zip members searched by one pool task, fewer tasks for small archives keep the pool overhead low
+DEFAULT_TASK_SIZE: int = 64 * 1024 * 1024
+# Longer lines are reported cut to this many characters
+MAX_REPORTED_LINE_LENGTH: int = 2000
+
+
+class SearchMatch(NamedTuple):
+    archive_path: str
+    member: str
+    line_number: Optional[int]  # None for lines found through the timestamp index of a tar.zst archive
+    line: str
+
+    def __str__(self) -> str:
+        line_number = "" if self.line_number is None else self.line_number
+        return f"{self.archive_path}:{self.member}:{line_number}:{self.line}"
+
+
+@dataclass
+class SearchQuery:
+    """What to look for, shared by all tasks of a search.
+
+    since and until ("yyyy-mm-dd hh:mm:ss" or a prefix of it, inclusive) restrict the search to lines
+    whose timestamp lies in between. Lines without a timestamp belong to the timestamped line before them.
+    """
+    pattern: str
+    ignore_case: bool = False
+    fixed_string: bool = False
+    since: Optional[str] = None
+    until: Optional[str] = None
+    max_count: Optional[int] = None  # Matches per task, the command line applies it to the whole search
+
+    def compile(self) -> re.Pattern:
+        pattern = re.escape(self.pattern) if self.fixed_string else self.pattern
+        return re.compile(pattern.encode(), re.MULTILINE | (re.IGNORECASE if self.ignore_case else 0))
+
+    @property
+    def filters_time(self) -> bool:
+        return self.since is not None or self.until is not None
+
+    def in_time_range(self, timestamp: Optional[str]) -> bool:
+        if not self.filters_time:
+            return True
+        return timestamp is not None and (self.since is None or timestamp >= self.since) and (self.until is None or timestamp[:len(self.until)] <= self.until)
+
+
+class SearchTask(NamedTuple):
+    archive_path: str
+    members: Optional[list[str]]  # None = all members of the archive
+    query: SearchQuery
+
+
+@dataclass
+class SearchResult:
+    archive_path: str
+    matches: list[SearchMatch] = field(default_factory=list)
+    bytes_searched: int = 0  # Uncompressed bytes
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+class MaxCountReached(Exception):
+    """Raised from a writer to stop decompressing once a task has found enough matches."""
+
+
+class LineSearcher:
+    """stream_members writer that searches one member for a pattern, line by line.
+
+    Only complete lines are handed to the regex engine, the incomplete last line of a chunk is
+    carried over to the next one. Line numbers are counted only up to the matches.
+    """
+
+    def __init__(self, result: SearchResult, member: str, pattern: re.Pattern, query: SearchQuery):
+        self.result = result
+        self.member = member
+        self.pattern = pattern
+        self.query = query
+        self.carry = b""
+        self.line_number = 1  # Number of the first line in the carried data
+        self.timestamp: Optional[str] = None  # Timestamp in effect at the start of the carried data
+
+    def write(self, data: bytes) -> None:
+        self.result.bytes_searched += len(data)
+        buffer = self.carry + data
+        end = buffer.rfind(b"\n") + 1
+        self.search(buffer, end)
+        self.carry = buffer[end:]
+
+    def close(self) -> None:
+        if self.carry:
+            self.search(self.carry, len(self.carry))
+            self.carry = b""
+
+    def update_timestamp(self, buffer: bytes, start: int, line_start: int) -> None:
+        """Look back from the line at line_start, no further than start, for the last line with a timestamp."""
+        position = line_start
+        while True:
+            match = LINE_TIMESTAMP_PATTERN.match(buffer, position)
+            if match:
+                self.timestamp = normalize_timestamp(match[0])
+                return
+            if position <= start:
+                return
+            position = max(buffer.rfind(b"\n", start, position - 1) + 1, start)
+
+    def search(self, buffer: bytes, end: int) -> None:
+        position = 0  # Start of the first line not counted yet
+        while match := self.pattern.search(buffer, position, end):
+            line_start = buffer.rfind(b"\n", position, match.start()) + 1 or position
+            line_end = buffer.find(b"\n", match.start(), end)
+            line_end = end if line_end < 0 else line_end
+            self.line_number += buffer.count(b"\n", position, line_start)
+            if self.query.filters_time:
+                self.update_timestamp(buffer, position, line_start)
+            if self.query.in_time_range(self.timestamp):
+                self.add_match(buffer[line_start:line_end], self.line_number)
+            position = line_end + 1
+            if position > end:
+                return  # The carried line matched, it has been searched completely
+            self.line_number += 1
+        self.line_number += buffer.count(b"\n", position, end)
+        if self.query.filters_time and position < end:
+            self.update_timestamp(buffer, position, buffer.rfind(b"\n", position, end - 1) + 1 or position)
+
+    def add_match(self, line: bytes, line_number: Optional[int]) -> None:
+        text = line.rstrip(b"\r\n").decode("utf-8", errors="replace")[:MAX_REPORTED_LINE_LENGTH]
+        self.result.matches.append(SearchMatch(self.result.archive_path, self.member, line_number, text))
+        if self.query.max_count is not None and len(self.result.matches) >= self.query.max_count:
+            raise MaxCountReached()
+
+
+def search_indexed(result: SearchResult, pattern: re.Pattern, query: SearchQuery, index) -> None:
+    """Search only the frames of a tar.zst archive that hold lines of the query's time range."""
+    searchers = {}
+    for member, line in iter_lines_between(result.archive_path, query.since, query.until, index):
+        searcher = searchers.get(member) or searchers.setdefault(member, LineSearcher(result, member, pattern, query))
+        result.bytes_searched += len(line)
+        if pattern.search(line):
+            searcher.add_match(line, None)
+
+
+def search_task(task: SearchTask) -> SearchResult:
+    """Search the members of one task, runs inside a pool worker. Errors are reported in the result."""
+    result = SearchResult(task.archive_path)
+    start = time.perf_counter()
+    pattern = task.query.compile()
+    try:
+        backend = backend_for_path(task.archive_path)
+        index = None
+        if task.query.filters_time and isinstance(backend, ZstdTarBackend):
+            index = read_archive_index(task.archive_path)
+        if index is not None and index.members:
+            search_indexed(result, pattern, task.query, index)
+        else:
+            backend.stream_members(task.archive_path, lambda member: LineSearcher(result, member, pattern, task.query), task.members)
+    except MaxCountReached:
+        pass
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def find_archives(paths: Iterable[str]) -> list[str]:
+    """The given archives, and the archives in the given directories and their subdirectories, sorted by path."""
+    archives = []
+    for path in paths:
+        if not os.path.isdir(path):
+            archives.append(path)
+            continue
+        for dirpath, _, filenames in os.walk(path):
+            archives.extend(os.path.join(dirpath, name) for name in filenames if name.endswith(tuple(ARCHIVE_EXTENSIONS)))
+    return sorted(archives)
+
+
+def plan_tasks(archive_paths: Iterable[str], query: SearchQuery, task_size: int = DEFAULT_TASK_SIZE) -> Iterator[SearchTask]:
+    """One task per archive, archives whose members can be read one by one are split into groups of about task_size bytes."""
+    for archive_path in archive_paths:
+        try:
+            backend: ArchiveBackend = backend_for_path(archive_path)
+            members = backend.list_members(archive_path) if backend.random_access else None
+        except Exception:
+            members = None  # Let the task report the archive
+        if not members or sum(size for size, _ in members.values()) <= task_size:
+            yield SearchTask(archive_path, None, query)
+            continue
+        group, group_size = [], 0
+        for arcname, (size, _) in members.items():
+            group.append(arcname)
+            group_size += size
+            if group_size >= task_size:
+                yield SearchTask(archive_path, group, query)
+                group, group_size = [], 0
+        if group:
+            yield SearchTask(archive_path, group, query)
+
+
+def search_archives(paths: Iterable[str], query: SearchQuery, workers: Optional[int] = None,
+                    task_size: int = DEFAULT_TASK_SIZE) -> Iterator[SearchResult]:
+    """Search archives and directories of archives, yields the results in archive and member order.
+
+    See map_in_order for workers.
+    """
+    return map_in_order(search_task, plan_tasks(find_archives(paths), query, task_size), workers)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m logzipper.search", description="Search log archives without extracting them.")
+    parser.add_argument("pattern", help="Regular expression (Python syntax) or, with -F, plain text")
+    parser.add_argument("paths", nargs="+", help="Archives or directories with archives")
+    parser.add_argument("-i", "--ignore-case", action="store_true")
+    parser.add_argument("-F", "--fixed-strings", action="store_true", help="Search for the pattern as plain text")
+    parser.add_argument("--since", help="Only lines from this time on, e.g. \"2024-03-20 10:00\"")
+    parser.add_argument("--until", help="Only lines up to this time (inclusive), e.g. \"2024-03-20\" for the whole day")
+    parser.add_argument("-m", "--max-count", type=int, help="Stop after this many matches")
+    parser.add_argument("-w", "--workers", type=int, help="Processes searching in parallel (default: one per CPU core)")
+    args = parser.parse_args(argv)
+
+    query = SearchQuery(args.pattern, args.ignore_case, args.fixed_strings, args.since, args.until, args.max_count)
+    start = time.perf_counter()
+    match_count = bytes_searched = 0
+    failed = False
+    for result in search_archives(args.paths, query, args.workers):
+        bytes_searched += result.bytes_searched
+        if result.error:
+            failed = True
+            print(f"{result.archive_path}: {result.error}", file=sys.stderr)
+        for match in result.matches:
+            print(match)
+            match_count += 1
+            if args.max_count is not None and match_count >= args.max_count:
+                break
+        if args.max_count is not None and match_count >= args.max_count:
+            break
+    duration = time.perf_counter() - start
+    print(f"{match_count} matches in {bytes_searched / (1024 * 1024):.1f} MB, "
+          f"{bytes_searched / (1024 * 1024) / duration if duration else 0.0:.1f} MB/s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
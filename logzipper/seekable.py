@@ -0,0 +1,235 @@
+import json
+import re
+import struct
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # Only needed for the tar.zst format
+    zstandard = None
+
+# Lines starting with a timestamp like 2024-03-20 10:15:00 or 2024-03-20T10:15:00,123
+LINE_TIMESTAMP_PATTERN = re.compile(rb"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}", re.MULTILINE)
+TIMESTAMP_LENGTH = len("2024-03-20 10:15:00")
+# The same after a line break, a literal first character lets the regex engine skip ahead much faster than ^
+NEXT_LINE_TIMESTAMP_PATTERN = re.compile(rb"\n(\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2})")
+# A line longer than this is only checked for a timestamp at its start, the rest is not kept around
+MAX_LINE_LENGTH: int = 64 * 1024
+
+# zstd seekable format (contrib/seekable_format in the zstd repository): a skippable frame with
+# the compressed and decompressed size of every frame, ending with a footer
+SEEK_TABLE_MAGIC = 0x184D2A5E
+SEEKABLE_MAGIC = 0x8F92EAB1
+SEEK_TABLE_FOOTER = struct.Struct("<IBI")  # Number_Of_Frames, Seek_Table_Descriptor, Seekable_Magic_Number
+# Skippable frame right before the seek table, holding the zstd compressed JSON of the timestamp index. It is the
+# last entry of the seek table, without decompressed data, so seekable readers find every frame where the table says
+TIMESTAMP_INDEX_MAGIC = 0x184D2A50
+SKIPPABLE_HEADER = struct.Struct("<II")  # Magic_Number, Frame_Size
+
+
+def normalize_timestamp(timestamp: bytes) -> str:
+    """"yyyy-mm-dd hh:mm:ss" of a matched timestamp, whatever separates date and time."""
+    return f"{timestamp[:10].decode()} {timestamp[11:].decode()}"
+
+
+class TimestampIndexer:
+    """Read-only file wrapper that records the first and last line timestamp of every frame a member spans.
+
+    Wrapped around the source of a tar member while it is written, data_offset is where the
+    member's data starts in the uncompressed tar and block_size the size of the frames it is
+    cut into, so every line start maps to exactly one frame. Timestamps are compared as strings,
+    "yyyy-mm-dd hh:mm:ss" sorts like the time it stands for.
+    """
+
+    def __init__(self, fileobj, data_offset: int, block_size: int):
+        self.fileobj = fileobj
+        self.data_offset = data_offset
+        self.block_size = block_size
+        self.position = data_offset
+        self.carry = b""  # Incomplete last line of the data read so far
+        self.mid_line = False  # Set when the start of the carried line was dropped
+        self.ranges: dict[int, list[str]] = {}  # frame: [first timestamp, last timestamp]
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fileobj.read(size)
+        if data:
+            self.scan(data)
+        else:
+            self.finish()
+        return data
+
+    def add(self, frame: int, first: bytes, last: bytes) -> None:
+        first, last = normalize_timestamp(first), normalize_timestamp(last)
+        frame_range = self.ranges.setdefault(frame, [first, last])
+        frame_range[0] = min(frame_range[0], first)
+        frame_range[1] = max(frame_range[1], last)
+
+    def scan_lines(self, buffer: bytes, buffer_offset: int, start: int, end: int) -> None:
+        """Index the lines starting in buffer[start:end], frame by frame, so the regex engine does the per-line work."""
+        while start < end:
+            frame = (buffer_offset + start) // self.block_size
+            frame_end = min(end, (frame + 1) * self.block_size - buffer_offset)
+            # Line breaks from right before start, a timestamp right before the frame border still belongs to this frame
+            timestamps = NEXT_LINE_TIMESTAMP_PATTERN.findall(buffer, max(start - 1, 0), min(end, frame_end + TIMESTAMP_LENGTH - 1))
+            if start == 0 and (match := LINE_TIMESTAMP_PATTERN.match(buffer)):
+                timestamps.append(match[0])
+            if timestamps:
+                self.add(frame, min(timestamps), max(timestamps))
+            start = frame_end
+
+    def scan(self, data: bytes) -> None:
+        buffer = self.carry + data
+        buffer_offset = self.position - len(self.carry)
+        self.position += len(data)
+        # Only complete lines are scanned, so every match starts at a real line start
+        end = buffer.rfind(b"\n") + 1
+        start = 0
+        if self.mid_line:
+            start = end and buffer.find(b"\n") + 1
+            if not start:
+                self.carry = b""  # Still inside a dropped line
+                return
+            self.mid_line = False
+        self.scan_lines(buffer, buffer_offset, start, end)
+        self.carry = buffer[end:]
+        if len(self.carry) > MAX_LINE_LENGTH:
+            self.finish()
+            self.mid_line = True
+
+    def finish(self) -> None:
+        """Index the carried line, i.e. the last line of the member if it has no line break."""
+        if self.carry and not self.mid_line and (match := LINE_TIMESTAMP_PATTERN.match(self.carry)):
+            frame = (self.position - len(self.carry)) // self.block_size
+            self.add(frame, match[0], match[0])
+        self.carry = b""
+
+
+@dataclass
+class IndexedMember:
+    """Where a member's data is in the uncompressed tar and the timestamps of its lines per frame."""
+    offset: int
+    size: int
+    ranges: list[tuple[int, str, str]] = field(default_factory=list)  # (frame, first timestamp, last timestamp)
+
+
+@dataclass
+class ArchiveIndex:
+    """Seek table and timestamp index of a seekable tar.zst archive."""
+    block_size: int
+    frames: list[tuple[int, int]]  # (compressed size, decompressed size) of every data frame
+    members: dict[str, IndexedMember] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.compressed_offsets = [0]
+        self.decompressed_offsets = [0]
+        for compressed_size, decompressed_size in self.frames:
+            self.compressed_offsets.append(self.compressed_offsets[-1] + compressed_size)
+            self.decompressed_offsets.append(self.decompressed_offsets[-1] + decompressed_size)
+
+    def frames_between(self, start: Optional[str] = None, end: Optional[str] = None, arcname: Optional[str] = None) -> list[int]:
+        """Frames with lines from start to end (inclusive, "yyyy-mm-dd hh:mm:ss" or a prefix of it), of one or all members.
+
+        Timestamp prefixes compare as ranges, end="2024-03-20" includes the whole day.
+        """
+        frames = set()
+        for name, member in self.members.items():
+            if arcname is not None and name != arcname:
+                continue
+            for frame, first, last in member.ranges:
+                if (start is None or last >= start) and (end is None or first[:len(end)] <= end):
+                    frames.add(frame)
+        return sorted(frames)
+
+    def to_json(self) -> bytes:
+        members = {name: [member.offset, member.size, member.ranges] for name, member in self.members.items()}
+        return json.dumps({"version": 1, "block_size": self.block_size, "members": members}, separators=(",", ":")).encode()
+
+    @classmethod
+    def from_json(cls, data: bytes, frames: list[tuple[int, int]]) -> "ArchiveIndex":
+        document = json.loads(data)
+        members = {name: IndexedMember(offset, size, [tuple(r) for r in ranges]) for name, (offset, size, ranges) in document["members"].items()}
+        return cls(document["block_size"], frames, members)
+
+
+def skippable_frame(magic: int, payload: bytes) -> bytes:
+    return SKIPPABLE_HEADER.pack(magic, len(payload)) + payload
+
+
+def write_index_frames(fileobj, index: ArchiveIndex) -> None:
+    """Append the timestamp index and the seek table after the last data frame."""
+    index_frame = skippable_frame(TIMESTAMP_INDEX_MAGIC, zstandard.ZstdCompressor(level=9).compress(index.to_json()))
+    fileobj.write(index_frame)
+    frames = [*index.frames, (len(index_frame), 0)]
+    entries = b"".join(struct.pack("<II", compressed_size, decompressed_size) for compressed_size, decompressed_size in frames)
+    fileobj.write(skippable_frame(SEEK_TABLE_MAGIC, entries + SEEK_TABLE_FOOTER.pack(len(frames), 0, SEEKABLE_MAGIC)))
+
+
+def read_archive_index(archive_path: str) -> Optional[ArchiveIndex]:
+    """Seek table and timestamp index of a tar.zst archive, None for archives written without them."""
+    with open(archive_path, "rb") as f:
+        file_size = f.seek(0, 2)
+        if file_size < SEEK_TABLE_FOOTER.size:
+            return None
+        f.seek(-SEEK_TABLE_FOOTER.size, 2)
+        frame_count, descriptor, magic = SEEK_TABLE_FOOTER.unpack(f.read(SEEK_TABLE_FOOTER.size))
+        if magic != SEEKABLE_MAGIC:
+            return None
+        entry_size = 12 if descriptor & 0x80 else 8  # With checksums every entry has 4 more bytes
+        f.seek(-(SEEK_TABLE_FOOTER.size + frame_count * entry_size), 2)
+        entries = f.read(frame_count * entry_size)
+        frames = [struct.unpack_from("<II", entries, number * entry_size) for number in range(frame_count)]
+
+        # The timestamp index is the last frame of the table, archives of earlier versions have it after the listed frames
+        if frames and frames[-1][1] == 0:
+            frames.pop()
+        f.seek(sum(compressed_size for compressed_size, _ in frames))
+        magic, size = SKIPPABLE_HEADER.unpack(f.read(SKIPPABLE_HEADER.size))
+        if magic != TIMESTAMP_INDEX_MAGIC:
+            return ArchiveIndex(0, frames)
+        return ArchiveIndex.from_json(zstandard.ZstdDecompressor().decompress(f.read(size)), frames)
+
+
+def read_frames(archive_path: str, index: ArchiveIndex, frames: Iterable[int]) -> Iterator[tuple[int, bytes]]:
+    """Decompress only the given frames, yields (frame, uncompressed data)."""
+    decompressor = zstandard.ZstdDecompressor()
+    with open(archive_path, "rb") as f:
+        for frame in frames:
+            f.seek(index.compressed_offsets[frame])
+            yield frame, decompressor.decompress(f.read(index.frames[frame][0]), max_output_size=index.frames[frame][1])
+
+
+def iter_lines_between(archive_path: str, start: Optional[str] = None, end: Optional[str] = None,
+                       index: Optional[ArchiveIndex] = None) -> Iterator[tuple[str, bytes]]:
+    """Yield (arcname, line) of every line from start to end, decompressing only the frames they are in.
+
+    Lines without a timestamp (e.g. stack traces) belong to the timestamped line before them.
+    A line crossing into the next frame is cut there, unless that frame is needed as well.
+    """
+    index = index or read_archive_index(archive_path)
+    if index is None:
+        raise ValueError(f"'{archive_path}' has no seek table, only tar.zst archives written by this version are seekable")
+    frames = index.frames_between(start, end)
+    # Consecutive frames are decompressed together, so lines crossing their border stay whole
+    runs = []
+    for frame in frames:
+        if runs and runs[-1][-1] == frame - 1:
+            runs[-1].append(frame)
+        else:
+            runs.append([frame])
+    for run in runs:
+        data = b"".join(chunk for _, chunk in read_frames(archive_path, index, run))
+        run_start = index.decompressed_offsets[run[0]]
+        run_end = run_start + len(data)
+        for name, member in index.members.items():
+            member_start, member_end = max(member.offset, run_start), min(member.offset + member.size, run_end)
+            if member_start >= member_end:
+                continue
+            in_range = False
+            for line in data[member_start - run_start:member_end - run_start].splitlines(keepends=True):
+                match = LINE_TIMESTAMP_PATTERN.match(line)
+                if match:
+                    timestamp = normalize_timestamp(match[0])
+                    in_range = (start is None or timestamp >= start) and (end is None or timestamp[:len(end)] <= end)
+                if in_range:
+                    yield name, line
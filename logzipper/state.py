@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Iterable, NamedTuple, Optional
+
+from logzipper.backends import backend_for_path
+from logzipper.scanner import LogFileEntry
+
+# Life cycle of a log file in the run state
+STATUS_QUEUED = "queued"        # Handed to an archive job, the run may have stopped before it finished
+STATUS_ARCHIVED = "archived"    # Stored in a closed archive
+STATUS_DELETED = "deleted"      # Archived and removed from the log directory
+STATUS_FAILED = "failed"        # The archive job failed, or the file's member failed verification
+STATUS_CONFLICT = "conflict"    # The archive holds a different file with the same name
+STATUS_SKIPPED = "skipped"      # Left in place by the size limit
+STATUS_MISSING = "missing"      # Vanished from the log directory without ending up in its archive
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path      TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    size      INTEGER NOT NULL,
+    mtime     REAL NOT NULL,
+    archive   TEXT,
+    status    TEXT NOT NULL,
+    updated   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+"""
+
+
+class FileState(NamedTuple):
+    """What the last runs recorded for one log file."""
+    path: str
+    size: int
+    mtime: float
+    archive: Optional[str]
+    status: str
+
+
+class RunState:
+    """Small SQLite index of every log file the archiver has seen, kept next to the history log.
+
+    Only the process that drives the run writes to it, pool workers never touch it. Within that
+    process the pipeline's stage threads share it, a lock serializes their statements.
+    Every update is committed right away, so after a crash the index reflects what was done.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def load_directory(self, directory: str) -> dict[str, FileState]:
+        """All recorded files of one directory, keyed by path, loaded with a single query."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT path, size, mtime, archive, status FROM files WHERE directory = ?", (directory,)).fetchall()
+        return {row[0]: FileState(*row) for row in rows}
+
+    @staticmethod
+    def is_unchanged(entry: LogFileEntry, state: Optional[FileState]) -> bool:
+        """Check that a scanned file is still the one the state was recorded for."""
+        return state is not None and state.size == entry.size and state.mtime == entry.mtime
+
+    def mark(self, entries: Iterable[LogFileEntry], status: str, archive: Optional[str] = None) -> None:
+        """Record the status (and target archive) of scanned files."""
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO files (path, directory, size, mtime, archive, status, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(e.path, os.path.dirname(e.path), e.size, e.mtime, archive, status, now) for e in entries])
+
+    def set_status(self, paths: Iterable[str], status: str) -> None:
+        """Change the status of already recorded files, e.g. once they were deleted."""
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany("UPDATE files SET status = ?, updated = ? WHERE path = ?",
+                                        [(status, now, path) for path in paths])
+
+    def queue_job(self, job, known_files: dict[str, FileState]) -> None:
+        """Mark the files of an archive job as queued before it is handed to the pool.
+
+        Files an earlier run already put into the same archive, and that did not change since,
+        are recorded in job.archived_paths instead, so the job can skip their CRC check.
+        """
+        archived_paths = set()
+        for entry in job.files:
+            state = known_files.get(entry.path)
+            if self.is_unchanged(entry, state) and state.status == STATUS_ARCHIVED and state.archive == job.archive_path:
+                archived_paths.add(entry.path)
+        job.archived_paths = frozenset(archived_paths)
+        self.mark([entry for entry in job.files if entry.path not in archived_paths], STATUS_QUEUED, job.archive_path)
+
+    def record_result(self, result) -> None:
+        """Record the outcome of a finished archive job."""
+        job = result.job
+        if not result.ok:
+            # A failed archive is never trusted, not even for the files written before the error
+            self.mark(job.files, STATUS_FAILED, job.archive_path)
+            return
+        entries = {entry.path: entry for entry in job.files}
+        self.mark([entries[path] for path in result.file_paths], STATUS_ARCHIVED, job.archive_path)
+        self.set_status(result.deleted, STATUS_DELETED)
+        self.mark([entries[path] for path in result.unverified], STATUS_FAILED, job.archive_path)
+        self.mark([entries[path] for path in result.conflicts], STATUS_CONFLICT, job.archive_path)
+        self.mark([entries[path] for path in result.skipped], STATUS_SKIPPED, job.archive_path)
+
+    def unfinished(self) -> list[FileState]:
+        """Files a previous run queued but never finished, i.e. where an interrupted run stopped."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT path, size, mtime, archive, status FROM files WHERE status = ?", (STATUS_QUEUED,)).fetchall()
+        return [FileState(*row) for row in rows]
+
+    def settle_unfinished(self) -> list[FileState]:
+        """Settle the files an interrupted run left queued and return those that still need archiving.
+
+        A queued file that is gone but present in its archive was deleted right after archiving,
+        one that is gone and not in its archive is marked missing. Files that still exist are
+        picked up again by the next scan.
+        """
+        by_archive = defaultdict(list)
+        for state in self.unfinished():
+            if not os.path.exists(state.path):
+                by_archive[state.archive].append(state)
+
+        for archive, states in by_archive.items():
+            try:
+                archived_names = set(backend_for_path(archive).list_members(archive))
+            except Exception:
+                # Missing, unreadable, or its format's optional dependency isn't installed
+                archived_names = set()
+            deleted = [s.path for s in states if os.path.basename(s.path) in archived_names]
+            self.set_status(deleted, STATUS_DELETED)
+            self.set_status([s.path for s in states if os.path.basename(s.path) not in archived_names], STATUS_MISSING)
+        return self.unfinished()
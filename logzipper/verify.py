@@ -0,0 +1,100 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from logzipper.archive import ArchiveCheck, ArchiveResult
+from logzipper.backends import ArchiveBackend, backend_for_path
+from logzipper.parallel_zip import DEFAULT_CHUNK_SIZE
+
+
+@dataclass
+class ArchiveVerification:
+    """Outcome of decompressing the members of one archive and checking them against the writer."""
+    archive_path: str
+    passed: list[str] = field(default_factory=list)  # arcnames
+    failed: list[str] = field(default_factory=list)  # "arcname: reason"
+    bytes_checked: int = 0  # Uncompressed bytes read back
+    duration: float = 0.0
+    error: Optional[str] = None  # Set when the archive could not be opened at all
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.failed
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes_checked / (1024 * 1024) / self.duration if self.duration else 0.0
+
+
+def verify_archive(archive_path: str, expected: dict[str, tuple[int, int]], backend: Optional[ArchiveBackend] = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> ArchiveVerification:
+    """Decompress the expected {arcname: (size, crc)} members of an archive and check them.
+
+    The expected values are the ones the writer computed while compressing the sources, so the
+    sources are not read a second time, or for members an appended archive held already, the ones
+    it lists. Members not in expected are not checked.
+    backend defaults to the one matching the archive's extension.
+    """
+    backend = backend or backend_for_path(archive_path)
+    verification = ArchiveVerification(archive_path)
+    start = time.perf_counter()
+    try:
+        for arcname, read_size, failure in backend.read_back(archive_path, expected, chunk_size):
+            verification.bytes_checked += read_size
+            if failure:
+                verification.failed.append(f"{arcname}: {failure}")
+            else:
+                verification.passed.append(arcname)
+    except Exception as e:
+        # The archive could not be opened or listed at all, none of its members passed
+        verification.error = f"{type(e).__name__}: {e}"
+    verification.duration = time.perf_counter() - start
+    return verification
+
+
+def verification_from_check(archive_path: str, expected: dict[str, tuple[int, int]], check: ArchiveCheck) -> ArchiveVerification:
+    """Verification of the expected members from the listing write_archive checked the archive with before its rename.
+
+    Only for backends with listing_decompresses: their listing decompressed every member and
+    computed its CRC, reading the archive a second time would check the same data again.
+    """
+    verification = ArchiveVerification(archive_path, duration=check.duration)
+    verification.bytes_checked = sum(size for size, _ in check.members.values())
+    for arcname, member in expected.items():
+        listed = check.members.get(arcname)
+        if listed is None:
+            verification.failed.append(f"{arcname}: missing from the archive")
+        elif listed != member:
+            verification.failed.append(f"{arcname}: decompressed data does not match the written size/CRC")
+        else:
+            verification.passed.append(arcname)
+    return verification
+
+
+def verify_result(result: ArchiveResult) -> ArchiveResult:
+    """Verify the members an archive job wrote, only the files that passed stay up for deletion.
+
+    Runs inside a pool worker. Files of members that failed are taken out of result.file_paths
+    and listed in result.unverified, so the delete stage leaves them alone and they are not recorded as archived.
+    Members that were in the archive before this run are read back as well, against the size and
+    CRC the archive lists for them: an earlier run may have left them damaged.
+    Archives whose backend decompresses them to list them were read back by the build stage
+    already, see verification_from_check.
+    """
+    job = result.job
+    if not result.ok or not job.verify:
+        return result
+    expected = {**result.archived, **result.written}
+    if expected:
+        if job.backend.listing_decompresses and result.check is not None:
+            verification = verification_from_check(job.archive_path, expected, result.check)
+        else:
+            verification = verify_archive(job.archive_path, expected, job.backend, job.chunk_size)
+        result.verification = verification
+        failed = set(expected) - set(verification.passed)
+        if failed:
+            result.unverified = [os.path.join(job.base_path, arcname) for arcname in sorted(failed)]
+            result.file_paths = [path for path in result.file_paths if os.path.basename(path) not in failed]
+    return result
+
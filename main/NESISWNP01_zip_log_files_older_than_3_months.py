@@ -1,6 +1,4 @@
 import os
-import re
-import zipfile
 import logging
 import time
 import calendar
@@ -12,9 +10,21 @@ from datetime import datetime, timedelta
 # Get directory where the script is currently located
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
+# The shared archiving core lives in the repository root, one level above this script
+sys.path.insert(0, os.path.dirname(script_dir))
+from logzipper.archive import create_archive_jobs
+from logzipper.autoselect import CodecSelector
+from logzipper.backends import create_backend
+from logzipper.pipeline import PipelineOptions, run_pipeline
+from logzipper.progress import ByteProgress, PeriodicCall
+from logzipper.scanner import discover_directories
+from logzipper.state import RunState
+
 # ========== Logging Configuration ========== #
 log_dir = os.path.join(script_dir, "logs")
 log_file = os.path.join(log_dir, "NESISWNP01_3_months_old_logs_zip_history.log")
+# Run state index: which log files were queued, archived and deleted, used to resume interrupted runs
+run_state_file = os.path.join(log_dir, "NESISWNP01_3_months_old_logs_run_state.sqlite")
 
 # Create the directory if it doesn't exist
 if not os.path.exists(log_dir):
@@ -31,7 +41,8 @@ logging.basicConfig(level=logging.INFO,
 
 logger = logging.getLogger(__name__)
 
-logger.info(f"Script started in current working directory: {script_dir}")
+if __name__ == "__main__":  # Pool workers re-import this module, only log the start once
+    logger.info(f"Script started in current working directory: {script_dir}")
 
 # ========== END Logging Configuration END ========== #
 
@@ -46,8 +57,50 @@ try:
         raise FileNotFoundError
 except FileNotFoundError:
     sys.exit(1)
+
+# Number of (directory, month) archives built at the same time, 1 = one after another in this process
+ARCHIVE_WORKERS: int = os.cpu_count() or 1
+# Archives read back and checked at the same time, log files are only cleaned up once their archive member passed
+VERIFY_WORKERS: int = os.cpu_count() or 1
+# Archive format: "zip-deflate", "zip-bz2", "zip-lzma", "7z" (7-Zip executable or py7zr), "tar.zst" (zstandard package), "tar.xz",
+# "zstd-dict" (zstandard package, a dictionary per log family for many small files)
+# or "auto", which samples every month and takes the best compressing format and level that meets the AUTO_ targets
+ARCHIVE_FORMAT: str = "zip-bz2"
+# Compression level of the format (zip 1-9, 7z 0-9, zstd 1-22), None = the format's default
+COMPRESSION_LEVEL = None
+# Threads compressing one archive (zip: files in parallel, 7z/zstd: their own multithreading), raise it when a single month dominates the run
+COMPRESSION_THREADS: int = 1
+# Solid formats (7z, tar.zst, tar.xz) compress blocks of this many bytes independently, this bounds memory and how much
+# has to be decompressed to extract one file. None = the format's default (7z: 7-Zip's own, tar.zst/tar.xz: 16 MiB)
+SOLID_BLOCK_SIZE = None
+# Auto mode: minimum speed in MB/s per archive, and optionally a time window in seconds all archives of a run must fit in
+AUTO_MIN_THROUGHPUT: float = 10.0
+AUTO_TIME_WINDOW = None  # e.g. 4 * 3600 for a nightly window of 4 hours
+# Files are copied into the archives in chunks of this size, files of STREAM_THRESHOLD bytes or more are never read whole
+CHUNK_SIZE: int = 1024 * 1024
+STREAM_THRESHOLD: int = 64 * 1024 * 1024
+# Log files bigger than this are left in place and reported, None = archive everything
+MAX_LOG_FILE_SIZE = None
+# Late log files are added to an existing yyyy-mm archive instead of overwriting it, files already in it are not compressed again
+APPEND_TO_EXISTING_ARCHIVES: bool = True
+# Directory levels below the root that are searched for log files, 1 = only the immediate subdirectories
+DISCOVERY_DEPTH: int = 1
+# Directories listed at the same time, listing a network share is latency bound and not CPU bound
+DISCOVERY_WORKERS: int = 8
+# Directory names or paths relative to the root that are never archived, wildcards allowed (e.g. "DataWizard", "app/*/tmp")
+EXCLUDED_DIRECTORIES: list = []
+# Log files of verified archives are deleted on this many threads while the next archives are still compressed,
+# deletes that fail with a transient share error are retried with backoff
+DELETE_WORKERS: int = 8
+# Archives each pipeline stage (build, verify, delete) may run ahead of the next one, None = twice the stage's workers.
+# A slow stage, e.g. deleting on a share, holds back discovery and compression instead of letting finished archives pile up
+PIPELINE_QUEUE_SIZE = None
 # ============= END Path Configuration END ========== #
 
+# One selector for the whole run, it books the estimated time of every archive against the time window
+codec_selector = CodecSelector(min_throughput=AUTO_MIN_THROUGHPUT, time_window=AUTO_TIME_WINDOW, workers=ARCHIVE_WORKERS,
+                               threads=COMPRESSION_THREADS, block_size=SOLID_BLOCK_SIZE) if ARCHIVE_FORMAT == "auto" else None
+
 # ========== Function Definitions ========== #
 
 def get_cutoff_date():
@@ -63,81 +116,121 @@ def get_cutoff_date():
     return cutoff_date  # Keep it as datetime for comparison
 
 
-def is_file_older_than_cutoff(filename, cutoff_date):
-    """Check if file is older than the cutoff date based on filename."""
-    # Extract date from filename (assumes format starts with yyyy_mm_dd)
-    date_str = filename[:10]  # Extract yyyy_mm_dd part
-    try:
-        file_date = datetime.strptime(date_str, "%Y_%m_%d")
-        return file_date <= cutoff_date
-    except ValueError:
-        # If filename doesn't have proper date format, skip it
-        return False
-
-
-def group_log_files_by_month(root_directory, subdirectory=None):
-    """Group log files by year-month from specified directory, only if older than 3 months."""
-    try:
-        base_path = root_directory if subdirectory is None else os.path.join(root_directory, subdirectory)
-        files = os.listdir(base_path)
-    except OSError as e:
-        logger.error(f"Error accessing the directory: {e}")
-        return {}, None
-    
-    logger.info(f"Processing files in {base_path}...")
+def group_log_files_by_month(directory_scan):
+    """Group log files of a scanned directory by year-month, only if older than 3 months."""
+    logger.info(f"Processing files in {directory_scan.path}...")
     cutoff_date = get_cutoff_date()
     
-    # Filter log files matching yyyy_mm_dd pattern and older than 3 months
-    log_files = [f for f in files if os.path.isfile(os.path.join(base_path, f)) and 
-                re.match(r"^\d{4}_\d{2}_\d{2}.*\.log$", f) and
-                is_file_older_than_cutoff(f, cutoff_date)]
-    
-    # Group files by year-month
+    # Group log files with a yyyy_mm_dd date in their name older than 3 months by year-month (yyyy-mm for archive naming)
     monthly_files = defaultdict(list)
-    for log_file in log_files:
-        # Extract yyyy_mm from the filename
-        year_month = log_file[:7]  # Takes "yyyy_mm" part
-        # Convert to yyyy-mm format for zip naming
-        zip_key = year_month.replace("_", "-")
-        monthly_files[zip_key].append(log_file)
+    for log_file in directory_scan.files:
+        if log_file.date is not None and log_file.date <= cutoff_date:
+            monthly_files[log_file.year_month].append(log_file)
     
-    return monthly_files, base_path
+    return monthly_files
 
 
-def zip_monthly_files(monthly_files, base_path, log_files_to_cleanup, subdirectory=None):
-    """Create zip archives for each month's log files."""
+def zip_monthly_files(monthly_files, base_path, subdirectory=None):
+    """Create the archive jobs for each month's log files of one directory."""
     location = "root directory" if subdirectory is None else f"subdirectory '{subdirectory}'"
     
     if not monthly_files:
         logger.info(f"No files older than 3 months found in {location}")
-        return log_files_to_cleanup 
-    
-    # Create a zip file for each month
-    for year_month, files in tqdm(monthly_files.items(), desc=f"Creating monthly archive in {location}"):
-        # Create zip filename in format yyyy-mm.zip
-        zip_filename = f"{year_month}.zip"
-        zip_path = os.path.join(base_path, zip_filename)
-        
-        # Create the zip file
-        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_BZIP2) as zipf:
-            for log_file in tqdm(files, desc=f"Adding files to zip {zip_filename} in {base_path}"):
-                file_path = os.path.join(base_path, log_file)
-                # Store file in the zip with its original name
-                zipf.write(file_path, arcname=log_file)
-                # Add file to dictionary for later cleanup after zipping has finished
-                log_files_to_cleanup[year_month].append(file_path)
-
-        logger.info(f"Created {zip_filename} with {len(files)} log files")
+        return []
     
-    # Return statement moved OUTSIDE the loop - this was the bug!
-    return log_files_to_cleanup
+    job_options = dict(chunk_size=CHUNK_SIZE, stream_threshold=STREAM_THRESHOLD, max_file_size=MAX_LOG_FILE_SIZE,
+                       append=APPEND_TO_EXISTING_ARCHIVES, delete_files=True)
+    if codec_selector is None:
+        return create_archive_jobs(monthly_files, base_path, backend=create_backend(ARCHIVE_FORMAT, COMPRESSION_LEVEL, COMPRESSION_THREADS, SOLID_BLOCK_SIZE), **job_options)
+
+    # Auto mode: every month gets the format that compressed a sample of its files best within the targets
+    archive_jobs = []
+    for year_month, files in monthly_files.items():
+        decision = codec_selector.select(files, os.path.join(base_path, year_month))
+        logger.info(f"Auto-selected {decision} for {os.path.join(base_path, year_month)}")
+        archive_jobs.extend(create_archive_jobs({year_month: files}, base_path, backend=decision.backend, **job_options))
+    return archive_jobs
+
+
+def collect_archive_jobs(root_directory, run_state):
+    """Discover the root directory and its subdirectories and yield their archive jobs while discovery is still running.
+
+    Every job is recorded as queued in the run state before it is handed out.
+    """
+    for directory_scan in discover_directories(root_directory, DISCOVERY_DEPTH, EXCLUDED_DIRECTORIES, DISCOVERY_WORKERS):
+        location = "the root directory" if directory_scan.relative_path is None else f"the sub directory: {directory_scan.relative_path}"
+        if directory_scan.error:
+            logger.error(f"Error accessing {location}: {directory_scan.error}")
+            continue
+        monthly_files = group_log_files_by_month(directory_scan)
+        if monthly_files:
+            # One query per directory, each file is then checked against the index with a dictionary lookup
+            known_files = run_state.load_directory(directory_scan.path)
+            for archive_job in zip_monthly_files(monthly_files, directory_scan.path, directory_scan.relative_path):
+                run_state.queue_job(archive_job, known_files)
+                yield archive_job
+        else:
+            logger.info(f"No log files older than 3 months found in {location}")
+
+
+def log_deletions(result):
+    """Log the clean up of an archive's log files, one line per archive instead of one per log file."""
+    for error in result.delete_errors:
+        logger.error(f"Failed to delete {error}")
+    logger.info(f"Clean up - Deleted {len(result.deleted)} log files of {result.job.archive_path}")
+
+
+def show_progress(progress_bar, progress):
+    """Redraw the bar from the run's progress, called twice a second while archives are still being written."""
+    progress_bar.total = progress.total_bytes
+    progress_bar.update(progress.done_bytes - progress_bar.n)
+    progress_bar.set_postfix_str(progress.describe())
+
+
+def run_monthly_archives(archive_jobs, run_state):
+    """Run all archive jobs through the pipeline (build, verify, delete) and log each result in job order.
+
+    Every stage already works on the next archives while the later stages are busy, results arrive once their log files are deleted.
+    """
+    logger.info(f"Creating monthly archives with {ARCHIVE_WORKERS} worker(s), verifying them with {VERIFY_WORKERS} worker(s), "
+                f"deleting log files with {DELETE_WORKERS} thread(s)")
+    options = PipelineOptions(ARCHIVE_WORKERS, VERIFY_WORKERS, DELETE_WORKERS, PIPELINE_QUEUE_SIZE)
+    progress = ByteProgress()
+    # One bar over the input bytes of all archives, its total grows while directories are still being discovered.
+    # It is redrawn on its own thread, so it moves while a big month is compressed, not only when an archive is done
+    with tqdm(total=0, desc="Creating monthly archives", unit="B", unit_scale=True, unit_divisor=1024,
+              bar_format="{l_bar}{bar}| {n_fmt}B/{total_fmt}B [{elapsed}{postfix}]") as progress_bar, \
+            PeriodicCall(lambda: show_progress(progress_bar, progress)):
+        for result in run_pipeline(archive_jobs, options, progress):
+            archive_path = result.job.archive_path
+            run_state.record_result(result)
+            if not result.ok:
+                # Log files of a failed archive are never cleaned up
+                logger.error(f"Failed to create {archive_path}: {result.error}")
+                continue
+            for file_path in result.skipped:
+                logger.warning(f"Skipped {file_path} as it is bigger than {MAX_LOG_FILE_SIZE} bytes")
+            for file_path in result.conflicts:
+                logger.warning(f"Skipped {file_path} as {archive_path} already contains a different file with the same name")
+            if result.files_already_archived:
+                logger.info(f"{result.files_already_archived} log files were already archived in {archive_path}")
+            logger.info(f"Created {archive_path} with {result.files_zipped} log files in {result.duration:.2f} seconds")
+            if result.verification:
+                verification = result.verification
+                logger.info(f"Verified {len(verification.passed)} log files in {archive_path} "
+                            f"({verification.bytes_checked / (1024 * 1024):.1f} MB at {verification.mb_per_second:.1f} MB/s)")
+                if verification.error:
+                    logger.error(f"Failed to verify {archive_path}: {verification.error}")
+                for failure in verification.failed:
+                    logger.error(f"Verification failed in {archive_path} for {failure}")
+                if result.unverified:
+                    logger.error(f"Keeping {len(result.unverified)} log files as their archive members failed verification")
+            if result.deleted or result.delete_errors:
+                log_deletions(result)
+
 
 def process_directory(root_directory):
     """Process the root directory and all its subdirectories."""
-    
-    # Variables that contains log files to cleanup:
-    log_files_to_cleanup = defaultdict(list)
-    
     try:
         logger.info("============================================")
         logger.info(f"Starting log file archiving process in {root_directory}")
@@ -146,59 +239,19 @@ def process_directory(root_directory):
         logger.info(f"Cutoff date set to: {cutoff_date.strftime('%Y.%m.%d')}")  
         logger.info(f"Archiving files older than: {cutoff_date.strftime('%Y-%m-%d')} (3 months ago)")
 
-        # Process log files in the root directory
-        monthly_files, base_path = group_log_files_by_month(root_directory)
-        if monthly_files:
-            log_files_to_cleanup = zip_monthly_files(monthly_files, base_path, log_files_to_cleanup)
-            if log_files_to_cleanup:
-                log_files_cleanup(log_files_to_cleanup)
-                log_files_to_cleanup = defaultdict(list)  # Reset after cleanup
-        else:
-            logger.info("============================================")
-            logger.info("No log files older than 3 months found in the root directory")
-
-        # Get all subdirectories
-        subdirs = [d for d in os.listdir(root_directory) if os.path.isdir(os.path.join(root_directory, d))]
-        # Process each subdirectory
-        for subdir in subdirs:
-            monthly_files, base_path = group_log_files_by_month(root_directory, subdir)
-            if monthly_files:
-                log_files_to_cleanup = zip_monthly_files(monthly_files, base_path, log_files_to_cleanup, subdir)
-                if log_files_to_cleanup:
-                    log_files_cleanup(log_files_to_cleanup)
-                    log_files_to_cleanup = defaultdict(list)  # Reset after cleanup
-            else:
-                logger.info(f"No log files older than 3 months found in the sub directory: {subdir}")
-                
+        with RunState(run_state_file) as run_state:
+            unfinished = run_state.settle_unfinished()
+            if unfinished:
+                logger.info(f"Resuming interrupted run, {len(unfinished)} log files were queued but never finished")
+            
+            # Archives are built while deeper directories are still being discovered
+            run_monthly_archives(collect_archive_jobs(root_directory, run_state), run_state)
+
     except (FileNotFoundError, FileExistsError, OSError) as e:
         logger.error(f"Error accessing the directory: Exception: '{type(e).__name__}'. Error: '{e}'")
         print((f"Error accessing the directory: Exception: '{type(e).__name__}'. Error: '{e}'"))
 
 
-def log_files_cleanup(log_files_to_cleanup):
-    logger.info("============================================")
-    logger.info("Starting process to cleanup zipped log files")
-    logger.info("============================================")
-    logger.info("Checking if there are any log files to be cleaned up.")
-    if log_files_to_cleanup:
-        logger.info("Found log files to clean up for the following months:")
-        for key in log_files_to_cleanup:
-            logger.info(f"{key}")
-        for key, file_list in log_files_to_cleanup.items():
-            logger.info(f"Starting to clean up log files for '{key}'...")
-            for file_path in tqdm(file_list, desc="Deleting log files..."):
-                try:
-                    os.unlink(file_path)
-                    logger.info(f"Deleted log file: {file_path}")
-                except Exception as e:
-                    logger.error(f"Failed to delete {file_path}: {e}")
-            logger.info("==================================================")
-            logger.info(f"All log files have been DELETED for month '{key}'")
-            logger.info("==================================================")
-    else:
-        logger.info("Nothing to cleanup up, as no log files have been zipped.")
-
-
 if __name__ == "__main__":
     start_time = time.time()
     process_directory(logs_root_directory)
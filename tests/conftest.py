@@ -0,0 +1,43 @@
+import os
+import random
+
+import pytest
+
+from logzipper.backends import create_backend
+from logzipper.scanner import scan_directory
+
+
+def write_log(path: str, lines: int = 2000, seed: int = 0) -> str:
+    """Log file with timestamped lines, compressible like the real ones."""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="ascii") as f:
+        for i in range(lines):
+            f.write(f"2024-03-{1 + i % 28:02d} 10:{i // 60 % 60:02d}:{i % 60:02d} INFO [worker-{rng.randint(1, 8)}] "
+                    f"request {rng.randint(0, 99999)} finished in {rng.randint(1, 500)} ms\n")
+    return path
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    """Directory with a few log files of 2024-03, each with its own content."""
+    directory = tmp_path / "logs"
+    directory.mkdir()
+    for day in range(1, 6):
+        write_log(str(directory / f"2024_03_{day:02d}_server.log"), seed=day)
+    return str(directory)
+
+
+def scan_files(directory: str) -> list:
+    return sorted(scan_directory(directory).files)
+
+
+def backend_or_skip(archive_format: str, **options):
+    """Backend of a format, the test is skipped when the format's optional dependency is missing."""
+    try:
+        return create_backend(archive_format, **options)
+    except RuntimeError as e:
+        pytest.skip(str(e))
+
+
+def file_names(directory: str) -> set[str]:
+    return set(os.listdir(directory))
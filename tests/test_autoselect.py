@@ -0,0 +1,44 @@
+import os
+
+from conftest import scan_files, write_log
+from logzipper.autoselect import CodecSelector
+
+
+def month_files(directory: str, month: int, seed: int) -> list:
+    for day in range(1, 4):
+        write_log(os.path.join(directory, f"2024_{month:02d}_{day:02d}_server.log"), seed=seed + day)
+    return [log_file for log_file in scan_files(directory) if log_file.name.startswith(f"2024_{month:02d}")]
+
+
+class CountingSelector(CodecSelector):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.trials = 0
+
+    def trial(self, backend, sample):
+        self.trials += 1
+        return super().trial(backend, sample)
+
+
+def test_choice_is_kept_for_the_next_months(tmp_path):
+    selector = CountingSelector(min_throughput=0.1)
+    first = selector.select(month_files(str(tmp_path), 1, 0))
+    assert selector.trials == len(selector.backends)
+
+    second = selector.select(month_files(str(tmp_path), 2, 10))
+    assert selector.trials == len(selector.backends) + 1
+    assert second.backend is first.backend
+    assert second.reason.startswith("kept")
+
+
+def test_ratio_drift_samples_all_candidates_again(tmp_path):
+    selector = CountingSelector(min_throughput=0.1)
+    selector.select(month_files(str(tmp_path), 1, 0))
+    # Random data of the same log family compresses far worse
+    for day in range(1, 4):
+        with open(tmp_path / f"2024_02_{day:02d}_server.log", "wb") as f:
+            f.write(os.urandom(200_000))
+    files = [log_file for log_file in scan_files(str(tmp_path)) if log_file.name.startswith("2024_02")]
+    decision = selector.select(files)
+    assert selector.trials == 2 * len(selector.backends) + 1
+    assert len(decision.trials) == len(selector.backends)
@@ -0,0 +1,46 @@
+import errno
+import os
+
+from logzipper import deletion
+from logzipper.deletion import DeletionStage, delete_file
+
+
+def flaky_unlink(failures: list[OSError]):
+    """os.unlink that raises the given errors first and then deletes."""
+    real_unlink = os.unlink
+
+    def unlink(path):
+        if failures:
+            raise failures.pop(0)
+        real_unlink(path)
+    return unlink
+
+
+def test_transient_errors_are_retried(tmp_path, monkeypatch):
+    path = tmp_path / "a.log"
+    path.write_text("x")
+    monkeypatch.setattr(deletion.os, "unlink", flaky_unlink([OSError(errno.EBUSY, "busy"), OSError(errno.EIO, "io")]))
+    assert delete_file(str(path), retries=2, retry_delay=0) is None
+    assert not path.exists()
+
+
+def test_permanent_errors_are_not_retried(tmp_path, monkeypatch):
+    path = tmp_path / "a.log"
+    path.write_text("x")
+    failures = [OSError(errno.EACCES, "denied"), OSError(errno.EACCES, "denied")]
+    monkeypatch.setattr(deletion.os, "unlink", flaky_unlink(failures))
+    assert "denied" in delete_file(str(path), retries=2, retry_delay=0)
+    assert path.exists() and len(failures) == 1
+
+
+def test_stage_reports_every_file(tmp_path):
+    paths = []
+    for i in range(7):
+        path = tmp_path / f"{i}.log"
+        path.write_text("x")
+        paths.append(str(path))
+    with DeletionStage(workers=3, chunk_size=2) as stage:
+        batch = stage.delete("archive", paths + [str(tmp_path / "gone.log")])
+    assert sorted(batch.deleted) == sorted(paths)
+    assert len(batch.errors) == 1 and "gone.log" in batch.errors[0]
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,56 @@
+import os
+import zipfile
+
+import pytest
+
+from conftest import write_log
+from logzipper import parallel_zip
+from logzipper.parallel_zip import compressed_size, precompression_supported, write_members_parallel
+
+COMPRESSIONS = [zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA]
+
+
+@pytest.fixture
+def members(tmp_path):
+    paths = [write_log(str(tmp_path / f"2024_03_{day:02d}_server.log"), seed=day) for day in range(1, 7)]
+    return [(path, os.path.basename(path), os.path.getsize(path)) for path in paths]
+
+
+def write_zip(archive_path: str, members: list, compression: int) -> None:
+    with zipfile.ZipFile(archive_path, "w", compression=compression) as zipf:
+        assert list(write_members_parallel(zipf, members, compression, workers=3)) == [arcname for _, arcname, _ in members]
+
+
+def check_zip(archive_path: str, members: list, compression: int) -> None:
+    with zipfile.ZipFile(archive_path) as zipf:
+        assert zipf.testzip() is None
+        for file_path, arcname, _ in members:
+            assert zipf.getinfo(arcname).compress_type == compression
+            with open(file_path, "rb") as f:
+                assert zipf.read(arcname) == f.read()
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_precompressed_members_pass_testzip(tmp_path, members, compression):
+    assert precompression_supported()
+    archive_path = str(tmp_path / "archive.zip")
+    write_zip(archive_path, members, compression)
+    check_zip(archive_path, members, compression)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_streams_without_zipfile_internals(tmp_path, members, compression, monkeypatch):
+    monkeypatch.setattr(parallel_zip, "ZIPFILE_INTERNALS", ("_no_such_function",))
+    assert not precompression_supported()
+    archive_path = str(tmp_path / "archive.zip")
+    write_zip(archive_path, members, compression)
+    check_zip(archive_path, members, compression)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_compressed_size_without_zipfile_internals(compression, monkeypatch):
+    data = b"2024-03-01 10:00:00 INFO request finished\n" * 1000
+    size = compressed_size(data, compression, 5)
+    monkeypatch.setattr(parallel_zip, "ZIPFILE_INTERNALS", ("_no_such_function",))
+    # The lzma member header differs by a few bytes
+    assert abs(compressed_size(data, compression, 5) - size) <= 4
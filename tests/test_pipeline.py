@@ -0,0 +1,199 @@
+import os
+import struct
+import zipfile
+
+import pytest
+
+from conftest import backend_or_skip, file_names, scan_files, write_log
+from logzipper import archive
+from logzipper.archive import ArchiveJob, fsync_path
+from logzipper.backends import ARCHIVE_FORMATS
+from logzipper.pipeline import PipelineOptions, run_pipeline
+from logzipper.progress import ByteProgress
+
+# One worker per stage on threads, the pipeline runs inside the test process
+THREADS = PipelineOptions(archive_workers=1, verify_workers=1, delete_workers=2, processes=False)
+
+
+def run_job(log_dir: str, archive_format: str, options: PipelineOptions = THREADS, **job_options):
+    files = scan_files(log_dir)
+    job = ArchiveJob(log_dir, "2024-03", files, backend=backend_or_skip(archive_format), delete_files=True, **job_options)
+    results = list(run_pipeline([job], options))
+    assert len(results) == 1
+    return results[0]
+
+
+@pytest.mark.parametrize("archive_format", ARCHIVE_FORMATS)
+def test_build_verify_delete(log_dir, archive_format):
+    originals = {name: open(os.path.join(log_dir, name), "rb").read() for name in file_names(log_dir)}
+    result = run_job(log_dir, archive_format)
+
+    assert result.ok, result.error
+    assert result.verification is not None and result.verification.ok
+    assert sorted(result.verification.passed) == sorted(originals)
+    assert sorted(map(os.path.basename, result.deleted)) == sorted(originals)
+    assert not result.delete_errors
+    # Only the archive is left, and it holds every log file unchanged
+    assert file_names(log_dir) == {result.job.archive_filename}
+    extracted = {}
+
+    class Collect:
+        def __init__(self, arcname):
+            self.arcname, self.data = arcname, bytearray()
+
+        def write(self, data):
+            self.data += data
+
+        def close(self):
+            extracted[self.arcname] = bytes(self.data)
+
+    result.job.backend.stream_members(result.job.archive_path, Collect)
+    assert extracted == originals
+
+
+def test_build_verify_delete_on_process_pools(log_dir):
+    options = PipelineOptions(archive_workers=2, verify_workers=2, delete_workers=2)
+    result = run_job(log_dir, "zip-deflate", options)
+    assert result.ok and result.verification.ok
+    assert file_names(log_dir) == {result.job.archive_filename}
+
+
+def test_failed_verification_keeps_log_files(log_dir, monkeypatch):
+    def corrupt(result):
+        result.verification = None
+        result.unverified = list(result.file_paths)
+        result.file_paths = []
+        return result
+
+    monkeypatch.setattr("logzipper.pipeline.verify_result", corrupt)
+    names = file_names(log_dir)
+    result = run_job(log_dir, "zip-deflate")
+    assert not result.deleted
+    assert file_names(log_dir) == names | {result.job.archive_filename}
+
+
+@pytest.mark.parametrize("archive_format", ARCHIVE_FORMATS)
+def test_append_keeps_conflicting_file(log_dir, archive_format):
+    first = run_job(log_dir, archive_format)
+    assert first.ok and len(first.deleted) == 5
+    archived = first.job.backend.list_members(first.job.archive_path)
+
+    # A late file and a different file under a name the archive already holds
+    conflict = write_log(os.path.join(log_dir, "2024_03_01_server.log"), seed=100)
+    late = write_log(os.path.join(log_dir, "2024_03_20_server.log"), seed=20)
+    second = run_job(log_dir, archive_format, append=True)
+
+    assert second.ok, second.error
+    assert second.conflicts == [conflict]
+    assert second.deleted == [late]
+    assert os.path.exists(conflict)
+    members = second.job.backend.list_members(second.job.archive_path)
+    # The archived file is untouched, the late one was added next to it
+    assert members["2024_03_01_server.log"] == archived["2024_03_01_server.log"]
+    assert set(members) == set(archived) | {"2024_03_20_server.log"}
+
+
+def test_append_counts_unchanged_files_as_archived(log_dir):
+    files = scan_files(log_dir)
+    backend = backend_or_skip("zip-deflate")
+    keep = ArchiveJob(log_dir, "2024-03", files[:2], backend=backend)
+    assert next(run_pipeline([keep], THREADS)).ok
+
+    result = run_job(log_dir, "zip-deflate", append=True)
+    assert result.ok
+    assert result.files_already_archived == 2
+    assert result.files_zipped == 3
+    # Files that were archived before are cleaned up as well
+    assert len(result.deleted) == 5
+
+
+def corrupt_member(archive_path: str, arcname: str) -> None:
+    """Flip a byte in the middle of a zip member's compressed data."""
+    with zipfile.ZipFile(archive_path) as zipf:
+        zinfo = zipf.getinfo(arcname)
+    # The local header is 30 bytes plus the name and the extra field
+    with open(archive_path, "r+b") as f:
+        f.seek(zinfo.header_offset + 26)
+        name_length, extra_length = struct.unpack("<HH", f.read(4))
+        f.seek(zinfo.header_offset + 30 + name_length + extra_length + zinfo.compress_size // 2)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+
+def test_append_reads_back_members_archived_before(log_dir):
+    files = scan_files(log_dir)
+    keep = ArchiveJob(log_dir, "2024-03", files[:1], backend=backend_or_skip("zip-deflate"))
+    first = next(run_pipeline([keep], THREADS))
+    assert first.ok and not first.deleted
+    # Left damaged e.g. by an earlier run whose verification failed, the central directory still matches the file
+    corrupt_member(first.job.archive_path, files[0].name)
+
+    result = run_job(log_dir, "zip-deflate", append=True)
+    assert result.ok
+    assert result.files_already_archived == 1
+    assert result.unverified == [files[0].path]
+    assert sorted(result.deleted) == sorted(f.path for f in files[1:])
+    # The only good copy of the damaged member is kept
+    assert os.path.exists(files[0].path)
+
+
+@pytest.mark.parametrize("archive_format", ["tar.zst", "tar.xz"])
+def test_solid_archives_are_read_back_once(log_dir, archive_format, monkeypatch):
+    backend_type = type(backend_or_skip(archive_format))
+    open_reader = backend_type.open_reader
+    reads = []
+
+    def counting_reader(self, fileobj):
+        reads.append(fileobj.name)
+        return open_reader(self, fileobj)
+
+    monkeypatch.setattr(backend_type, "open_reader", counting_reader)
+    result = run_job(log_dir, archive_format)
+    assert result.ok and result.verification.ok
+    assert len(result.verification.passed) == 5 and len(result.deleted) == 5
+    # The check before the rename decompresses the archive, the verification reuses its listing
+    assert len(reads) == 1
+
+
+@pytest.mark.parametrize("options", [THREADS, PipelineOptions(archive_workers=2, verify_workers=2, delete_workers=2)], ids=["threads", "processes"])
+def test_progress_counts_every_input_byte(log_dir, options):
+    job = ArchiveJob(log_dir, "2024-03", scan_files(log_dir), backend=backend_or_skip("zip-deflate"))
+    progress = ByteProgress()
+    results = list(run_pipeline([job], options, progress))
+    assert results[0].ok
+    assert progress.total_bytes == progress.done_bytes == job.input_bytes
+
+
+def test_fsync_opens_files_for_writing(tmp_path, monkeypatch):
+    # Windows only flushes handles with write access, fsync of a read-only one fails with EBADF
+    path = tmp_path / "archive.zip"
+    path.write_bytes(b"data")
+    opened = []
+    real_open = os.open
+
+    def recording_open(file, flags, *args):
+        opened.append((str(file), flags & (os.O_RDONLY | os.O_WRONLY | os.O_RDWR)))
+        return real_open(file, flags, *args)
+
+    monkeypatch.setattr(archive.os, "open", recording_open)
+    fsync_path(str(path))
+    assert opened == [(str(path), os.O_RDWR)]
+
+
+def test_7z_is_checked_against_its_sources(log_dir, monkeypatch):
+    backend = backend_or_skip("7z")
+    list_members = type(backend).list_members
+
+    def damaged_listing(self, archive_path):
+        # A member 7z wrote with different content than its source
+        members = list_members(self, archive_path)
+        size, crc = members["2024_03_02_server.log"]
+        members["2024_03_02_server.log"] = (size, crc ^ 1)
+        return members
+
+    monkeypatch.setattr(type(backend), "list_members", damaged_listing)
+    names = file_names(log_dir)
+    result = run_job(log_dir, "7z")
+    assert not result.ok and "2024_03_02_server.log" in result.error
+    assert file_names(log_dir) == names
@@ -0,0 +1,83 @@
+import io
+import os
+import struct
+import tarfile
+
+import pytest
+
+from conftest import backend_or_skip, scan_files
+from logzipper import seekable
+from logzipper.seekable import (SEEK_TABLE_FOOTER, SEEK_TABLE_MAGIC, SKIPPABLE_HEADER, ArchiveIndex, iter_lines_between,
+                                read_archive_index, skippable_frame)
+
+BLOCK_SIZE = 16 * 1024
+
+
+@pytest.fixture
+def archive(log_dir, tmp_path):
+    backend = backend_or_skip("tar.zst", block_size=BLOCK_SIZE)
+    archive_path = str(tmp_path / "2024-03.tar.zst")
+    list(backend.write(archive_path, [(f.path, f.name, f.size) for f in scan_files(log_dir)]))
+    return archive_path
+
+
+def tar_bytes(archive_path: str) -> bytes:
+    zstandard = pytest.importorskip("zstandard")
+    with open(archive_path, "rb") as f:
+        return zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True).read()
+
+
+def seek_table(archive_path: str) -> tuple[int, list[tuple[int, int]]]:
+    """Position of the seek table frame and its entries, read by the seekable format's rules."""
+    with open(archive_path, "rb") as f:
+        data = f.read()
+    count, _, _ = SEEK_TABLE_FOOTER.unpack(data[-SEEK_TABLE_FOOTER.size:])
+    table_size = SKIPPABLE_HEADER.size + count * 8 + SEEK_TABLE_FOOTER.size
+    position = len(data) - table_size
+    assert SKIPPABLE_HEADER.unpack_from(data, position)[0] == SEEK_TABLE_MAGIC
+    return position, [struct.unpack_from("<II", data, position + SKIPPABLE_HEADER.size + 8 * i) for i in range(count)]
+
+
+def test_seek_table_lists_every_frame(archive, log_dir):
+    position, entries = seek_table(archive)
+    # The frames listed add up to the seek table, the timestamp index is one of them
+    assert sum(compressed_size for compressed_size, _ in entries) == position
+    assert entries[-1][1] == 0
+    assert sum(decompressed_size for _, decompressed_size in entries) == len(tar_bytes(archive))
+    index = read_archive_index(archive)
+    assert index.frames == entries[:-1]
+    assert set(index.members) == set(os.listdir(log_dir))
+
+
+def test_independent_seekable_reader(archive):
+    pyzstd = pytest.importorskip("pyzstd")
+    data = tar_bytes(archive)
+    with pyzstd.SeekableZstdFile(archive, "r") as reader:
+        assert reader.read() == data
+        for offset in (0, BLOCK_SIZE - 3, 5 * BLOCK_SIZE + 17, len(data) - 100):
+            reader.seek(offset)
+            assert reader.read(200) == data[offset:offset + 200]
+    assert tarfile.open(fileobj=io.BytesIO(data)).getnames() == sorted(read_archive_index(archive).members)
+
+
+def test_lines_between(archive):
+    lines = list(iter_lines_between(archive, "2024-03-02 10:00", "2024-03-02 10:05"))
+    assert lines
+    assert all(b"2024-03-02 10:00" <= line[:16] <= b"2024-03-02 10:05" for _, line in lines)
+
+
+def test_index_of_earlier_archives(archive, tmp_path):
+    # Earlier versions did not list the index frame in the seek table
+    index = read_archive_index(archive)
+    old_path = str(tmp_path / "old.tar.zst")
+    with open(archive, "rb") as f:
+        data = f.read(sum(compressed_size for compressed_size, _ in index.frames))
+    zstandard = pytest.importorskip("zstandard")
+    entries = b"".join(struct.pack("<II", *frame) for frame in index.frames)
+    with open(old_path, "wb") as f:
+        f.write(data)
+        f.write(skippable_frame(seekable.TIMESTAMP_INDEX_MAGIC, zstandard.ZstdCompressor().compress(index.to_json())))
+        f.write(skippable_frame(SEEK_TABLE_MAGIC, entries + SEEK_TABLE_FOOTER.pack(len(index.frames), 0, seekable.SEEKABLE_MAGIC)))
+    old_index = read_archive_index(old_path)
+    assert isinstance(old_index, ArchiveIndex)
+    assert old_index.frames == index.frames and old_index.members == index.members
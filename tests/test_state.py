@@ -0,0 +1,67 @@
+import os
+
+from conftest import backend_or_skip, scan_files
+from logzipper.archive import ArchiveJob, build_month_archive
+from logzipper.pipeline import PipelineOptions, run_pipeline
+from logzipper.state import STATUS_ARCHIVED, STATUS_DELETED, STATUS_MISSING, STATUS_QUEUED, RunState
+
+THREADS = PipelineOptions(archive_workers=1, verify_workers=1, delete_workers=2, processes=False)
+
+
+def statuses(run_state: RunState, directory: str) -> dict[str, str]:
+    return {os.path.basename(path): state.status for path, state in run_state.load_directory(directory).items()}
+
+
+def queued_job(run_state: RunState, log_dir: str, **job_options) -> ArchiveJob:
+    job = ArchiveJob(log_dir, "2024-03", scan_files(log_dir), backend=backend_or_skip("zip-deflate"), **job_options)
+    run_state.queue_job(job, run_state.load_directory(log_dir))
+    return job
+
+
+def test_resume_after_interrupted_run(log_dir, tmp_path):
+    with RunState(str(tmp_path / "state.sqlite")) as run_state:
+        job = queued_job(run_state, log_dir, delete_files=True)
+        # The run stopped after the archive was written and two of its files were deleted,
+        # a third file vanished without being archived, nothing was recorded
+        first, second, missing = job.files[0].path, job.files[1].path, job.files[4].path
+        job.files = job.files[:4]
+        assert build_month_archive(job).ok
+        os.unlink(first)
+        os.unlink(second)
+        os.unlink(missing)
+
+        unfinished = run_state.settle_unfinished()
+        assert sorted(os.path.basename(state.path) for state in unfinished) == ["2024_03_03_server.log", "2024_03_04_server.log"]
+        names = statuses(run_state, log_dir)
+        assert names["2024_03_01_server.log"] == names["2024_03_02_server.log"] == STATUS_DELETED
+        assert names["2024_03_05_server.log"] == STATUS_MISSING
+
+        # The next run finds the remaining files in the archive and only cleans them up
+        resumed = queued_job(run_state, log_dir, delete_files=True, append=True)
+        result = next(run_pipeline([resumed], THREADS))
+        run_state.record_result(result)
+        assert result.ok
+        assert result.files_already_archived == 2
+        assert result.files_zipped == 0
+        assert os.listdir(log_dir) == [resumed.archive_filename]
+        assert set(statuses(run_state, log_dir).values()) == {STATUS_DELETED, STATUS_MISSING}
+        assert run_state.unfinished() == []
+
+
+def test_archived_files_are_trusted_by_the_next_run(log_dir, tmp_path):
+    with RunState(str(tmp_path / "state.sqlite")) as run_state:
+        job = queued_job(run_state, log_dir)
+        assert set(statuses(run_state, log_dir).values()) == {STATUS_QUEUED}
+        result = next(run_pipeline([job], THREADS))
+        run_state.record_result(result)
+        assert set(statuses(run_state, log_dir).values()) == {STATUS_ARCHIVED}
+
+        # Unchanged files skip the CRC check, a file that changed since is checked again
+        changed = job.files[0].path
+        with open(changed, "a") as f:
+            f.write("late line\n")
+        again = queued_job(run_state, log_dir, append=True)
+        assert again.archived_paths == frozenset(f.path for f in job.files[1:])
+        result = next(run_pipeline([again], THREADS))
+        assert result.files_already_archived == 4
+        assert result.conflicts == [changed]